@@ -0,0 +1,239 @@
+"""Import parts from avrdude.conf into the chip database schema.
+
+avrdude.conf is a list of ``programmer`` and ``part`` blocks. A block is a
+run of ``key = value;`` statements closed by a lone ``;``, parts contain
+``memory "name"`` blocks of the same form, and ``part parent "id"`` starts
+from a copy of an earlier part whose memories the child then amends.
+``memory "name" alias "other";`` copies another memory, and other
+statements without ``=`` are skipped, so confs of newer avrdude versions
+still import. A truncated or malformed file raises ConfError with the line
+it stops making sense at.
+The whole file is tokenised with a single regular expression and parsed in
+one pass, which keeps the full conf with its hundreds of parts well under
+a second; chipdb caches the result until the file changes.
+"""
+import os
+import re
+import shutil
+from typing import Any, Dict, List, Optional
+
+_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|#[^\n]*|[^\s"#=;,|]+|[=;,|]')
+
+CONF_LOCATIONS = [
+    "/etc/avrdude.conf",
+    "/etc/avrdude/avrdude.conf",
+    "/usr/local/etc/avrdude.conf",
+    "/opt/homebrew/etc/avrdude.conf",
+]
+
+FAMILIES = [
+    ("ATxmega", "ATxmega Series"),
+    ("ATmega", "ATmega Series"),
+    ("ATtiny", "ATtiny Series"),
+    ("AT90", "AT90 Series"),
+    ("AVR32", "AVR32 Series"),
+    ("AT32", "AVR32 Series"),
+    ("AVR", "AVR Dx/Ex Series"),
+]
+
+class ConfError(ValueError):
+    def __init__(self, message: str, line_number: int = 0):
+        if line_number:
+            message = f"line {line_number}: {message}"
+        super().__init__(message)
+        self.line_number = line_number
+
+class _ParseError(Exception):
+    """A parse error at a token index, turned into a ConfError with its line."""
+    def __init__(self, message: str, position: int):
+        super().__init__(message)
+        self.position = position
+
+class _Part:
+    def __init__(self, attributes: Dict[str, List[str]], memories: Dict[str, Dict[str, List[str]]]):
+        self.attributes = attributes
+        self.memories = memories
+
+    def copy(self) -> '_Part':
+        return _Part(dict(self.attributes),
+                     {name: dict(memory) for name, memory in self.memories.items()})
+
+def find_avrdude_conf() -> Optional[str]:
+    """Locate the avrdude.conf of the installed avrdude, if any."""
+    candidates = []
+    avrdude = shutil.which("avrdude")
+    if avrdude:
+        directory = os.path.dirname(os.path.realpath(avrdude))
+        candidates += [os.path.join(directory, "avrdude.conf"),
+                       os.path.join(directory, "..", "etc", "avrdude.conf")]
+    for path in candidates + CONF_LOCATIONS:
+        if os.path.isfile(path):
+            return os.path.normpath(path)
+    return None
+
+def parse_parts(text: str) -> Dict[str, _Part]:
+    """Parse every part in the conf text, with inheritance resolved, by avrdude id."""
+    tokens = [token for token in _TOKEN.findall(text) if token[0] != "#"]
+    try:
+        return _parse_parts(tokens)
+    except _ParseError as e:
+        raise ConfError(str(e), _line_number(text, e.position)) from None
+
+def _line_number(text: str, position: int) -> int:
+    """Line of the token at ``position``, or of the last token past the end."""
+    offset = 0
+    tokens = (match for match in _TOKEN.finditer(text) if match.group()[0] != "#")
+    for index, match in enumerate(tokens):
+        offset = match.start()
+        if index == position:
+            break
+    return text.count("\n", 0, offset) + 1
+
+def _parse_parts(tokens: List[str]) -> Dict[str, _Part]:
+    parts: Dict[str, _Part] = {}
+    position = 0
+    while position < len(tokens):
+        keyword = tokens[position]
+        if position + 1 < len(tokens) and tokens[position + 1] == "=":
+            # Top level setting such as default_programmer
+            position = _skip_statement(tokens, position)
+            continue
+
+        position += 1
+        parent = None
+        if position < len(tokens) and tokens[position] == "parent":
+            parent = _unquote(_token(tokens, position + 1))
+            position += 2
+        if keyword != "part":
+            position = _parse_block(tokens, position, _Part({}, {}))
+            continue
+
+        if parent is None:
+            part = _Part({}, {})
+        elif parent in parts:
+            part = parts[parent].copy()
+        else:
+            raise _ParseError(f"part inherits from unknown part {parent!r}", position - 1)
+        position = _parse_block(tokens, position, part)
+        part_id = _value(part.attributes, "id")
+        if part_id:
+            parts[part_id] = part
+    return parts
+
+def _parse_block(tokens: List[str], position: int, part: _Part) -> int:
+    """Parse statements up to the block's closing ';' into ``part``."""
+    while position < len(tokens):
+        token = tokens[position]
+        if token == ";":
+            return position + 1
+        if token == "memory":
+            name = _unquote(_token(tokens, position + 1))
+            if _token(tokens, position + 2) == "=":
+                # memory "name" = NULL; removes an inherited memory
+                part.memories.pop(name, None)
+                position = _skip_statement(tokens, position)
+                continue
+            if tokens[position + 2] == "alias":
+                # memory "wdtcfg" alias "fuse0"; (avrdude 7) names an existing memory
+                aliased = part.memories.get(_unquote(_token(tokens, position + 3)))
+                if aliased is not None:
+                    part.memories[name] = dict(aliased)
+                position = _skip_statement(tokens, position)
+                continue
+            memory = part.memories.setdefault(name, {})
+            position = _parse_block(tokens, position + 2, _Part(memory, {}))
+            continue
+        if position + 1 >= len(tokens) or tokens[position + 1] != "=":
+            # A statement of a newer avrdude this importer does not know
+            position = _skip_statement(tokens, position)
+            continue
+        end = _skip_statement(tokens, position + 2) - 1
+        part.attributes[token] = [value for value in tokens[position + 2:end] if value != ","]
+        position = end + 1
+    raise _ParseError("unexpected end of file inside a block", position)
+
+def _token(tokens: List[str], position: int) -> str:
+    if position >= len(tokens):
+        raise _ParseError("unexpected end of file", position)
+    return tokens[position]
+
+def _skip_statement(tokens: List[str], position: int) -> int:
+    try:
+        return tokens.index(";", position) + 1
+    except ValueError:
+        raise _ParseError("unexpected end of file, statement has no closing ';'", position) from None
+
+def _unquote(token: str) -> str:
+    return token[1:-1] if token.startswith('"') else token
+
+def _value(attributes: Dict[str, List[str]], key: str) -> Optional[str]:
+    values = attributes.get(key)
+    return _unquote(values[0]) if values else None
+
+def _int_value(attributes: Dict[str, List[str]], key: str) -> Optional[int]:
+    value = _value(attributes, key)
+    try:
+        return int(value, 0) if value is not None else None
+    except ValueError:
+        return None
+
+def _size_text(size: int) -> str:
+    if size >= 1024 and size % 1024 == 0:
+        return f"{size // 1024}KB"
+    return f"{size}B"
+
+def _family(description: str, attributes: Dict[str, List[str]]) -> str:
+    updi = "PM_UPDI" in attributes.get("prog_modes", []) or _value(attributes, "has_updi") == "yes"
+    for prefix, family in FAMILIES:
+        if description.startswith(prefix):
+            if updi and family in ("ATmega Series", "ATtiny Series"):
+                return family.replace(" Series", "0 Series")
+            return family
+    return "Other"
+
+def part_to_chip(part_id: str, part: _Part) -> Optional[Dict[str, Any]]:
+    """Convert a parsed part to a chips.json entry, or None if it cannot be programmed."""
+    attributes, memories = part.attributes, part.memories
+    signature = attributes.get("signature")
+    flash = memories.get("flash")
+    if part_id.startswith(".") or not signature or flash is None:
+        return None
+    flash_size = _int_value(flash, "size")
+    if not flash_size:
+        return None
+
+    eeprom_size = _int_value(memories.get("eeprom", {}), "size") or 0
+    description = f"{_size_text(flash_size)} Flash, {_size_text(eeprom_size)} EEPROM"
+    sram_size = _int_value(memories.get("sram", {}), "size")
+    if sram_size:
+        description += f", {_size_text(sram_size)} SRAM"
+
+    modes = attributes.get("prog_modes", [])
+    page_erase = ("PM_PDI" in modes or "PM_UPDI" in modes
+                  or _value(attributes, "has_pdi") == "yes" or _value(attributes, "has_updi") == "yes")
+
+    chip = {
+        "command": part_id,
+        "name": _value(attributes, "desc") or part_id,
+        "signature": "0x" + "".join(f"{int(byte, 16):02X}" for byte in signature),
+        "flash_size": flash_size,
+        "eeprom_size": eeprom_size,
+        "description": description,
+        "flash_page_size": _int_value(flash, "page_size") or 0,
+        "page_erase": page_erase,
+    }
+    for fuse in ("lfuse", "hfuse", "efuse"):
+        # Older confs have no initval; leave the default empty rather than guess
+        initval = _int_value(memories.get(fuse, {}), "initval")
+        chip[f"default_{fuse}"] = f"0x{initval:02X}" if initval is not None and initval >= 0 else ""
+    return chip
+
+def import_avrdude_conf(text: str) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """Build the family -> model -> data database from avrdude.conf text."""
+    families: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for part_id, part in parse_parts(text).items():
+        chip = part_to_chip(part_id, part)
+        if chip is not None:
+            family = _family(chip["name"], part.attributes)
+            families.setdefault(family, {})[part_id] = chip
+    return families
@@ -0,0 +1,271 @@
+import sys
+import bisect
+import hashlib
+import json
+import marshal
+import os
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple
+
+import avrconf
+
+DEFAULT_DATABASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chips.json")
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "avrflasher")
+# Bump when the compiled layout changes so stale caches are rebuilt
+CACHE_VERSION = 1
+
+ChipRef = Tuple[str, str]
+
+@dataclass
+class ChipInfo:
+    command: str
+    name: str
+    signature: str
+    flash_size: int
+    eeprom_size: int
+    default_lfuse: str
+    default_hfuse: str
+    default_efuse: str
+    description: str
+    flash_page_size: int = 0
+    page_erase: bool = False
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ChipInfo':
+        """Create a ChipInfo instance from a dictionary."""
+        return cls(
+            command=data['command'],
+            name=data['name'],
+            signature=data['signature'],
+            flash_size=data['flash_size'],
+            eeprom_size=data['eeprom_size'],
+            default_lfuse=data['default_lfuse'],
+            default_hfuse=data['default_hfuse'],
+            default_efuse=data['default_efuse'],
+            description=data['description'],
+            flash_page_size=data.get('flash_page_size') or default_page_size(data['flash_size']),
+            page_erase=data.get('page_erase', False)
+        )
+
+def default_page_size(flash_size: int) -> int:
+    """Typical AVR flash page size for parts that do not list one."""
+    if flash_size <= 2048:
+        return 32
+    if flash_size <= 8192:
+        return 64
+    if flash_size <= 32768:
+        return 128
+    return 256
+
+def normalize_signature(signature: str) -> str:
+    """Canonical ``0x1E950F`` form of "0x1E950F", "1e 95 0f" or "0x1e,0x95,0x0f"."""
+    text = signature.strip().lower().replace(",", " ")
+    parts = text.split()
+    if len(parts) > 1:
+        digits = "".join(f"{int(part, 16):02X}" for part in parts)
+    else:
+        digits = text[2:].upper() if text.startswith("0x") else text.upper()
+    return "0x" + digits
+
+class ChipDatabase(Mapping):
+    """Chips by family and model, with indexes by signature, part id and name.
+
+    As a mapping it is the family -> model -> data dictionary of chips.json,
+    so code that walks families and models works unchanged.
+    """
+    def __init__(self, families: Dict[str, Dict[str, Dict[str, Any]]], path: Optional[str] = None,
+                 indexes: Optional[Dict[str, Any]] = None):
+        self.families = families
+        self.path = path
+        self._chips: Dict[ChipRef, ChipInfo] = {}
+        if indexes is None:
+            indexes = self._build_indexes()
+        self.by_model: Dict[str, ChipRef] = indexes["model"]
+        self.by_part: Dict[str, ChipRef] = indexes["part"]
+        self.by_name: Dict[str, ChipRef] = indexes["name"]
+        self.by_signature: Dict[str, List[ChipRef]] = indexes["signature"]
+        self.problems: List[str] = indexes["problems"]
+        self._search_index = None
+
+    def __getitem__(self, family):
+        return self.families[family]
+
+    def __iter__(self):
+        return iter(self.families)
+
+    def __len__(self):
+        return len(self.families)
+
+    def _build_indexes(self) -> Dict[str, Any]:
+        indexes = {"model": {}, "part": {}, "name": {}, "signature": {}, "problems": []}
+        for family, chips in self.families.items():
+            for model, data in chips.items():
+                ref = (family, model)
+                for index, key in (("model", model), ("part", data["command"]),
+                                   ("name", data["name"].lower())):
+                    if key in indexes[index]:
+                        other = indexes[index][key]
+                        indexes["problems"].append(
+                            f"duplicate {index} {key!r}: {other[1]} ({other[0]}) and {model} ({family})")
+                    else:
+                        indexes[index][key] = ref
+                signature = normalize_signature(data["signature"])
+                indexes["signature"].setdefault(signature, []).append(ref)
+        return indexes
+
+    def chip(self, family: str, model: str) -> ChipInfo:
+        ref = (family, model)
+        if ref not in self._chips:
+            self._chips[ref] = ChipInfo.from_dict(self.families[family][model])
+        return self._chips[ref]
+
+    def find(self, model: str) -> Optional[ChipInfo]:
+        """Look up a chip by model key, avrdude part id or display name."""
+        ref = self.by_model.get(model) or self.by_part.get(model) or self.by_name.get(model.lower())
+        return self.chip(*ref) if ref else None
+
+    def family_of(self, model: str) -> Optional[str]:
+        ref = self.by_model.get(model)
+        return ref[0] if ref else None
+
+    def models_with_signature(self, signature: str) -> List[ChipRef]:
+        """(family, model) of every chip with the signature; several parts can share one."""
+        return self.by_signature.get(normalize_signature(signature), [])
+
+    def find_by_signature(self, signature: str) -> List[ChipInfo]:
+        return [self.chip(*ref) for ref in self.models_with_signature(signature)]
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[ChipRef]:
+        """Chips matching every word of ``query`` in name, part id, signature or description.
+
+        Chips with a word starting with the first query word come first,
+        then the ones that merely contain it; an empty query matches all.
+        """
+        if self._search_index is None:
+            self._search_index = self._build_search_index()
+        refs, haystacks, keys = self._search_index
+        terms = query.lower().split()
+        if not terms:
+            return refs[:limit]
+
+        first = terms[0]
+        prefixed = set()
+        start = bisect.bisect_left(keys, (first, -1))
+        for token, position in keys[start:]:
+            if not token.startswith(first):
+                break
+            prefixed.add(position)
+        ranked = sorted(prefixed)
+        ranked += [position for position, haystack in enumerate(haystacks)
+                   if position not in prefixed and first in haystack]
+        for term in terms[1:]:
+            ranked = [position for position in ranked if term in haystacks[position]]
+        return [refs[position] for position in ranked[:limit]]
+
+    def _build_search_index(self):
+        refs = sorted(((family, model) for family, chips in self.families.items() for model in chips),
+                      key=lambda ref: self.families[ref[0]][ref[1]]["name"].lower())
+        haystacks = []
+        keys = []
+        for position, (family, model) in enumerate(refs):
+            data = self.families[family][model]
+            signature = normalize_signature(data["signature"]).lower()
+            fields = [data["name"].lower(), model.lower(), data["command"].lower(),
+                      signature, signature[2:], data.get("description", "").lower(), family.lower()]
+            haystacks.append("\n".join(fields))
+            tokens = set(fields[:5]) | set(" ".join(fields[5:]).split())
+            keys.extend((token, position) for token in tokens)
+        keys.sort()
+        return refs, haystacks, keys
+
+    def signature_report(self) -> List[str]:
+        """Describe duplicate entries and signatures shared by several parts.
+
+        Parts sharing a signature but not their memory sizes cannot both be
+        right, so those are reported as conflicts.
+        """
+        lines = list(self.problems)
+        for signature, refs in sorted(self.by_signature.items()):
+            if len(refs) < 2:
+                continue
+            chips = [self.chip(*ref) for ref in refs]
+            sizes = {(chip.flash_size, chip.eeprom_size) for chip in chips}
+            kind = "conflicting" if len(sizes) > 1 else "shared"
+            lines.append(f"{kind} signature {signature}: " + ", ".join(chip.name for chip in chips))
+        return lines
+
+    def to_cache(self) -> Dict[str, Any]:
+        return {"families": self.families,
+                "indexes": {"model": self.by_model, "part": self.by_part, "name": self.by_name,
+                            "signature": self.by_signature, "problems": self.problems}}
+
+def _cache_path(file_path: str, cache_dir: str) -> str:
+    key = hashlib.sha1(os.path.abspath(file_path).encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f"chipdb-{key}.bin")
+
+def _load_cache(cache_path: str, stamp: Tuple[int, int]) -> Optional[Dict[str, Any]]:
+    try:
+        with open(cache_path, "rb") as file:
+            # Reading the whole file first is far faster than marshal.load() on it
+            cached = marshal.loads(file.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if not isinstance(cached, dict) or cached.get("version") != CACHE_VERSION \
+            or tuple(cached.get("stamp", ())) != stamp:
+        return None
+    return cached
+
+def _store_cache(cache_path: str, stamp: Tuple[int, int], database: ChipDatabase):
+    # A cache that cannot be written only costs the JSON parse next time
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temp_path = cache_path + ".tmp"
+        with open(temp_path, "wb") as file:
+            file.write(marshal.dumps(dict(database.to_cache(), version=CACHE_VERSION, stamp=stamp)))
+        os.replace(temp_path, cache_path)
+    except OSError:
+        pass
+
+def default_database_path() -> str:
+    """The installed avrdude.conf when there is one, otherwise the bundled chips.json."""
+    return avrconf.find_avrdude_conf() or DEFAULT_DATABASE_PATH
+
+def load_chip_database(file_path: str = DEFAULT_DATABASE_PATH, cache_dir: Optional[str] = CACHE_DIR) -> ChipDatabase:
+    """Load the chip database, using the compiled cache while the source file is unchanged.
+
+    The source is a chips.json file or an avrdude.conf (``*.conf``) whose
+    parts are imported. The cache is keyed by the file's mtime and size;
+    pass ``cache_dir=None`` to always parse the source. An avrdude.conf
+    that fails to import falls back to the bundled chips.json.
+    """
+    try:
+        stat = os.stat(file_path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        cache_path = _cache_path(file_path, cache_dir) if cache_dir else None
+        cached = _load_cache(cache_path, stamp) if cache_path else None
+        if cached is not None:
+            return ChipDatabase(cached["families"], file_path, cached["indexes"])
+
+        with open(file_path, "r", encoding="utf-8", errors="replace") as file:
+            text = file.read()
+        if file_path.endswith(".conf"):
+            families = avrconf.import_avrdude_conf(text)
+        else:
+            families = json.loads(text)
+        database = ChipDatabase(families, file_path)
+        if cache_path:
+            _store_cache(cache_path, stamp, database)
+        return database
+    except (FileNotFoundError, json.JSONDecodeError, avrconf.ConfError, KeyError) as e:
+        if file_path.endswith(".conf") and file_path != DEFAULT_DATABASE_PATH:
+            # An avrdude.conf we cannot import should not keep the flasher from starting
+            print(f"Warning: cannot import {file_path} ({e}), using the bundled chip database",
+                  file=sys.stderr)
+            return load_chip_database(DEFAULT_DATABASE_PATH, cache_dir)
+        print(f"Error loading chip database: {e}")
+        sys.exit(1)
+
+def find_chip(chip_database: ChipDatabase, model: str) -> Optional[ChipInfo]:
+    """Look up a chip by model key, avrdude part id or display name in any series."""
+    return chip_database.find(model)
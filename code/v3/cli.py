@@ -0,0 +1,688 @@
+"""Headless command line front end for the AVR flasher.
+
+Uses the same chip database and command building as the GUI but never
+imports PyQt6, so it starts quickly enough to be called from test fixtures.
+
+    python cli.py flash -p m328p firmware.hex
+    python cli.py fuses -p m328p --write --lfuse 0xFF --hfuse 0xDE --efuse 0x05
+    python cli.py unit -p m328p --patches fields.json --unit 42 --flash firmware.hex
+    python cli.py batch jobs.json
+    python cli.py station jobs.json
+    python cli.py db
+"""
+import argparse
+import json
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from chipdb import ChipInfo, default_database_path, find_chip, load_chip_database
+import commands
+import intelhex
+from programmers import BOOTLOADER_PROGRAMMERS, SYSFS_USB_DEVICES
+from retry import RetryPolicy, run_with_retry
+from runner import ProcessRunner
+from scheduler import device_key
+
+ACTIONS = ["flash", "read", "verify", "fuses", "eeprom", "program", "unit"]
+
+# Exit code for an avrdude run stopped by its timeout, as timeout(1) uses
+TIMEOUT_EXIT_CODE = 124
+
+# clocktune, differential, patching and station are imported by the functions
+# that use them, so that each run loads only what its action needs
+
+@dataclass
+class PreparedJob:
+    """A job resolved once: its chip, avrdude options and argv, and its image.
+
+    ``image`` is the parsed file of a flash, verify or EEPROM write/verify
+    job, or the flash image of a program job; None for the other jobs.
+    """
+    chip: ChipInfo
+    options: commands.CommandOptions
+    command: List[str]
+    image: Optional[intelhex.HexImage] = None
+
+def job_chip_and_options(job: Dict[str, Any], chip_database, tuned: bool = True):
+    """Resolve the chip and avrdude options a job refers to.
+
+    Without an explicit ``bit_clock`` the clock tuned for this chip and
+    programmer is used, unless ``tuned`` is False.
+    """
+    chip = find_chip(chip_database, job.get("chip", ""))
+    if chip is None:
+        raise ValueError(f"Unknown chip: {job.get('chip')!r}")
+
+    bit_clock = job.get("bit_clock")
+    options = commands.CommandOptions(
+        programmer=job.get("programmer", "usbasp"),
+        port=job.get("port"),
+        bit_clock=float(bit_clock) if bit_clock is not None else None,
+        retry_count=int(job.get("retry_count", 3)),
+        disable_fuse_check=bool(job.get("disable_fuse_check", False)),
+        erase=bool(job.get("erase", True)),
+        verify=bool(job.get("verify", True))
+    )
+    if bit_clock is None and tuned:
+        import clocktune
+        options = clocktune.apply_tuned_bit_clock(chip, options)
+    return chip, options
+
+def build_job_command(job: Dict[str, Any], chip_database) -> List[str]:
+    """Build the avrdude argv for one job description.
+
+    A job is a dictionary with an ``action`` (one of ACTIONS), a ``chip``
+    model and the options the action needs, e.g. ``file`` or fuse values.
+    """
+    return prepare_job(job, chip_database).command
+
+def prepare_job(job: Dict[str, Any], chip_database) -> PreparedJob:
+    """Resolve a job and preflight its image, once for all the steps that need them."""
+    action = job.get("action")
+    if action not in ACTIONS:
+        raise ValueError(f"Unknown action: {action!r}")
+
+    if action == "unit":
+        raise ValueError("Unit jobs run one avrdude per memory; use unit_commands()")
+
+    chip, options = job_chip_and_options(job, chip_database)
+
+    if action == "program":
+        image = preflight_program_images(job, chip)
+        command = commands.program_board_command(chip, options, job_program_steps(job, chip))
+        return PreparedJob(chip, options, command, image)
+
+    if action == "fuses":
+        if job.get("mode", "read") == "read":
+            return PreparedJob(chip, options, commands.read_fuses_command(chip, options))
+        command = commands.write_fuses_command(
+            chip, options,
+            job.get("lfuse", chip.default_lfuse),
+            job.get("hfuse", chip.default_hfuse),
+            job.get("efuse", chip.default_efuse)
+        )
+        return PreparedJob(chip, options, command)
+
+    file_path = job.get("file")
+    if not file_path:
+        raise ValueError(f"Action {action!r} needs a file")
+
+    # Reject broken or oversized images before avrdude touches the chip
+    image = None
+    if action in ("flash", "verify"):
+        image = intelhex.preflight(file_path, chip.flash_size, "flash")
+    elif action == "eeprom" and job.get("mode", "write") != "read":
+        image = intelhex.preflight(file_path, chip.eeprom_size, "EEPROM")
+    return PreparedJob(chip, options, file_job_command(job, chip, options, file_path), image)
+
+def file_job_command(job: Dict[str, Any], chip, options, file_path: str) -> List[str]:
+    """The argv of a flash, read, verify or EEPROM job."""
+    action = job["action"]
+    if action == "flash":
+        return commands.write_flash_command(chip, options, file_path)
+    if action == "read":
+        return commands.read_flash_command(chip, options, file_path)
+    if action == "verify":
+        if job.get("local"):
+            # The read-back goes to stdout and is compared in verify_locally()
+            return commands.read_flash_command(chip, options, "-")
+        return commands.verify_flash_command(chip, options, file_path)
+
+    mode = job.get("mode", "write")
+    if mode == "write":
+        return commands.write_eeprom_command(chip, options, file_path)
+    if mode == "read":
+        return commands.read_eeprom_command(chip, options, file_path)
+    if mode == "verify":
+        if job.get("local"):
+            return commands.read_eeprom_command(chip, options, "-")
+        return commands.verify_eeprom_command(chip, options, file_path)
+    raise ValueError(f"Unknown EEPROM mode: {mode!r}")
+
+def unit_engine(job: Dict[str, Any], chip):
+    """Load the base images and patch fields of a unit job into a PatchEngine."""
+    import patching
+    if not job.get("patches"):
+        raise ValueError("Action 'unit' needs a patches file")
+    images = {}
+    if job.get("flash_file"):
+        images["flash"] = intelhex.read_hex(job["flash_file"])
+    if job.get("eeprom_file"):
+        images["eeprom"] = intelhex.read_hex(job["eeprom_file"])
+    engine = patching.PatchEngine(images, patching.load_fields(job["patches"]))
+    engine.check_fits({"flash": chip.flash_size, "eeprom": chip.eeprom_size})
+    return engine
+
+def unit_commands(job: Dict[str, Any], chip_database) -> List[Any]:
+    """(argv, Intel HEX) pairs that program one unit, flash before EEPROM.
+
+    Each memory needs its own avrdude run because the image comes in on
+    stdin, which avrdude can read only once.
+    """
+    chip, options = job_chip_and_options(job, chip_database)
+    engine = unit_engine(job, chip)
+    images = engine.render(int(job.get("unit", 0)), job.get("values"))
+    runs = []
+    if "flash" in images:
+        write = commands.write_flash_command
+        if not job.get("flash_file"):
+            # Without a base image only the patched bytes are written, so the
+            # flash must not be erased first, which needs page erase
+            if not commands.supports_page_erase(chip, options) and not job.get("print_hex"):
+                raise ValueError(f"{chip.name} cannot rewrite flash bytes without a chip erase "
+                                 f"on {options.programmer}; give the base flash image (--flash)")
+            write = commands.write_flash_pages_command
+        runs.append((write(chip, options, "-"), images["flash"]))
+    if "eeprom" in images:
+        runs.append((commands.write_eeprom_command(chip, options, "-"), images["eeprom"]))
+    return runs
+
+def run_unit(job: Dict[str, Any], chip_database, dry_run: bool = False, quiet: bool = False) -> int:
+    """Patch the images for one unit in memory and pipe them into avrdude."""
+    for cmd, data in unit_commands(job, chip_database):
+        if job.get("print_hex"):
+            sys.stdout.write(data.decode("ascii"))
+            continue
+        if dry_run:
+            print(" ".join(cmd) + f" < ({len(data)} bytes of Intel HEX)")
+            continue
+        returncode = run_avrdude(cmd, job.get("timeout"), quiet, input=data,
+                                 policy=job_retry_policy(job))
+        if returncode != 0:
+            return returncode
+    return 0
+
+def job_retry_policy(job: Dict[str, Any]) -> Optional[RetryPolicy]:
+    """The retry policy of a job with ``smart_retry`` set, else None."""
+    if not job.get("smart_retry"):
+        return None
+    return RetryPolicy(budget=float(job.get("retry_budget", RetryPolicy.budget)))
+
+def run_avrdude(cmd: List[str], timeout: float = None, quiet: bool = False,
+                input: bytes = None, policy: RetryPolicy = None) -> int:
+    """Run avrdude without a shell, stopping its process group after ``timeout`` seconds.
+
+    With a retry ``policy`` failed runs are retried as retry.py describes.
+    """
+    result = run_avrdude_captured(cmd, timeout, quiet, input, policy)
+    sys.stdout.write(result.stdout)
+    if result.timed_out:
+        print(f"Error: {result.describe(timeout)}", file=sys.stderr)
+        return TIMEOUT_EXIT_CODE
+    print_errors(result)
+    return result.returncode
+
+def print_errors(result):
+    """One ``Error [kind]: ...`` line per classified failure of a failed run."""
+    if result.ok:
+        return
+    for record in result.errors:
+        print(f"Error [{record.kind}]: {record.describe()}", file=sys.stderr)
+
+def run_avrdude_captured(cmd: List[str], timeout: float = None, quiet: bool = False,
+                         input: bytes = None, policy: RetryPolicy = None):
+    """Like run_avrdude() but returns the ProcessResult with stdout instead of printing it."""
+    on_stderr = on_update = None
+    if not quiet:
+        on_stderr = lambda line: print(line, file=sys.stderr, flush=True)
+        on_update = lambda line: print(line, end="\r", file=sys.stderr, flush=True)
+    runners = []
+
+    def run(argv):
+        runners.append(ProcessRunner(argv, timeout, on_stderr, on_stderr_update=on_update, input=input))
+        return runners[-1].run()
+
+    try:
+        if policy is None:
+            return run(cmd)
+        return run_with_retry(run, cmd, policy,
+                              on_retry=lambda message: print(message, file=sys.stderr, flush=True))
+    except KeyboardInterrupt:
+        if runners:
+            runners[-1].cancel()
+        raise
+
+def read_device_memory(chip, options, memory: str = "flash", quiet: bool = False,
+                       timeout: float = None):
+    """Read a memory into a HexImage through avrdude's stdout, or None if the read failed."""
+    read_command = commands.read_flash_command if memory == "flash" else commands.read_eeprom_command
+    result = run_avrdude_captured(read_command(chip, options, "-"), timeout, quiet)
+    if not result.ok:
+        if result.timed_out:
+            print(f"Error: {result.describe(timeout)}", file=sys.stderr)
+        print_errors(result)
+        return None
+    try:
+        return intelhex.parse_hex(result.stdout.splitlines())
+    except ValueError:
+        return None
+
+def read_device_flash(chip, options, quiet: bool = False, timeout: float = None):
+    return read_device_memory(chip, options, "flash", quiet, timeout)
+
+def verify_locally(job: Dict[str, Any], prepared: PreparedJob, quiet: bool = False) -> int:
+    """Read the memory back once and compare it with the file's used ranges."""
+    memory = "eeprom" if job["action"] == "eeprom" else "flash"
+    image = prepared.image
+    device = read_device_memory(prepared.chip, prepared.options, memory, quiet, job.get("timeout"))
+    if device is None:
+        print(f"Error: could not read {memory} back", file=sys.stderr)
+        return 1
+    addresses = intelhex.compare(image, device)
+    if addresses:
+        print(f"{job['file']}: {memory} verification failed: {len(addresses)} byte(s) differ at "
+              f"{intelhex.describe_addresses(addresses)}")
+        return 1
+    print(f"{job['file']}: {memory} verified, {image.size} byte(s) match")
+    return 0
+
+def flash_is_current(job: Dict[str, Any], prepared: PreparedJob, quiet: bool = False) -> bool:
+    """Read the flash back and compare it with the job's image by content hash."""
+    device = read_device_flash(prepared.chip, prepared.options, quiet, job.get("timeout"))
+    if device is None:
+        return False
+    return intelhex.content_hash(device, prepared.image) == intelhex.content_hash(prepared.image)
+
+def run_differential_flash(job: Dict[str, Any], prepared: PreparedJob, quiet: bool = False) -> int:
+    """Write only the pages that differ from the device content.
+
+    The last written image stands in for a read-back when the device still
+    holds it; jobs marked ``new_board`` (station mode) always read back.
+    """
+    import differential
+    chip, options, image = prepared.chip, prepared.options, prepared.image
+    base = None
+    cached = differential.last_image_path(chip, options.port)
+    if cached is not None and not job.get("new_board"):
+        # Another board may be attached now; trust the cache only if the device still holds it
+        verify = commands.verify_flash_command(chip, options, cached)
+        if run_avrdude_captured(verify, job.get("timeout"), quiet=True).ok:
+            base = differential.load_last_image(chip, options.port)
+        else:
+            print("Device does not hold the last written image, reading it back")
+    if base is None:
+        base = read_device_flash(chip, options, quiet, job.get("timeout"))
+    if base is None:
+        return run_full_flash(job, prepared, quiet)
+
+    pages = differential.changed_pages(image, base, chip.flash_page_size)
+    if not pages:
+        print(f"{job['file']}: already current, nothing to write")
+        differential.store_last_image(chip, options.port, image)
+        return 0
+
+    delta = intelhex.format_hex(differential.delta_image(image, pages, chip.flash_page_size))
+    print(f"{job['file']}: writing {len(pages)} changed page(s)")
+    cmd = commands.write_flash_pages_command(chip, options, "-")
+    returncode = run_avrdude(cmd, job.get("timeout"), quiet, delta.encode("ascii"), job_retry_policy(job))
+    remember_flash(prepared, returncode)
+    return returncode
+
+def run_full_flash(job: Dict[str, Any], prepared: PreparedJob, quiet: bool = False) -> int:
+    """Erase and write the whole image, remembering it as the device content."""
+    returncode = run_avrdude(prepared.command, job.get("timeout"), quiet, policy=job_retry_policy(job))
+    remember_flash(prepared, returncode)
+    return returncode
+
+def remember_flash(prepared: PreparedJob, returncode: int):
+    """Record the written flash image for differential writes, or forget it after a failure."""
+    import differential
+    if returncode == 0:
+        differential.store_last_image(prepared.chip, prepared.options.port, prepared.image)
+    else:
+        differential.forget_last_image(prepared.chip, prepared.options.port)
+
+def preflight_program_images(job: Dict[str, Any], chip) -> Optional[intelhex.HexImage]:
+    """Parse and size-check the images of a program job; returns the flash image, if any."""
+    image = None
+    if job.get("flash_file"):
+        image = intelhex.preflight(job["flash_file"], chip.flash_size, "flash")
+    if job.get("eeprom_file"):
+        intelhex.preflight(job["eeprom_file"], chip.eeprom_size, "EEPROM")
+    return image
+
+def job_program_steps(job: Dict[str, Any], chip) -> List[commands.ProgramStep]:
+    """Order the steps of a program job whose images passed preflight_program_images()."""
+    fuses = {fuse: job[fuse] for fuse in commands.FUSE_ORDER if job.get(fuse)}
+    steps = commands.plan_program_board(job.get("flash_file"), job.get("eeprom_file"),
+                                        fuses, job.get("lock"))
+    if not steps:
+        raise ValueError("Nothing to program")
+    return steps
+
+def run_job(job: Dict[str, Any], chip_database, dry_run: bool = False, quiet: bool = False) -> int:
+    """Run one job and return the avrdude exit code."""
+    if job.get("action") == "unit":
+        return run_unit(job, chip_database, dry_run, quiet)
+
+    prepared = prepare_job(job, chip_database)
+    if dry_run:
+        print(" ".join(prepared.command))
+        return 0
+
+    if job.get("local") and (job["action"] == "verify" or job.get("mode") == "verify"):
+        return verify_locally(job, prepared, quiet)
+
+    if job["action"] == "flash":
+        if job.get("differential") and commands.supports_page_erase(prepared.chip, prepared.options):
+            return run_differential_flash(job, prepared, quiet)
+        if job.get("skip_identical") and flash_is_current(job, prepared, quiet):
+            print(f"{job['file']}: already current, skipping write")
+            return 0
+        return run_full_flash(job, prepared, quiet)
+
+    returncode = run_avrdude(prepared.command, job.get("timeout"), quiet, policy=job_retry_policy(job))
+    if job["action"] == "program" and prepared.image is not None:
+        remember_flash(prepared, returncode)
+    return returncode
+
+def load_jobs(file_path: str) -> List[Dict[str, Any]]:
+    """Load jobs from a JSON list or a JSON-lines file."""
+    with open(file_path, "r") as file:
+        text = file.read()
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+def job_from_args(args) -> Dict[str, Any]:
+    job = {
+        "action": args.action,
+        "chip": args.chip,
+        "programmer": args.programmer,
+        "port": args.port,
+        "bit_clock": args.bit_clock,
+        "retry_count": args.retry_count,
+        "disable_fuse_check": args.disable_fuse_check,
+        "timeout": args.timeout,
+        "smart_retry": args.smart_retry,
+        "retry_budget": args.retry_budget,
+    }
+    if args.action in ("flash", "read", "verify"):
+        job["file"] = args.file
+    if args.action in ("verify", "eeprom"):
+        job["local"] = args.local
+    if args.action == "flash":
+        job["erase"] = not args.no_erase
+        job["verify"] = not args.no_verify
+        job["skip_identical"] = args.skip_identical
+        job["differential"] = args.differential
+    if args.action == "eeprom":
+        job["mode"] = args.mode
+        job["file"] = args.file
+        job["verify"] = not args.no_verify
+    if args.action == "program":
+        job["flash_file"] = args.flash
+        job["eeprom_file"] = args.eeprom
+        job["lock"] = args.lock
+        job["erase"] = not args.no_erase
+        job["verify"] = not args.no_verify
+    if args.action == "unit":
+        job["patches"] = args.patches
+        job["unit"] = args.unit
+        job["flash_file"] = args.flash
+        job["eeprom_file"] = args.eeprom
+        job["values"] = dict(value.split("=", 1) for value in args.set)
+        job["print_hex"] = args.print_hex
+        job["erase"] = not args.no_erase
+        job["verify"] = not args.no_verify
+    if args.action == "fuses":
+        job["mode"] = "write" if args.write else "read"
+    if args.action in ("fuses", "program"):
+        for fuse in ("lfuse", "hfuse", "efuse"):
+            if getattr(args, fuse):
+                job[fuse] = getattr(args, fuse)
+    return job
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Headless AVR flasher")
+    parser.add_argument("--db", default=None,
+                        help="Chip database JSON file or avrdude.conf (default: the installed "
+                             "avrdude.conf, else the bundled chips.json)")
+    parser.add_argument("-n", "--dry-run", action="store_true",
+                        help="Print avrdude commands instead of running them")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Hide avrdude output")
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("-p", "--chip", required=True, help="Chip model, e.g. m328p")
+    common.add_argument("-c", "--programmer", default="usbasp")
+    common.add_argument("-P", "--port", default=None)
+    common.add_argument("-B", "--bit-clock", type=float, default=None,
+                        help="Bit clock period in µs (default: the tuned value, else the "
+                             "programmer's default)")
+    common.add_argument("-r", "--retry-count", type=int, default=3)
+    common.add_argument("-u", "--disable-fuse-check", action="store_true")
+    common.add_argument("--timeout", type=float, default=None,
+                        help="Stop avrdude after this many seconds")
+    common.add_argument("--smart-retry", action="store_true",
+                        help="Retry USB and sync failures with backoff, slowing the bit clock")
+    common.add_argument("--retry-budget", type=float, default=RetryPolicy.budget,
+                        help="Seconds after which --smart-retry stops retrying")
+
+    subparsers = parser.add_subparsers(dest="action", required=True)
+
+    flash = subparsers.add_parser("flash", parents=[common], help="Write flash")
+    flash.add_argument("file")
+    flash.add_argument("--no-erase", action="store_true")
+    flash.add_argument("--no-verify", action="store_true")
+    flash.add_argument("--skip-identical", action="store_true",
+                       help="Read the flash first and skip the write if it already matches")
+    flash.add_argument("--differential", action="store_true",
+                       help="Write only changed pages on parts that support page erase")
+
+    read = subparsers.add_parser("read", parents=[common], help="Read flash to a file")
+    read.add_argument("file")
+
+    verify = subparsers.add_parser("verify", parents=[common], help="Verify flash against a file")
+    verify.add_argument("--local", action="store_true",
+                        help="Read the flash back once and compare the file's ranges locally")
+    verify.add_argument("file")
+
+    fuses = subparsers.add_parser("fuses", parents=[common], help="Read or write fuses")
+    fuses.add_argument("--write", action="store_true", help="Write instead of read")
+    fuses.add_argument("--lfuse")
+    fuses.add_argument("--hfuse")
+    fuses.add_argument("--efuse")
+
+    eeprom = subparsers.add_parser("eeprom", parents=[common], help="Read, write or verify EEPROM")
+    eeprom.add_argument("mode", choices=["read", "write", "verify"])
+    eeprom.add_argument("file")
+    eeprom.add_argument("--no-verify", action="store_true")
+    eeprom.add_argument("--local", action="store_true",
+                        help="With verify, compare a single read-back locally")
+
+    program = subparsers.add_parser("program", parents=[common],
+                                    help="Write flash, EEPROM, fuses and lock bits in one session")
+    program.add_argument("--flash")
+    program.add_argument("--eeprom")
+    program.add_argument("--lfuse")
+    program.add_argument("--hfuse")
+    program.add_argument("--efuse")
+    program.add_argument("--lock")
+    program.add_argument("--no-erase", action="store_true")
+    program.add_argument("--no-verify", action="store_true")
+    program.add_argument("--plan", action="store_true", help="Show the plan without running it")
+
+    unit = subparsers.add_parser("unit", parents=[common],
+                                 help="Program one production unit with per-unit patches")
+    unit.add_argument("--patches", required=True, help="JSON list of patch fields")
+    unit.add_argument("--unit", type=int, default=0, help="Unit number the counters count from")
+    unit.add_argument("--flash", help="Base flash image")
+    unit.add_argument("--eeprom", help="Base EEPROM image")
+    unit.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                      help="Template value for this unit, e.g. calibration=a1b2")
+    unit.add_argument("--print-hex", action="store_true",
+                      help="Print the patched images instead of programming them")
+    unit.add_argument("--no-erase", action="store_true")
+    unit.add_argument("--no-verify", action="store_true")
+
+    batch = subparsers.add_parser("batch", help="Run jobs from a JSON or JSON-lines file")
+    batch.add_argument("jobs")
+    batch.add_argument("--keep-going", action="store_true", help="Continue after a failed job")
+
+    station_parser = subparsers.add_parser(
+        "station", help="Run jobs on every board inserted into the programming slot")
+    station_parser.add_argument("jobs", help="JSON or JSON-lines file of jobs to run per board, as for batch")
+    station_parser.add_argument("--presence", choices=["auto", "usb", "signature"], default="auto",
+                                help="How boards are detected (default: usb for bootloader "
+                                     "programmers, else signature polls)")
+    station_parser.add_argument("--sysfs-root", default=SYSFS_USB_DEVICES,
+                                help="Where USB devices are listed")
+    station_parser.add_argument("--debounce", type=float, default=None,
+                                help="Seconds a board must be present, or gone, to count")
+    station_parser.add_argument("--interval", type=float, default=None,
+                                help="Seconds between presence polls")
+    station_parser.add_argument("--count", type=int, default=0,
+                                help="Stop after this many boards (default: until interrupted)")
+
+    subparsers.add_parser("db", help="Show chip database statistics and signature problems")
+
+    tune = subparsers.add_parser("tune", parents=[common],
+                                 help="Find and store the fastest reliable bit clock")
+    tune.add_argument("--trials", type=int, default=None,
+                      help="Reads that must match at a clock for it to count as reliable")
+
+    return parser
+
+def report_database(chip_database) -> int:
+    parts = sum(len(chips) for chips in chip_database.values())
+    print(f"{chip_database.path}: {parts} parts in {len(chip_database)} families, "
+          f"{len(chip_database.by_signature)} signatures")
+    for line in chip_database.signature_report():
+        print(f"  {line}")
+    return 0
+
+def tune_bit_clock(args, chip_database) -> int:
+    import clocktune
+    # The tuner sets -B itself, so an earlier tuned value must not be applied
+    chip, options = job_chip_and_options(job_from_args(args), chip_database, tuned=False)
+    trials = clocktune.TRIALS if args.trials is None else args.trials
+    tuner = clocktune.ClockTuner(chip, options, trials=trials)
+    if not args.quiet:
+        tuner.on_output = lambda line: print(line, file=sys.stderr, flush=True)
+    try:
+        bit_clock = tuner.tune()
+    except clocktune.TuneError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    clocktune.store_tuned_bit_clock(chip, options, bit_clock)
+    print(f"{chip.name} on {device_key(options.programmer, options.port)}: -B {bit_clock:g}")
+    return 0
+
+def run_station(args, chip_database) -> int:
+    """Run the jobs on each board inserted into the slot; see station.py."""
+    import station
+    jobs = load_jobs(args.jobs)
+    if not jobs:
+        raise ValueError("No jobs to run")
+    chip, options = job_chip_and_options(jobs[0], chip_database)
+    presence_kind = args.presence
+    if presence_kind == "auto":
+        presence_kind = "usb" if options.programmer in BOOTLOADER_PROGRAMMERS else "signature"
+    if presence_kind == "usb":
+        presence = station.UsbPresence(args.sysfs_root)
+        poll = presence.poll
+    else:
+        presence = station.SignaturePresence(chip, options)
+        poll = lambda: presence.board(run_avrdude_captured(presence.command, presence.interval * 10,
+                                                           quiet=True))
+
+    def program(board):
+        returncode = 0
+        for job in jobs:
+            # Every board is new, so the last written image says nothing about it
+            job = dict(job, new_board=True)
+            if board.port:
+                job["port"] = board.port
+            try:
+                returncode = run_job(job, chip_database, args.dry_run, args.quiet)
+            except (ValueError, OSError) as e:
+                print(f"Error: {e}", file=sys.stderr)
+                returncode = 2
+            if returncode != 0:
+                break
+        if returncode == 0:
+            # The next board is the next production unit
+            for job in jobs:
+                if job.get("action") == "unit":
+                    job["unit"] = int(job.get("unit", 0)) + 1
+        slot.job_done(returncode == 0)
+
+    def changed(state, board):
+        text = station.describe_state(state, board)
+        if state in (station.PASSED, station.FAILED):
+            text += f" ({slot.passed} passed, {slot.failed} failed)"
+        print(f"[{time.strftime('%H:%M:%S')}] {text}", flush=True)
+
+    debounce = station.DEBOUNCE if args.debounce is None else args.debounce
+    slot = station.Station(program, debounce, changed)
+    interval = args.interval or presence.interval
+    print(f"[{time.strftime('%H:%M:%S')}] {station.describe_state(slot.state, None)}", flush=True)
+    try:
+        while not args.count or slot.passed + slot.failed < args.count:
+            slot.update(poll())
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    print(f"{slot.passed} passed, {slot.failed} failed")
+    return 1 if slot.failed else 0
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    chip_database = load_chip_database(args.db or default_database_path())
+
+    if args.action == "db":
+        return report_database(chip_database)
+
+    if args.action == "tune":
+        try:
+            return tune_bit_clock(args, chip_database)
+        except (ValueError, RuntimeError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+
+    if args.action == "station":
+        try:
+            return run_station(args, chip_database)
+        except (ValueError, OSError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+
+    if args.action == "program" and args.plan:
+        try:
+            job = job_from_args(args)
+            chip, options = job_chip_and_options(job, chip_database)
+            preflight_program_images(job, chip)
+            print(commands.describe_plan(chip, options, job_program_steps(job, chip)))
+            return 0
+        except (ValueError, OSError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+
+    if args.action != "batch":
+        try:
+            return run_job(job_from_args(args), chip_database, args.dry_run, args.quiet)
+        except (ValueError, OSError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+
+    jobs = load_jobs(args.jobs)
+    failed = 0
+    for index, job in enumerate(jobs, 1):
+        try:
+            returncode = run_job(job, chip_database, args.dry_run, args.quiet)
+        except (ValueError, OSError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            returncode = 2
+        status = "PASS" if returncode == 0 else f"FAIL ({returncode})"
+        print(f"[{index}/{len(jobs)}] {job.get('action')} {job.get('chip')}: {status}")
+        if returncode != 0:
+            failed += 1
+            if not args.keep_going:
+                break
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
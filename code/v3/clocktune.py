@@ -0,0 +1,166 @@
+"""Find the fastest bit clock that talks to a target reliably.
+
+avrdude's ``-B`` sets the ISP clock period in microseconds. Too slow wastes
+time on every write; too fast gives intermittent sync and verify errors.
+ClockTuner first reads the signature and the start of flash at a slow,
+safe period as the reference, then binary searches BIT_CLOCKS for the
+shortest period at which several reads in a row still match it. Nothing is
+written to the target.
+
+Results are stored per programmer (``usbasp@usb:<serial>``) and chip model
+and picked up by later commands through tuned_bit_clock().
+"""
+import json
+import os
+import time
+from dataclasses import replace
+from typing import Callable, Dict, List, Optional
+
+from chipdb import ChipInfo
+from commands import CommandOptions
+from programmers import BOOTLOADER_PROGRAMMERS, UPDI_PROGRAMMERS
+from scheduler import device_key
+from terminal import TerminalSession, TerminalSessionError
+
+PROFILE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "avrflasher", "bit_clock.json")
+
+# Candidate periods in µs, fastest first
+BIT_CLOCKS = [0.125, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64]
+
+PATTERN_LENGTH = 256
+TRIALS = 3
+
+# Bootloader and UPDI programmers have no ISP clock to tune
+UNTUNABLE_PROGRAMMERS = BOOTLOADER_PROGRAMMERS | UPDI_PROGRAMMERS
+
+class TuneError(RuntimeError):
+    pass
+
+class ClockTuner:
+    """Searches for the fastest working bit clock of one chip on one programmer.
+
+    Has the ``on_output``/``interrupted``/``interrupt()`` interface of a
+    TerminalSession, so it can be run by the same worker.
+    """
+    def __init__(self, chip: ChipInfo, options: CommandOptions, clocks: List[float] = BIT_CLOCKS,
+                 trials: int = TRIALS, session_timeout: float = 15.0):
+        if options.programmer in UNTUNABLE_PROGRAMMERS:
+            raise TuneError(f"{options.programmer} has no adjustable bit clock")
+        self.chip = chip
+        self.options = options
+        self.clocks = sorted(clocks)
+        self.trials = trials
+        self.session_timeout = session_timeout
+        self.on_output: Optional[Callable[[str], None]] = None
+        self.interrupted = False
+        self.session: Optional[TerminalSession] = None
+        self.signature = bytes.fromhex(chip.signature[2:])
+        self.pattern_length = min(PATTERN_LENGTH, chip.flash_size)
+
+    def interrupt(self):
+        self.interrupted = True
+        session = self.session
+        if session is not None:
+            session.interrupt()
+
+    def _log(self, message: str):
+        if self.on_output:
+            self.on_output(message)
+
+    def _read(self, bit_clock: float, count: int) -> Optional[List[bytes]]:
+        """Signature plus test block, read ``count`` times in one session; None on failure."""
+        session = TerminalSession.for_chip(self.chip, replace(self.options, bit_clock=bit_clock),
+                                           timeout=self.session_timeout)
+        self.session = session
+        try:
+            reads = []
+            for _ in range(count):
+                if self.interrupted:
+                    raise TuneError("tuning interrupted")
+                signature = session.read_memory("signature", 0, 3)
+                if signature != self.signature:
+                    self._log(f"  -B {bit_clock:g}: signature 0x{signature.hex().upper()}")
+                    return None
+                reads.append(session.read_memory("flash", 0, self.pattern_length))
+            return reads
+        except (OSError, TerminalSessionError) as e:
+            if self.interrupted:
+                raise TuneError("tuning interrupted")
+            self._log(f"  -B {bit_clock:g}: {e}")
+            return None
+        finally:
+            self.session = None
+            session.close()
+
+    def reference(self) -> bytes:
+        """The test block read at the slowest clock, with one retry for a flaky connect."""
+        for _ in range(2):
+            reads = self._read(self.clocks[-1], 1)
+            if reads is not None:
+                return reads[0]
+        raise TuneError(f"no {self.chip.name} answered even at -B {self.clocks[-1]:g}")
+
+    def passes(self, bit_clock: float, reference: bytes) -> bool:
+        reads = self._read(bit_clock, self.trials)
+        if reads is None:
+            return False
+        if any(block != reference for block in reads):
+            self._log(f"  -B {bit_clock:g}: test block read back differently")
+            return False
+        self._log(f"  -B {bit_clock:g}: ok")
+        return True
+
+    def tune(self) -> float:
+        """Return the shortest reliable period; raises TuneError if none works."""
+        self._log(f"Tuning bit clock for {self.chip.name} on "
+                  f"{device_key(self.options.programmer, self.options.port)}")
+        reference = self.reference()
+        # Invariant: clocks[high] passes and every clock before clocks[low] failed
+        low, high = 0, len(self.clocks) - 1
+        while low < high:
+            middle = (low + high) // 2
+            if self.passes(self.clocks[middle], reference):
+                high = middle
+            else:
+                low = middle + 1
+        return self.clocks[high]
+
+def _profile_key(chip: ChipInfo, options: CommandOptions) -> str:
+    return f"{device_key(options.programmer, options.port)}/{chip.command}"
+
+def load_profiles(path: str = PROFILE_PATH) -> Dict[str, Dict]:
+    try:
+        with open(path, "r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+def store_tuned_bit_clock(chip: ChipInfo, options: CommandOptions, bit_clock: float,
+                          path: str = PROFILE_PATH):
+    profiles = load_profiles(path)
+    profiles[_profile_key(chip, options)] = {"bit_clock": bit_clock, "tuned_at": int(time.time())}
+    _store_profiles(profiles, path)
+
+def forget_tuned_bit_clock(chip: ChipInfo, options: CommandOptions, path: str = PROFILE_PATH):
+    profiles = load_profiles(path)
+    if profiles.pop(_profile_key(chip, options), None) is not None:
+        _store_profiles(profiles, path)
+
+def _store_profiles(profiles: Dict[str, Dict], path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as file:
+        json.dump(profiles, file, indent=1, sort_keys=True)
+    os.replace(temp_path, path)
+
+def tuned_bit_clock(chip: ChipInfo, options: CommandOptions,
+                    path: str = PROFILE_PATH) -> Optional[float]:
+    """The stored bit clock for this chip and programmer, if it was tuned."""
+    profile = load_profiles(path).get(_profile_key(chip, options))
+    return profile["bit_clock"] if profile else None
+
+def apply_tuned_bit_clock(chip: ChipInfo, options: CommandOptions,
+                          path: str = PROFILE_PATH) -> CommandOptions:
+    """Options with the tuned bit clock, or unchanged if there is none."""
+    bit_clock = tuned_bit_clock(chip, options, path)
+    return options if bit_clock is None else replace(options, bit_clock=bit_clock)
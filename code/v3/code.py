@@ -1,92 +1,321 @@
+import time
+_STARTUP_T0 = time.perf_counter()
+
+import os
 import sys
-import json
-import subprocess
-from dataclasses import dataclass
-from typing import Dict, Any
+from collections import deque
+from dataclasses import replace
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                              QHBoxLayout, QComboBox, QPushButton, QTextEdit,
                              QLabel, QFileDialog, QGroupBox, QMessageBox,
-                             QTabWidget, QCheckBox, QSpinBox, QGridLayout)
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QSettings
-from PyQt6.QtGui import QFont
-
-@dataclass
-class ChipInfo:
-    command: str
-    name: str
-    signature: str
-    flash_size: int
-    eeprom_size: int
-    default_lfuse: str
-    default_hfuse: str
-    default_efuse: str
-    description: str
-
-    @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> 'ChipInfo':
-        """Create a ChipInfo instance from a dictionary."""
-        return cls(
-            command=data['command'],
-            name=data['name'],
-            signature=data['signature'],
-            flash_size=data['flash_size'],
-            eeprom_size=data['eeprom_size'],
-            default_lfuse=data['default_lfuse'],
-            default_hfuse=data['default_hfuse'],
-            default_efuse=data['default_efuse'],
-            description=data['description']
-        )
-
-def load_chip_database(file_path: str) -> Dict[str, Dict[str, Dict[str, Any]]]:
-    """Load chip database from a JSON file."""
-    try:
-        with open(file_path, "r") as file:
-            return json.load(file)
-    except (FileNotFoundError, json.JSONDecodeError) as e:
-        print(f"Error loading chip database: {e}")
-        sys.exit(1)
-
-# Load chip database from 'chips.json'
-# CHIP_DATABASE = load_chip_database("chips.json")
-
-class AvrdudeWorker(QThread):
+                             QTabWidget, QCheckBox, QSpinBox, QGridLayout,
+                             QTableWidget, QTableWidgetItem, QHeaderView,
+                             QPlainTextEdit, QProgressBar, QInputDialog, QLineEdit,
+                             QCompleter)
+from PyQt6.QtCore import (Qt, QObject, QThread, QTimer, pyqtSignal, QSettings,
+                          QAbstractListModel, QModelIndex)
+from PyQt6.QtGui import QFont, QColor, QTextCursor
+
+from chipdb import ChipInfo, default_database_path, load_chip_database
+from clocktune import ClockTuner, TuneError, apply_tuned_bit_clock, store_tuned_bit_clock
+from commands import (CommandOptions, base_command, write_flash_command,
+                      read_flash_command, verify_flash_command, read_fuses_command,
+                      write_fuses_command, write_eeprom_command, read_eeprom_command,
+                      verify_eeprom_command, supports_page_erase,
+                      write_flash_pages_command, plan_program_board,
+                      program_board_command, describe_plan, describe_command,
+                      parse_read_output, detect_signature_command, FUSE_ORDER)
+from differential import (changed_pages, delta_image, last_image_path, load_last_image,
+                          store_last_image, forget_last_image)
+from programmers import BOOTLOADER_PROGRAMMERS, Programmer, enumerate_programmers
+from station import (DEBOUNCE, FAILED, PASSED, RUNNING, SETTLING, WAITING,
+                     SignaturePresence, Station, UsbPresence, describe_state)
+from terminal import TerminalSession
+from scheduler import JobScheduler, device_key
+from retry import RetryPolicy
+from runner import ProcessResult
+import intelhex
+import patching
+
+_STARTUP_IMPORTED = time.perf_counter()
+
+class ConsoleWidget(QPlainTextEdit):
+    """Read-only console that keeps at most ``max_lines`` lines.
+
+    Appended text is queued and written in one batch per timer tick, so a
+    flood of avrdude output costs a few dozen repaints a second at most.
+    ``update_line`` shows a line that the next one replaces, as avrdude's
+    progress bar redraws itself.
+    """
+    FLUSH_INTERVAL_MS = 40
+
+    def __init__(self, max_lines=10000, parent=None):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setFont(QFont("Courier"))
+        self.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        self.pending = deque()
+        # The last line is an in-place update, shown or still pending
+        self.last_is_update = False
+        self.replace_last_block = False
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(self.FLUSH_INTERVAL_MS)
+        self.flush_timer.timeout.connect(self.flush)
+        self.set_max_lines(max_lines)
+
+    def set_max_lines(self, max_lines):
+        self.max_lines = max_lines
+        self.setMaximumBlockCount(max_lines)
+        self.pending = deque(self.pending, maxlen=max_lines)
+
+    def append(self, text):
+        self._add(text, False)
+
+    def update_line(self, text):
+        self._add(text, True)
+
+    def _add(self, text, is_update):
+        if self.last_is_update and self.pending:
+            self.pending[-1] = text
+        else:
+            if self.last_is_update:
+                self.replace_last_block = True
+            self.pending.append(text)
+        self.last_is_update = is_update
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def flush(self):
+        if not self.pending:
+            return
+        if self.replace_last_block:
+            self.replace_last_block = False
+            cursor = QTextCursor(self.document().lastBlock())
+            cursor.movePosition(QTextCursor.MoveOperation.EndOfBlock, QTextCursor.MoveMode.KeepAnchor)
+            cursor.insertText(self.pending.popleft())
+        if self.pending:
+            text = "\n".join(self.pending)
+            self.pending.clear()
+            self.appendPlainText(text)
+
+    def clear(self):
+        self.pending.clear()
+        self.last_is_update = False
+        self.replace_last_block = False
+        super().clear()
+
+    def toPlainText(self):
+        self.flush()
+        return super().toPlainText()
+
+_background_loop = None
+
+def background_loop():
+    """The event loop every avrdude session runs on, started with the first job."""
+    global _background_loop
+    if _background_loop is None:
+        # asyncio adds tens of milliseconds to start-up, so it loads on first use
+        from flasher import BackgroundLoop
+        _background_loop = BackgroundLoop()
+    return _background_loop
+
+class AvrdudeWorker(QObject):
+    """Qt adapter for a flasher.FlashSession on the shared background loop.
+
+    The session's output arrives on the loop thread and is passed on as
+    signals, which Qt delivers to the GUI thread. ``error_record`` carries
+    each diagnostics.ErrorRecord as avrdude reports it.
+    """
     finished = pyqtSignal(str)
     error = pyqtSignal(str)
     progress = pyqtSignal(str)
+    progress_update = pyqtSignal(str)
+    progress_event = pyqtSignal(object)
+    error_record = pyqtSignal(object)
+    result = pyqtSignal(object)
 
-    def __init__(self, command):
+    def __init__(self, command, memory_sizes=None, timeout=None, input=None, policy=None):
         super().__init__()
         self.command = command
+        self.memory_sizes = memory_sizes
+        self.timeout = timeout
+        self.input = input
+        self.policy = policy
+        self.session = None
+        self.cancelled = False
+        self.future = None
+        self._wake = None
+
+    def start(self):
+        self.future = background_loop().submit(self.run())
+
+    def cancel(self):
+        background_loop().call(self._cancel)
+
+    def wait(self):
+        if self.future is not None:
+            self.future.result()
+
+    def _cancel(self):
+        self.cancelled = True
+        if self.session is not None:
+            self.session.cancel()
+        if self._wake is not None:
+            self._wake.set()
+
+    async def attempt(self, command):
+        from flasher import FlashSession
+        if self.cancelled:
+            return ProcessResult(None, cancelled=True)
+        self.session = FlashSession(
+            command, self.timeout, self.memory_sizes, self.input,
+            on_line=lambda line: self.progress.emit(line.strip()),
+            on_update=lambda line: self.progress_update.emit(line.strip()),
+            on_event=self.progress_event.emit,
+            on_error=self.error_record.emit)
+        return await self.session
+
+    async def backoff(self, delay):
+        import asyncio
+        # Cancel ends the wait early; the next attempt then reports the cancel
+        self._wake = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._wake.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
 
-    def run(self):
+    async def run(self):
+        from flasher import run_with_retry
         try:
-            process = subprocess.Popen(
-                self.command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                shell=True,
-                bufsize=1,
-                universal_newlines=True
-            )
+            if self.policy is None:
+                result = await self.attempt(self.command)
+            else:
+                result = await run_with_retry(self.attempt, self.command, self.policy,
+                                              on_retry=self.progress.emit, sleep=self.backoff)
+            self.result.emit(result)
+            if result.ok:
+                self.finished.emit(result.describe())
+            else:
+                self.error.emit(result.describe(self.timeout))
+
+        except Exception as e:
+            self.error.emit(str(e))
 
-            while True:
-                output = process.stderr.readline()
-                if output == '' and process.poll() is not None:
-                    break
-                if output:
-                    self.progress.emit(output.strip())
+class SessionWorker(QThread):
+    """Runs a function against a persistent TerminalSession off the GUI thread."""
+    finished = pyqtSignal(str)
+    error = pyqtSignal(str)
+    progress = pyqtSignal(str)
+    result = pyqtSignal(object)
 
-            returncode = process.poll()
+    def __init__(self, session, func):
+        super().__init__()
+        self.session = session
+        self.func = func
 
-            if returncode == 0:
-                self.finished.emit("Operation completed successfully!")
-            else:
-                self.error.emit("Operation failed with error code: " + str(returncode))
+    def cancel(self):
+        self.session.interrupt()
 
+    def run(self):
+        self.session.on_output = self.progress.emit
+        self.session.interrupted = False
+        try:
+            message, result = self.func(self.session)
+            self.result.emit(result)
+            self.finished.emit(message)
         except Exception as e:
             self.error.emit(str(e))
 
+class ChipListModel(QAbstractListModel):
+    """Chips matching the current search query, as (family, model) rows."""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.database = None
+        self.refs = []
+
+    def set_database(self, database):
+        self.database = database
+        self.set_query("")
+
+    def set_query(self, text):
+        self.beginResetModel()
+        self.refs = self.database.search(text) if self.database is not None else []
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.refs)
+
+    def display(self, ref):
+        chip = self.database.chip(*ref)
+        return f"{chip.name} ({ref[1]}, {chip.signature})"
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.refs):
+            return None
+        ref = self.refs[index.row()]
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            return self.display(ref)
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return f"{ref[0]}: {self.database.chip(*ref).description}"
+        if role == Qt.ItemDataRole.UserRole:
+            return ref
+        return None
+
+class ChipSelector(QLineEdit):
+    """Type-to-filter chip selector over name, part id, signature and description."""
+    chip_selected = pyqtSignal(str, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.current = None
+        self.setPlaceholderText("Type a name, part id or signature...")
+        self.setClearButtonEnabled(True)
+        self.model = ChipListModel(self)
+        self.completer = QCompleter(self.model, self)
+        # The model does the filtering, the completer only shows its rows
+        self.completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        self.completer.setMaxVisibleItems(15)
+        self.setCompleter(self.completer)
+        self.completer.activated[QModelIndex].connect(self.on_activated)
+        self.textEdited.connect(self.on_text_edited)
+        self.returnPressed.connect(self.on_return_pressed)
+        self.editingFinished.connect(self.show_current)
+
+    def set_database(self, database):
+        self.model.set_database(database)
+
+    def on_text_edited(self, text):
+        self.model.set_query(text)
+        self.completer.complete()
+
+    def on_activated(self, index):
+        source = self.completer.completionModel().mapToSource(index)
+        self.select(*self.model.refs[source.row()])
+
+    def on_return_pressed(self):
+        if self.model.refs and self.text() != self.display_current():
+            self.select(*self.model.refs[0])
+
+    def select(self, family, model):
+        """Select a chip; a model missing from ``family`` is looked up in all families."""
+        database = self.model.database
+        if family not in database or model not in database[family]:
+            family = database.family_of(model)
+            if family is None:
+                return False
+        self.current = (family, model)
+        self.show_current()
+        self.chip_selected.emit(family, model)
+        return True
+
+    def display_current(self):
+        return self.model.display(self.current) if self.current else ""
+
+    def show_current(self):
+        if self.current is not None:
+            self.setText(self.display_current())
+
 class ChipInfoWidget(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -138,6 +367,18 @@ class AdvancedOptionsWidget(QWidget):
         self.disable_fuse_check = QCheckBox("Disable fuse verification")
         prog_layout.addWidget(self.disable_fuse_check, 1, 0)
 
+        self.skip_identical_check = QCheckBox("Skip write if flash already matches")
+        prog_layout.addWidget(self.skip_identical_check, 1, 1)
+
+        self.differential_check = QCheckBox("Write changed pages only (page-erase parts)")
+        prog_layout.addWidget(self.differential_check, 2, 0)
+
+        self.persistent_session_check = QCheckBox("Keep programmer session open (terminal mode)")
+        prog_layout.addWidget(self.persistent_session_check, 2, 1)
+
+        self.local_verify_check = QCheckBox("Verify locally from one read-back")
+        prog_layout.addWidget(self.local_verify_check, 3, 0)
+
         prog_group.setLayout(prog_layout)
         layout.addWidget(prog_group)
 
@@ -150,6 +391,17 @@ class AdvancedOptionsWidget(QWidget):
         self.bit_clock.setRange(0, 250)
         self.bit_clock.setValue(1)
         timing_layout.addWidget(self.bit_clock, 0, 1)
+        self.tune_clock_btn = QPushButton("Auto-Tune")
+        self.tune_clock_btn.setToolTip("Find the fastest bit clock that reads this chip reliably")
+        timing_layout.addWidget(self.tune_clock_btn, 0, 2)
+
+        self.tuned_clock_check = QCheckBox("Use the tuned bit clock of the chip and programmer")
+        self.tuned_clock_check.setChecked(True)
+        timing_layout.addWidget(self.tuned_clock_check, 3, 0, 1, 3)
+
+        self.smart_retry_check = QCheckBox("Retry USB and sync failures with backoff and a slower clock")
+        self.smart_retry_check.setChecked(True)
+        timing_layout.addWidget(self.smart_retry_check, 4, 0, 1, 3)
 
         timing_layout.addWidget(QLabel("Connect Retry Count:"), 1, 0)
         self.retry_count = QSpinBox()
@@ -157,24 +409,261 @@ class AdvancedOptionsWidget(QWidget):
         self.retry_count.setValue(3)
         timing_layout.addWidget(self.retry_count, 1, 1)
 
+        timing_layout.addWidget(QLabel("Operation Timeout (s, 0 = none):"), 2, 0)
+        self.operation_timeout = QSpinBox()
+        self.operation_timeout.setRange(0, 3600)
+        self.operation_timeout.setValue(300)
+        timing_layout.addWidget(self.operation_timeout, 2, 1)
+
         timing_group.setLayout(timing_layout)
         layout.addWidget(timing_group)
 
+        # Console Options
+        console_group = QGroupBox("Console Options")
+        console_layout = QGridLayout()
+
+        console_layout.addWidget(QLabel("Maximum Console Lines:"), 0, 0)
+        self.console_lines = QSpinBox()
+        self.console_lines.setRange(100, 1000000)
+        self.console_lines.setSingleStep(1000)
+        self.console_lines.setValue(10000)
+        console_layout.addWidget(self.console_lines, 0, 1)
+
+        console_group.setLayout(console_layout)
+        layout.addWidget(console_group)
+
         # Add stretcher
         layout.addStretch()
 
+class LazyTab(QWidget):
+    """Tab placeholder that builds its real widget the first time it is shown.
+
+    ``widget()`` also builds on demand, so code that needs the widget's state
+    before the user opens the tab still works.
+    """
+    def __init__(self, factory, on_built=None, parent=None):
+        super().__init__(parent)
+        self._factory = factory
+        self._on_built = on_built
+        self._widget = None
+        self._layout = QVBoxLayout(self)
+        self._layout.setContentsMargins(0, 0, 0, 0)
+
+    def is_built(self):
+        return self._widget is not None
+
+    def widget(self):
+        if self._widget is None:
+            self._widget = self._factory()
+            self._layout.addWidget(self._widget)
+            if self._on_built:
+                self._on_built(self._widget)
+        return self._widget
+
+    def showEvent(self, event):
+        self.widget()
+        super().showEvent(event)
+
+class GangWidget(QWidget):
+    """Lists attached programmers and shows per-port status for gang flashing."""
+    COLUMNS = ["Use", "Programmer", "Port", "Status", "Last Output"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+        self.programmers = []
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(
+            len(self.COLUMNS) - 1, QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.table)
+
+        button_layout = QHBoxLayout()
+        self.refresh_btn = QPushButton("Refresh Programmers")
+        self.refresh_btn.clicked.connect(self.refresh)
+        self.flash_all_btn = QPushButton("Write Flash (All Selected)")
+        button_layout.addWidget(self.refresh_btn)
+        button_layout.addWidget(self.flash_all_btn)
+        layout.addLayout(button_layout)
+
+        self.summary_label = QLabel("")
+        layout.addWidget(self.summary_label)
+
+    def refresh(self):
+        """Re-enumerate programmers and rebuild the table."""
+        self.programmers = enumerate_programmers()
+        self.table.setRowCount(len(self.programmers))
+        for row, programmer in enumerate(self.programmers):
+            use_item = QTableWidgetItem()
+            if programmer.addressable:
+                use_item.setFlags(Qt.ItemFlag.ItemIsUserCheckable | Qt.ItemFlag.ItemIsEnabled)
+                use_item.setCheckState(Qt.CheckState.Checked)
+            else:
+                # avrdude cannot pick this one out of several of its kind
+                use_item.setFlags(Qt.ItemFlag.ItemIsUserCheckable)
+                use_item.setCheckState(Qt.CheckState.Unchecked)
+            self.table.setItem(row, 0, use_item)
+            self.table.setItem(row, 1, QTableWidgetItem(programmer.description))
+            self.table.setItem(row, 2, QTableWidgetItem(programmer.port or "-"))
+            self.table.setItem(row, 3, QTableWidgetItem(
+                "Idle" if programmer.addressable else "Not addressable (no USB serial)"))
+            self.table.setItem(row, 4, QTableWidgetItem(""))
+        addressable = sum(programmer.addressable for programmer in self.programmers)
+        summary = f"{len(self.programmers)} programmer(s) found"
+        if addressable < len(self.programmers):
+            summary += f", {len(self.programmers) - addressable} not addressable"
+        self.summary_label.setText(summary)
+
+    def selected_programmers(self):
+        """Return (row, Programmer) pairs for checked rows."""
+        return [(row, programmer) for row, programmer in enumerate(self.programmers)
+                if programmer.addressable and self.table.item(row, 0).checkState() == Qt.CheckState.Checked]
+
+    def set_status(self, row, status, color=None):
+        item = QTableWidgetItem(status)
+        if color:
+            item.setBackground(QColor(color))
+        self.table.setItem(row, 3, item)
+
+    def set_last_output(self, row, text):
+        self.table.setItem(row, 4, QTableWidgetItem(text))
+
+class StationWidget(QWidget):
+    """Station mode settings and a large pass/fail indicator for the operator."""
+    PRESENCE = ["Signature poll (ISP programmer)", "USB serial device (bootloader)"]
+    JOBS = ["Write Flash", "Program Board", "Program Unit"]
+    COLORS = {WAITING: "#d0d0d0", SETTLING: "#f0e68c", RUNNING: "#87cefa",
+              PASSED: "#8fdc8f", FAILED: "#f08080"}
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+
+        settings_group = QGroupBox("Station Settings")
+        settings_layout = QGridLayout()
+        self.presence_combo = QComboBox()
+        self.presence_combo.addItems(self.PRESENCE)
+        self.programmer_combo = QComboBox()
+        self.programmer_combo.setEditable(True)
+        self.programmer_combo.addItems(sorted(BOOTLOADER_PROGRAMMERS))
+        self.programmer_combo.setCurrentText("arduino")
+        self.job_combo = QComboBox()
+        self.job_combo.addItems(self.JOBS)
+        self.debounce = QSpinBox()
+        self.debounce.setRange(0, 10000)
+        self.debounce.setSingleStep(100)
+        self.debounce.setSuffix(" ms")
+        self.debounce.setValue(int(DEBOUNCE * 1000))
+
+        settings_layout.addWidget(QLabel("Board Detection:"), 0, 0)
+        settings_layout.addWidget(self.presence_combo, 0, 1)
+        settings_layout.addWidget(QLabel("Bootloader Programmer:"), 1, 0)
+        settings_layout.addWidget(self.programmer_combo, 1, 1)
+        settings_layout.addWidget(QLabel("Job per Board:"), 2, 0)
+        settings_layout.addWidget(self.job_combo, 2, 1)
+        settings_layout.addWidget(QLabel("Debounce:"), 3, 0)
+        settings_layout.addWidget(self.debounce, 3, 1)
+        settings_group.setLayout(settings_layout)
+        layout.addWidget(settings_group)
+
+        self.start_btn = QPushButton("Start Station")
+        self.start_btn.setCheckable(True)
+        layout.addWidget(self.start_btn)
+
+        self.status_label = QLabel("Stopped")
+        self.status_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        font = QFont()
+        font.setPointSize(28)
+        font.setBold(True)
+        self.status_label.setFont(font)
+        self.status_label.setMinimumHeight(120)
+        layout.addWidget(self.status_label)
+
+        self.counts_label = QLabel("")
+        self.counts_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        layout.addWidget(self.counts_label)
+        layout.addStretch()
+
+    def uses_usb(self):
+        return self.presence_combo.currentIndex() == 1
+
+    def set_state(self, state, text, passed, failed):
+        self.status_label.setText(text)
+        self.status_label.setStyleSheet(f"background-color: {self.COLORS.get(state, '#d0d0d0')}")
+        self.counts_label.setText(f"{passed} passed, {failed} failed")
+
+class QueueWidget(QWidget):
+    """Shows running and queued jobs per programmer with position and ETA."""
+    COLUMNS = ["Programmer", "Job", "State", "Position", "ETA"]
+
+    def __init__(self, scheduler, cancel_job, parent=None):
+        super().__init__(parent)
+        self.scheduler = scheduler
+        self.cancel_job = cancel_job
+        self.jobs = []
+        layout = QVBoxLayout(self)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.table)
+
+        self.cancel_btn = QPushButton("Cancel Selected")
+        self.cancel_btn.clicked.connect(self.cancel_selected)
+        layout.addWidget(self.cancel_btn)
+
+    def refresh(self):
+        self.jobs = self.scheduler.jobs()
+        self.table.setRowCount(len(self.jobs))
+        for row, job in enumerate(self.jobs):
+            position = self.scheduler.position(job)
+            values = [job.device, job.description, job.state,
+                      "running" if position == 0 else str(position),
+                      f"{self.scheduler.eta(job):.0f}s"]
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, QTableWidgetItem(value))
+
+    def cancel_selected(self):
+        rows = {index.row() for index in self.table.selectedIndexes()}
+        for row in sorted(rows):
+            if row < len(self.jobs):
+                self.cancel_job(self.jobs[row])
+        self.refresh()
+
 class AVRFlasherGUI(QMainWindow):
-    def __init__(self):
+    def __init__(self, startup_profile=False):
         super().__init__()
         self.setWindowTitle("Advanced AVR Flasher")
         self.setMinimumSize(1000, 800)
+        widgets_start = time.perf_counter()
 
-        # Load chip database
-        self.chip_database = load_chip_database("chips.json")
+        # Chip database is loaded after the first paint, see finish_startup()
+        self.chip_database = {}
+        self.startup_profile = startup_profile
+        self.startup_times = {"imports": _STARTUP_IMPORTED - _STARTUP_T0}
+        self._first_paint_done = False
 
         # Store current chip info
         self.current_chip_info = None
 
+        # Persistent avrdude terminal session, opened on first use
+        self.terminal_session = None
+
+        # Jobs queue per programmer; running workers are kept by job id
+        self.scheduler = JobScheduler(on_change=self.update_queue_view)
+        self.workers = {}
+        self._follow_up = False
+        # Tag of the jobs queued now, "station" while a station board is programmed
+        self._job_tag = ""
+
+        # Gang jobs keyed by programmer label
+        self.gang_jobs = {}
+        self.gang_results = {}
+
         # Load settings
         self.settings = QSettings("AVRFlasher", "Settings")
 
@@ -183,8 +672,10 @@ class AVRFlasherGUI(QMainWindow):
         self.setCentralWidget(main_widget)
         layout = QVBoxLayout(main_widget)
 
-        # Create tab widget
+        # Create tab widget, disabled until the chip database is loaded
         tab_widget = QTabWidget()
+        tab_widget.setEnabled(False)
+        self.tab_widget = tab_widget
 
         # Main operations tab
         operations_tab = QWidget()
@@ -194,18 +685,16 @@ class AVRFlasherGUI(QMainWindow):
         chip_group = QGroupBox("Chip Selection")
         chip_layout = QGridLayout()
 
-        self.chip_family = QComboBox()
-        self.chip_family.addItems(self.chip_database.keys())
-        self.chip_family.currentTextChanged.connect(self.update_chip_list)
+        self.chip_selector = ChipSelector()
+        self.chip_selector.chip_selected.connect(self.update_chip_info)
 
-        self.chip_combo = QComboBox()
-        self.update_chip_list(self.chip_family.currentText())
-        self.chip_combo.currentTextChanged.connect(self.update_chip_info)
+        chip_layout.addWidget(QLabel("Chip:"), 0, 0)
+        chip_layout.addWidget(self.chip_selector, 0, 1, 1, 3)
 
-        chip_layout.addWidget(QLabel("Series:"), 0, 0)
-        chip_layout.addWidget(self.chip_family, 0, 1)
-        chip_layout.addWidget(QLabel("Model:"), 0, 2)
-        chip_layout.addWidget(self.chip_combo, 0, 3)
+        detect_btn = QPushButton("Detect")
+        detect_btn.setToolTip("Read the device signature and select the matching chip")
+        detect_btn.clicked.connect(self.detect_chip)
+        chip_layout.addWidget(detect_btn, 0, 4)
 
         chip_group.setLayout(chip_layout)
         operations_layout.addWidget(chip_group)
@@ -289,88 +778,266 @@ class AVRFlasherGUI(QMainWindow):
         eeprom_group.setLayout(eeprom_layout)
         operations_layout.addWidget(eeprom_group)
 
+        # Program board: flash, EEPROM, fuses and lock bits in one session
+        board_group = QGroupBox("Program Board")
+        board_layout = QGridLayout()
+
+        self.board_flash_check = QCheckBox("Flash")
+        self.board_flash_check.setChecked(True)
+        self.board_eeprom_check = QCheckBox("EEPROM")
+        self.board_fuses_check = QCheckBox("Fuses")
+        self.board_lock_check = QCheckBox("Lock Bits:")
+        self.lock_input = QComboBox()
+        self.lock_input.setEditable(True)
+        self.lock_input.addItems(["0x3C", "0x3F"])
+
+        board_layout.addWidget(self.board_flash_check, 0, 0)
+        board_layout.addWidget(self.board_eeprom_check, 0, 1)
+        board_layout.addWidget(self.board_fuses_check, 0, 2)
+        board_layout.addWidget(self.board_lock_check, 0, 3)
+        board_layout.addWidget(self.lock_input, 0, 4)
+
+        self.plan_view = QTextEdit()
+        self.plan_view.setReadOnly(True)
+        self.plan_view.setFont(QFont("Courier"))
+        self.plan_view.setMaximumHeight(120)
+        board_layout.addWidget(self.plan_view, 1, 0, 1, 5)
+
+        show_plan_btn = QPushButton("Show Plan")
+        show_plan_btn.clicked.connect(self.show_board_plan)
+        program_board_btn = QPushButton("Program Board")
+        program_board_btn.clicked.connect(self.program_board)
+        board_layout.addWidget(show_plan_btn, 2, 0, 1, 2)
+        board_layout.addWidget(program_board_btn, 2, 2, 1, 3)
+
+        board_group.setLayout(board_layout)
+        operations_layout.addWidget(board_group)
+
+        # Per-unit patching: serial numbers, MACs, calibration and CRCs
+        unit_group = QGroupBox("Production Unit")
+        unit_layout = QGridLayout()
+
+        self.patch_file_path = QLabel("No patch file selected")
+        select_patch_btn = QPushButton("Select Patch File")
+        select_patch_btn.clicked.connect(self.select_patch_file)
+        self.unit_number = QSpinBox()
+        self.unit_number.setRange(0, 10**9)
+        self.unit_number.setPrefix("Unit ")
+        self.unit_values = QLineEdit()
+        self.unit_values.setPlaceholderText("Template values, e.g. calibration=a1b2")
+        program_unit_btn = QPushButton("Program Unit")
+        program_unit_btn.clicked.connect(self.program_unit)
+
+        unit_layout.addWidget(select_patch_btn, 0, 0)
+        unit_layout.addWidget(self.patch_file_path, 0, 1, 1, 2)
+        unit_layout.addWidget(self.unit_number, 1, 0)
+        unit_layout.addWidget(self.unit_values, 1, 1)
+        unit_layout.addWidget(program_unit_btn, 1, 2)
+
+        unit_group.setLayout(unit_layout)
+        operations_layout.addWidget(unit_group)
+
         # Add operations tab to tab widget
         tab_widget.addTab(operations_tab, "Operations")
 
-        # Chip info tab
-        self.chip_info_widget = ChipInfoWidget()
-        tab_widget.addTab(self.chip_info_widget, "Chip Info")
-
-        # Advanced options tab
-        self.advanced_options = AdvancedOptionsWidget()
-        tab_widget.addTab(self.advanced_options, "Advanced Options")
+        # Chip info and advanced options tabs are built on first use
+        self.chip_info_tab = LazyTab(ChipInfoWidget, self.on_chip_info_built)
+        tab_widget.addTab(self.chip_info_tab, "Chip Info")
+
+        self.advanced_tab = LazyTab(AdvancedOptionsWidget, self.restore_advanced_settings)
+        tab_widget.addTab(self.advanced_tab, "Advanced Options")
+
+        # Job queue tab, refreshed while jobs are pending so ETAs count down
+        self.queue_widget = QueueWidget(self.scheduler, self.cancel_job)
+        tab_widget.addTab(self.queue_widget, "Job Queue")
+        self.queue_timer = QTimer(self)
+        self.queue_timer.setInterval(1000)
+        self.queue_timer.timeout.connect(self.update_queue_view)
+
+        # Gang programming tab
+        self.gang_widget = GangWidget()
+        self.gang_widget.flash_all_btn.clicked.connect(self.gang_write_flash)
+        tab_widget.addTab(self.gang_widget, "Gang Programming")
+
+        # Station mode: program each board as it is inserted
+        self.station_widget = StationWidget()
+        self.station_widget.start_btn.toggled.connect(self.toggle_station)
+        tab_widget.addTab(self.station_widget, "Station")
+        self.station = None
+        self.station_presence = None
+        self.station_programmer = None
+        self.station_results = None
+        self.station_polling = False
+        self.station_timer = QTimer(self)
+        self.station_timer.timeout.connect(self.poll_station)
 
         layout.addWidget(tab_widget)
 
         # Console output
         console_group = QGroupBox("Console Output")
         console_layout = QVBoxLayout()
-        self.console = QTextEdit()
-        self.console.setReadOnly(True)
-        self.console.setFont(QFont("Courier"))
+        self.console = ConsoleWidget(self.settings.value("console_lines", 10000, type=int))
         clear_console_btn = QPushButton("Clear Console")
         clear_console_btn.clicked.connect(self.console.clear)
 
         console_layout.addWidget(self.console)
         console_layout.addWidget(clear_console_btn)
+
+        # Progress of the running operation
+        self.progress_label = QLabel("Idle")
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.statusBar().addWidget(self.progress_label, 1)
+        self.statusBar().addPermanentWidget(self.progress_bar)
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.setToolTip("Stop running avrdude operations and clear the queue")
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.clicked.connect(self.cancel_all_jobs)
+        self.statusBar().addPermanentWidget(self.cancel_btn)
         console_group.setLayout(console_layout)
         layout.addWidget(console_group)
 
-        # Initialize chip info
-        self.update_chip_info(self.chip_combo.currentText())
-
-        # Restore settings
+        self.startup_times["widgets"] = time.perf_counter() - widgets_start
+
+    @property
+    def chip_info_widget(self):
+        return self.chip_info_tab.widget()
+
+    @property
+    def advanced_options(self):
+        return self.advanced_tab.widget()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self._first_paint_done:
+            self._first_paint_done = True
+            self.startup_times["first_paint"] = time.perf_counter() - _STARTUP_T0
+            QTimer.singleShot(0, self.finish_startup)
+
+    def finish_startup(self):
+        """Load the chip database and restore settings once the window is visible."""
+        start = time.perf_counter()
+        self.chip_database = load_chip_database(default_database_path())
+        self.startup_times["database"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.chip_selector.set_database(self.chip_database)
+        for family, chips in self.chip_database.items():
+            if chips:
+                self.select_chip(family, next(iter(chips)))
+                break
         self.restore_settings()
+        self.gang_widget.refresh()
+        self.tab_widget.setEnabled(True)
+        self.startup_times["populate"] = time.perf_counter() - start
+        self.startup_times["ready"] = time.perf_counter() - _STARTUP_T0
+
+        if self.startup_profile:
+            self.print_startup_profile()
+
+    def print_startup_profile(self):
+        times = self.startup_times
+        print("Startup profile (ms):", file=sys.stderr)
+        print(f"  imports      {times['imports'] * 1000:8.1f}", file=sys.stderr)
+        print(f"  widgets      {times['widgets'] * 1000:8.1f}", file=sys.stderr)
+        print(f"  first paint  {times['first_paint'] * 1000:8.1f}  (since start)", file=sys.stderr)
+        print(f"  database     {times['database'] * 1000:8.1f}", file=sys.stderr)
+        print(f"  populate     {times['populate'] * 1000:8.1f}", file=sys.stderr)
+        print(f"  ready        {times['ready'] * 1000:8.1f}  (since start)", file=sys.stderr)
 
     def closeEvent(self, event):
         # Save settings before closing
         self.save_settings()
+        self.station_timer.stop()
+        self.close_terminal_session()
         super().closeEvent(event)
 
     def save_settings(self):
-        self.settings.setValue("chip_family", self.chip_family.currentText())
-        self.settings.setValue("chip", self.chip_combo.currentText())
+        self.settings.setValue("station_presence", self.station_widget.presence_combo.currentIndex())
+        self.settings.setValue("station_programmer", self.station_widget.programmer_combo.currentText())
+        self.settings.setValue("station_job", self.station_widget.job_combo.currentIndex())
+        self.settings.setValue("station_debounce", self.station_widget.debounce.value())
+        if not self.chip_database:
+            return
+        if self.chip_selector.current is not None:
+            family, model = self.chip_selector.current
+            self.settings.setValue("chip_family", family)
+            self.settings.setValue("chip", model)
+
+        # An unopened advanced tab still holds the stored values
+        if not self.advanced_tab.is_built():
+            return
         self.settings.setValue("verify", self.advanced_options.verify_check.isChecked())
         self.settings.setValue("erase", self.advanced_options.erase_check.isChecked())
         self.settings.setValue("bit_clock", self.advanced_options.bit_clock.value())
         self.settings.setValue("retry_count", self.advanced_options.retry_count.value())
+        self.settings.setValue("operation_timeout", self.advanced_options.operation_timeout.value())
+        self.settings.setValue("console_lines", self.advanced_options.console_lines.value())
+        self.settings.setValue("skip_identical", self.advanced_options.skip_identical_check.isChecked())
+        self.settings.setValue("differential", self.advanced_options.differential_check.isChecked())
+        self.settings.setValue("persistent_session",
+                               self.advanced_options.persistent_session_check.isChecked())
+        self.settings.setValue("local_verify", self.advanced_options.local_verify_check.isChecked())
+        self.settings.setValue("tuned_bit_clock", self.advanced_options.tuned_clock_check.isChecked())
+        self.settings.setValue("smart_retry", self.advanced_options.smart_retry_check.isChecked())
 
     def restore_settings(self):
-        family = self.settings.value("chip_family", self.chip_family.currentText())
-        chip = self.settings.value("chip", self.chip_combo.currentText())
+        family = self.settings.value("chip_family", "")
+        chip = self.settings.value("chip", "")
 
         # Restore chip selection
-        index = self.chip_family.findText(family)
-        if index >= 0:
-            self.chip_family.setCurrentIndex(index)
-            self.update_chip_list(family)
-            index = self.chip_combo.findText(chip)
-            if index >= 0:
-                self.chip_combo.setCurrentIndex(index)
-
-        # Restore advanced options
-        self.advanced_options.verify_check.setChecked(
+        if chip:
+            self.select_chip(family, chip)
+
+        self.station_widget.presence_combo.setCurrentIndex(
+            self.settings.value("station_presence", 0, type=int))
+        self.station_widget.programmer_combo.setCurrentText(
+            self.settings.value("station_programmer", "arduino"))
+        self.station_widget.job_combo.setCurrentIndex(self.settings.value("station_job", 0, type=int))
+        self.station_widget.debounce.setValue(
+            self.settings.value("station_debounce", int(DEBOUNCE * 1000), type=int))
+
+    def select_chip(self, family, model):
+        self.chip_selector.select(family, model)
+
+    def restore_advanced_settings(self, advanced_options):
+        """Apply stored advanced options when the tab is built."""
+        advanced_options.verify_check.setChecked(
             self.settings.value("verify", True, type=bool))
-        self.advanced_options.erase_check.setChecked(
+        advanced_options.erase_check.setChecked(
             self.settings.value("erase", True, type=bool))
-        self.advanced_options.bit_clock.setValue(
+        advanced_options.bit_clock.setValue(
             self.settings.value("bit_clock", 1, type=int))
-        self.advanced_options.retry_count.setValue(
+        advanced_options.retry_count.setValue(
             self.settings.value("retry_count", 3, type=int))
+        advanced_options.operation_timeout.setValue(
+            self.settings.value("operation_timeout", 300, type=int))
+        advanced_options.console_lines.setValue(self.console.max_lines)
+        advanced_options.console_lines.valueChanged.connect(self.console.set_max_lines)
+        advanced_options.skip_identical_check.setChecked(
+            self.settings.value("skip_identical", False, type=bool))
+        advanced_options.differential_check.setChecked(
+            self.settings.value("differential", False, type=bool))
+        advanced_options.persistent_session_check.setChecked(
+            self.settings.value("persistent_session", False, type=bool))
+        advanced_options.local_verify_check.setChecked(
+            self.settings.value("local_verify", False, type=bool))
+        advanced_options.tuned_clock_check.setChecked(
+            self.settings.value("tuned_bit_clock", True, type=bool))
+        advanced_options.smart_retry_check.setChecked(
+            self.settings.value("smart_retry", True, type=bool))
+        advanced_options.tune_clock_btn.clicked.connect(self.tune_bit_clock)
+
+    def on_chip_info_built(self, chip_info_widget):
+        if self.current_chip_info:
+            chip_info_widget.update_info(self.current_chip_info)
 
-    def update_chip_list(self, series):
-        """Update the chip list combo box based on selected series."""
-        self.chip_combo.clear()
-        if series in self.chip_database:
-            self.chip_combo.addItems(self.chip_database[series].keys())
-
-    def update_chip_info(self, model):
+    def update_chip_info(self, series, model):
         """Update chip information based on selected model."""
-        series = self.chip_family.currentText()
         if series in self.chip_database and model in self.chip_database[series]:
-            chip_data = self.chip_database[series][model]
-            self.current_chip_info = ChipInfo.from_dict(chip_data)
-            self.chip_info_widget.update_info(self.current_chip_info)
+            self.current_chip_info = self.chip_database.chip(series, model)
+            if self.chip_info_tab.is_built():
+                self.chip_info_widget.update_info(self.current_chip_info)
 
             # Update fuse defaults
             self.lfuse_input.setCurrentText(self.current_chip_info.default_lfuse)
@@ -384,29 +1051,232 @@ class AVRFlasherGUI(QMainWindow):
             self.hfuse_input.setCurrentText(self.current_chip_info.default_hfuse)
             self.efuse_input.setCurrentText(self.current_chip_info.default_efuse)
 
-    def get_base_command(self):
-        """Get base avrdude command with current chip model."""
-        cmd = ["avrdude", "-c", "usbasp", "-p", self.current_chip_info.command]
-
-        # Add advanced options
-        if self.advanced_options.bit_clock.value() != 1:
-            cmd.extend(["-B", str(self.advanced_options.bit_clock.value())])
+    def get_command_options(self, programmer: Programmer = None) -> CommandOptions:
+        """Collect avrdude options from the advanced options tab.
+
+        Without a programmer the default USBasp is used and avrdude picks the
+        first one it finds, unless station mode is programming a bootloader
+        board. A bit clock tuned for the chip and programmer replaces the spin
+        box value unless that is turned off.
+        """
+        if programmer is None:
+            programmer = self.station_programmer
+        bit_clock = self.advanced_options.bit_clock.value()
+        options = CommandOptions(
+            # The spin box's 1 has always meant the programmer's default clock
+            bit_clock=bit_clock if bit_clock != 1 else None,
+            retry_count=self.advanced_options.retry_count.value(),
+            disable_fuse_check=self.advanced_options.disable_fuse_check.isChecked(),
+            erase=self.advanced_options.erase_check.isChecked(),
+            verify=self.advanced_options.verify_check.isChecked()
+        )
+        if programmer is not None:
+            options.programmer = programmer.programmer
+            options.port = programmer.port
+        if self.current_chip_info is not None and self.advanced_options.tuned_clock_check.isChecked():
+            options = apply_tuned_bit_clock(self.current_chip_info, options)
+        return options
+
+    def tune_bit_clock(self):
+        """Search for the fastest reliable bit clock and store it for this chip and programmer."""
+        chip = self.current_chip_info
+        options = replace(self.get_command_options(), bit_clock=1)
+        try:
+            tuner = ClockTuner(chip, options)
+        except TuneError as e:
+            QMessageBox.warning(self, "Error", str(e))
+            return
 
-        if self.advanced_options.retry_count.value() != 3:
-            cmd.extend(["-r", str(self.advanced_options.retry_count.value())])
+        def tune(tuner):
+            bit_clock = tuner.tune()
+            store_tuned_bit_clock(chip, options, bit_clock)
+            return f"Tuned bit clock for {chip.name}: -B {bit_clock:g} µs", bit_clock
 
-        if self.advanced_options.disable_fuse_check.isChecked():
-            cmd.append("-u")
+        def start(job):
+            # The tuner opens its own terminal sessions on the programmer
+            self.close_terminal_session()
+            worker = SessionWorker(tuner, tune)
+            self.workers[job.job_id] = worker
+            worker.progress.connect(lambda msg: self.console.append(msg))
+            worker.finished.connect(lambda msg: self.on_job_finished(job, worker, True, f"{msg}\n"))
+            worker.error.connect(lambda msg: self.on_job_finished(job, worker, False, f"\nError: {msg}\n"))
+            worker.start()
 
-        return cmd
+        self.scheduler.submit(device_key(options.programmer, options.port), "tune bit clock", start)
 
-    def execute_command(self, command):
-        self.console.append(f"Executing: {' '.join(command)}\n")
-        self.worker = AvrdudeWorker(' '.join(command))
-        self.worker.progress.connect(lambda msg: self.console.append(msg))
-        self.worker.finished.connect(lambda msg: self.console.append(f"\n{msg}\n"))
-        self.worker.error.connect(lambda msg: self.console.append(f"\nError: {msg}\n"))
-        self.worker.start()
+    def get_base_command(self, programmer: Programmer = None):
+        """Get base avrdude command with current chip model."""
+        return base_command(self.current_chip_info, self.get_command_options(programmer))
+
+    def use_terminal_session(self):
+        return self.advanced_options.persistent_session_check.isChecked()
+
+    def get_terminal_session(self):
+        """Return the open session for the current chip and options, reopening if they changed."""
+        session = TerminalSession.for_chip(self.current_chip_info, self.get_command_options())
+        if self.terminal_session is None or self.terminal_session.command != session.command:
+            self.close_terminal_session()
+            self.terminal_session = session
+        return self.terminal_session
+
+    def close_terminal_session(self):
+        if self.terminal_session is not None:
+            self.terminal_session.close()
+            self.terminal_session = None
+
+    def run_in_session(self, description, func, on_result=None):
+        """Queue ``func(session)`` on the session's programmer; it returns (message, result)."""
+        options = self.get_command_options()
+        session = self.get_terminal_session()
+
+        def start(job):
+            self.console.append(f"Session: {description}")
+            worker = SessionWorker(session, func)
+            self.workers[job.job_id] = worker
+            worker.progress.connect(lambda msg: self.console.append(msg))
+            if on_result is not None:
+                worker.result.connect(on_result)
+            worker.finished.connect(lambda msg: self.on_job_finished(job, worker, True, f"{msg}\n"))
+            worker.error.connect(lambda msg: self.on_job_finished(job, worker, False, f"\nError: {msg}\n"))
+            worker.start()
+
+        return self.scheduler.submit(device_key(options.programmer, options.port),
+                                     f"session: {description}", start, front=self._follow_up,
+                                     tag=self._job_tag)
+
+    def memory_sizes(self):
+        return {"flash": self.current_chip_info.flash_size,
+                "eeprom": self.current_chip_info.eeprom_size}
+
+    def on_progress_event(self, event):
+        self.progress_bar.setValue(event.percent)
+        self.progress_label.setText(event.describe())
+
+    def execute_command(self, command, on_success=None, on_error=None, programmer: Programmer = None,
+                        on_progress=None, on_progress_event=None, on_result=None, input=None,
+                        retry=True, check=None):
+        """Queue an avrdude command on its programmer.
+
+        Commands for the same programmer run one after another. ``on_success``
+        (no arguments) or ``on_error`` (the message) is called when the
+        command ends, before the next job for that programmer starts.
+        ``on_result`` receives the ProcessResult, including avrdude's stdout
+        and the classified error records, which are also kept as ``job.errors``.
+        ``input`` is written to avrdude's stdin, for ``-U memory:w:-:i``.
+        ``retry=False`` turns smart retries off for checks whose failure is an
+        answer rather than an error. ``check`` gets the ProcessResult of a
+        successful run and may return an error message to fail the job anyway.
+        """
+        options = self.get_command_options(programmer)
+        prefix = f"[{programmer.label}] " if programmer is not None else ""
+        memory_sizes = self.memory_sizes()
+        timeout = self.advanced_options.operation_timeout.value() or None
+        policy = RetryPolicy() if retry and self.advanced_options.smart_retry_check.isChecked() else None
+        # Output of concurrent gang jobs interleaves, so only plain jobs redraw in place
+        on_progress_update = self.console.update_line if on_progress is None else None
+        on_progress = on_progress or self.console.append
+        on_progress_event = on_progress_event or self.on_progress_event
+
+        def start(job):
+            # A separate avrdude process cannot use a programmer the session holds
+            if programmer is None:
+                self.close_terminal_session()
+            self.console.append(f"{prefix}Executing: {' '.join(command)}\n")
+            worker = AvrdudeWorker(command, memory_sizes, timeout, input, policy)
+            self.workers[job.job_id] = worker
+            worker.progress.connect(on_progress)
+            if on_progress_update is not None:
+                worker.progress_update.connect(on_progress_update)
+            worker.progress_event.connect(on_progress_event)
+            worker.error_record.connect(lambda record: self.console.append(
+                f"{prefix}Diagnosis: {record.describe()}"))
+            results = []
+            worker.result.connect(results.append)
+            worker.result.connect(lambda result: setattr(job, "errors", result.errors))
+            if on_result is not None:
+                worker.result.connect(on_result)
+
+            def failed(msg):
+                self.on_job_finished(job, worker, False, f"\n{prefix}Error: {msg}\n",
+                                     on_error and (lambda: on_error(msg)))
+
+            def finished(msg):
+                problem = check(results[-1]) if check is not None and results else None
+                if problem:
+                    failed(problem)
+                else:
+                    self.on_job_finished(job, worker, True, f"\n{prefix}{msg}\n", on_success)
+
+            worker.finished.connect(finished)
+            worker.error.connect(failed)
+            if programmer is None:
+                self.progress_bar.setValue(0)
+                self.progress_label.setText("Connecting...")
+            worker.start()
+
+        return self.scheduler.submit(device_key(options.programmer, options.port),
+                                     describe_command(command), start, front=self._follow_up,
+                                     tag=self._job_tag)
+
+    def update_queue_view(self):
+        self.queue_widget.refresh()
+        pending = len(self.queue_widget.jobs)
+        if pending and not self.queue_timer.isActive():
+            self.queue_timer.start()
+        elif not pending:
+            self.queue_timer.stop()
+        self.setWindowTitle(f"Advanced AVR Flasher ({pending} job(s))" if pending
+                            else "Advanced AVR Flasher")
+        self.cancel_btn.setEnabled(bool(pending))
+
+    def cancel_job(self, job):
+        """Drop a queued job or stop a running one; a stopped job finishes as failed."""
+        if job.state == "running":
+            worker = self.workers.get(job.job_id)
+            if worker is not None:
+                self.console.append(f"Cancelling: {job.description}")
+                worker.cancel()
+        else:
+            self.scheduler.cancel(job)
+
+    def cancel_all_jobs(self):
+        # Queued jobs first, so stopping a running job does not start the next one
+        running = [job for job in self.scheduler.jobs() if job.state == "running"]
+        for job in self.scheduler.jobs():
+            if job.state == "queued":
+                self.scheduler.cancel(job)
+        for job in running:
+            self.cancel_job(job)
+
+    def on_job_finished(self, job, worker, success, message, callback=None):
+        """Report a finished job, run its follow-up and start the next queued job."""
+        # Let the thread exit before anything starts another worker
+        worker.wait()
+        self.workers.pop(job.job_id, None)
+        self.console.append(message)
+        if job.device == self.default_device():
+            self.progress_label.setText("Done" if success else "Failed")
+        if callback is not None:
+            # Follow-up jobs go ahead of other work queued for the programmer
+            # and carry the tag of the job they follow
+            previous_tag = self._job_tag
+            self._follow_up = True
+            self._job_tag = job.tag
+            try:
+                callback()
+            finally:
+                self._follow_up = False
+                self._job_tag = previous_tag
+        self.scheduler.job_done(job, success)
+        if job.tag == "station" and self.station_results is not None:
+            # A board is done once its job and all follow-ups have run
+            self.station_results.append(success)
+            if not self.station_jobs():
+                self.finish_station_job()
+
+    def default_device(self):
+        options = self.get_command_options()
+        return device_key(options.programmer, options.port)
 
     def select_file(self, file_type):
         file_path, _ = QFileDialog.getOpenFileName(
@@ -421,23 +1291,548 @@ class AVRFlasherGUI(QMainWindow):
             else:
                 self.eeprom_file_path.setText(file_path)
 
+    def preflight_image(self, file_path, memory="flash"):
+        """Parse and size-check an image, warning the user if it is unusable."""
+        try:
+            return self.load_image(file_path, memory)
+        except ValueError as e:
+            QMessageBox.warning(self, "Error", str(e))
+            return None
+
+    def load_image(self, file_path, memory="flash"):
+        """Parse and size-check an image; raises ValueError if it is unusable."""
+        if memory == "flash":
+            memory_size = self.current_chip_info.flash_size
+        else:
+            memory_size = self.current_chip_info.eeprom_size
+        try:
+            return intelhex.preflight(file_path, memory_size, memory)
+        except (ValueError, OSError) as e:
+            raise ValueError(f"Cannot use {file_path}:\n{e}") from e
+
+    def gang_write_flash(self):
+        """Write flash on every selected programmer concurrently."""
+        if self.flash_file_path.text() == "No file selected":
+            QMessageBox.warning(self, "Error", "Please select a hex file first!")
+            return
+        if self.preflight_image(self.flash_file_path.text()) is None:
+            return
+
+        selected = self.gang_widget.selected_programmers()
+        if not selected:
+            QMessageBox.warning(self, "Error", "No programmers selected!")
+            return
+
+        self.gang_jobs = {}
+        self.gang_results = {}
+        for row, programmer in selected:
+            label = programmer.label
+            self.gang_jobs[label] = self.execute_command(
+                self.build_write_flash_command(programmer),
+                programmer=programmer,
+                on_success=lambda row=row, label=label: self.on_gang_done(row, label, True),
+                on_error=lambda msg, row=row, label=label: self.on_gang_done(row, label, False),
+                on_progress=lambda msg, row=row, label=label: self.on_gang_progress(row, label, msg),
+                on_progress_event=lambda event, row=row: self.gang_widget.set_status(row, event.describe()))
+            self.gang_widget.set_status(row, "Queued")
+            self.gang_widget.set_last_output(row, "")
+
+        self.gang_widget.summary_label.setText(f"Programming {len(selected)} board(s)...")
+
+    def on_gang_progress(self, row, label, msg):
+        self.console.append(f"[{label}] {msg}")
+        self.gang_widget.set_last_output(row, msg)
+
+    def on_gang_done(self, row, label, success):
+        self.gang_results[label] = success
+        if success:
+            self.gang_widget.set_status(row, "PASS", "#8fdc8f")
+        else:
+            self.gang_widget.set_status(row, "FAIL", "#f08080")
+
+        if len(self.gang_results) == len(self.gang_jobs):
+            passed = sum(self.gang_results.values())
+            failed = len(self.gang_results) - passed
+            self.gang_widget.summary_label.setText(f"Done: {passed} passed, {failed} failed")
+
+    def toggle_station(self, checked):
+        if checked:
+            self.start_station()
+        else:
+            self.stop_station()
+
+    def start_station(self):
+        """Watch for boards and run the selected job on each new one.
+
+        Station jobs never ask anything, so writing fuses or lock bits is
+        confirmed once here for all boards.
+        """
+        widget = self.station_widget
+        if (widget.job_combo.currentIndex() == 1
+                and (self.board_fuses_check.isChecked() or self.board_lock_check.isChecked())):
+            reply = QMessageBox.warning(
+                self,
+                "Warning",
+                "The station will write fuse or lock values to every inserted board. "
+                "Incorrect values can brick them. Are you sure you want to continue?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                QMessageBox.StandardButton.No
+            )
+            if reply != QMessageBox.StandardButton.Yes:
+                widget.start_btn.blockSignals(True)
+                widget.start_btn.setChecked(False)
+                widget.start_btn.blockSignals(False)
+                return
+        if widget.uses_usb():
+            self.station_presence = UsbPresence()
+        else:
+            self.station_presence = SignaturePresence(self.current_chip_info, self.get_command_options())
+        self.station = Station(self.run_station_job, widget.debounce.value() / 1000,
+                               self.on_station_change)
+        self.station_polling = False
+        self.station_timer.setInterval(int(self.station_presence.interval * 1000))
+        self.station_timer.start()
+        widget.start_btn.setText("Stop Station")
+        self.on_station_change(WAITING, None)
+
+    def stop_station(self):
+        self.station_timer.stop()
+        self.station = None
+        self.station_widget.start_btn.setText("Start Station")
+        self.station_widget.status_label.setText("Stopped")
+        self.station_widget.status_label.setStyleSheet("")
+        self.console.append("Station stopped\n")
+
+    def poll_station(self):
+        station = self.station
+        if station is None or station.state == RUNNING or self.station_polling:
+            return
+        presence = self.station_presence
+        if isinstance(presence, UsbPresence):
+            station.update(presence.poll())
+            return
+
+        # Signature polls queue like any job, so they never overlap work on the programmer
+        options = self.get_command_options()
+        device = device_key(options.programmer, options.port)
+        if self.scheduler.is_busy(device):
+            return
+        self.station_polling = True
+
+        def start(job):
+            self.close_terminal_session()
+            worker = AvrdudeWorker(presence.command, timeout=presence.interval * 10)
+            self.workers[job.job_id] = worker
+            results = []
+
+            def done():
+                worker.wait()
+                self.workers.pop(job.job_id, None)
+                self.station_polling = False
+                self.scheduler.job_done(job, True)
+                if self.station is station:
+                    station.update(presence.board(results[0] if results else None))
+
+            worker.result.connect(results.append)
+            worker.finished.connect(lambda msg: done())
+            worker.error.connect(lambda msg: done())
+            worker.start()
+
+        self.scheduler.submit(device, "presence poll", start)
+
+    def run_station_job(self, board):
+        """Start the station's job on a board that has just settled in the slot."""
+        if board.port is not None:
+            self.station_programmer = Programmer(self.station_widget.programmer_combo.currentText(),
+                                                 board.port, description=board.description)
+        self.station_results = []
+        job = self.station_widget.job_combo.currentIndex()
+        self._job_tag = "station"
+        try:
+            [self.station_write_flash, self.station_program_board, self.station_program_unit][job]()
+        except ValueError as e:
+            self.console.append(f"Station: {e}\n")
+        finally:
+            self._job_tag = ""
+        if not self.station_jobs():
+            # Nothing was queued, e.g. no file selected
+            self.finish_station_job()
+
+    def station_jobs(self):
+        return [job for job in self.scheduler.jobs() if job.tag == "station"]
+
+    def station_image(self, memory):
+        """The selected flash or EEPROM image; raises ValueError instead of asking."""
+        file_path = (self.flash_file_path if memory == "flash" else self.eeprom_file_path).text()
+        if file_path == "No file selected":
+            raise ValueError(f"No {memory} file selected")
+        return self.load_image(file_path, memory)
+
+    def station_write_flash(self):
+        self.queue_write_flash(self.station_image("flash"))
+
+    def station_program_board(self):
+        # Fuse and lock writes were confirmed when the station started
+        steps = self.build_board_plan()
+        image = self.station_image("flash") if self.board_flash_check.isChecked() else None
+        if self.board_eeprom_check.isChecked():
+            self.station_image("eeprom")
+        self.queue_program_board(steps, image)
+
+    def station_program_unit(self):
+        if self.patch_file_path.text() == "No patch file selected":
+            raise ValueError("No patch file selected")
+        images = {}
+        if self.flash_file_path.text() != "No file selected":
+            images["flash"] = self.station_image("flash")
+        if self.eeprom_file_path.text() != "No file selected":
+            images["eeprom"] = self.station_image("eeprom")
+        self.queue_program_unit(images)
+
+    def finish_station_job(self):
+        results, self.station_results = self.station_results, None
+        self.station_programmer = None
+        if self.station is not None:
+            self.station.job_done(bool(results) and all(results))
+
+    def on_station_change(self, state, board):
+        text = describe_state(state, board)
+        self.station_widget.set_state(state, text, self.station.passed, self.station.failed)
+        if state != SETTLING:
+            self.console.append(f"Station: {text}\n")
+
+    def build_write_flash_command(self, programmer: Programmer = None):
+        """Build the flash write command for one programmer."""
+        return write_flash_command(self.current_chip_info, self.get_command_options(programmer),
+                                   self.flash_file_path.text())
+
     def write_flash(self):
         if self.flash_file_path.text() == "No file selected":
             QMessageBox.warning(self, "Error", "Please select a hex file first!")
             return
+        image = self.preflight_image(self.flash_file_path.text())
+        if image is None:
+            return
+        self.queue_write_flash(image)
+
+    def queue_write_flash(self, image):
+        """Write the image the way the advanced options select, without asking anything."""
+        if self.advanced_options.differential_check.isChecked():
+            self.write_flash_differential(image)
+        elif self.advanced_options.skip_identical_check.isChecked():
+            self.write_flash_if_changed(image)
+        else:
+            self.write_full_flash(image)
+
+    def use_local_verify(self):
+        return (self.advanced_options.verify_check.isChecked()
+                and self.advanced_options.local_verify_check.isChecked())
+
+    def write_full_flash(self, image):
+        """Erase and write the whole image, then remember it as the device content."""
+        chip = self.current_chip_info
+        options = self.get_command_options()
+        # Keyed by port like the CLI, so both front ends share what they know of a device
+        port = options.port
+        if not self.use_local_verify():
+            self.execute_command(
+                self.build_write_flash_command(),
+                on_success=lambda: store_last_image(chip, port, image),
+                on_error=lambda msg: forget_last_image(chip, port))
+            return
+
+        def verified(ok):
+            if ok:
+                store_last_image(chip, port, image)
+            else:
+                forget_last_image(chip, port)
+
+        options.verify = False
+        self.execute_command(
+            write_flash_command(chip, options, self.flash_file_path.text()),
+            on_success=lambda: self.verify_locally(image, "flash", verified),
+            on_error=lambda msg: forget_last_image(chip, port))
+
+    def read_back(self, memory, on_read):
+        """Read a memory to avrdude's stdout and pass it to ``on_read`` as a HexImage.
+
+        ``on_read`` receives None if the read-back could not be parsed.
+        """
+        output = []
+
+        def parse_readback():
+            try:
+                device = intelhex.parse_hex(output[0].stdout.splitlines())
+            except (ValueError, IndexError) as e:
+                self.console.append(f"Could not parse {memory} read-back: {e}")
+                device = None
+            on_read(device)
+
+        read_command = read_flash_command if memory == "flash" else read_eeprom_command
+        self.execute_command(
+            read_command(self.current_chip_info, self.get_command_options(), "-"),
+            on_success=parse_readback,
+            on_result=output.append)
+
+    def verify_locally(self, image, memory, on_done=None):
+        """Read the memory back once and compare it with the image's used ranges.
+
+        A difference or an unreadable read-back fails the read-back job, so
+        station mode counts the board as failed.
+        """
+        def compare(result):
+            try:
+                device = intelhex.parse_hex(result.stdout.splitlines())
+            except ValueError as e:
+                return f"Could not parse {memory} read-back: {e}"
+            addresses = intelhex.compare(image, device)
+            if addresses:
+                return (f"{memory} verification failed: {len(addresses)} byte(s) differ at "
+                        f"{intelhex.describe_addresses(addresses)}")
+            self.console.append(f"{memory} verified: {image.size} byte(s) match")
+            return None
+
+        def done(ok):
+            self.progress_label.setText("Verified" if ok else "Verify failed")
+            if on_done is not None:
+                on_done(ok)
+
+        read_command = read_flash_command if memory == "flash" else read_eeprom_command
+        self.execute_command(
+            read_command(self.current_chip_info, self.get_command_options(), "-"),
+            on_success=lambda: done(True),
+            on_error=lambda msg: done(False),
+            check=compare)
+
+    def write_flash_if_changed(self, image):
+        """Read the flash back and only write when it differs from the image."""
+        image_hash = intelhex.content_hash(image)
+        chip = self.current_chip_info
+        port = self.get_command_options().port
+
+        def compare_and_write(device):
+            if device is not None and intelhex.content_hash(device, image) == image_hash:
+                self.console.append(f"Flash already current (sha256 {image_hash[:16]}), skipping write\n")
+                store_last_image(chip, port, image)
+                return
+            self.console.append("Flash differs from image, writing")
+            self.write_full_flash(image)
+
+        self.console.append(f"Checking whether flash already holds image sha256 {image_hash[:16]}")
+        self.read_back("flash", compare_and_write)
+
+    def write_flash_differential(self, image):
+        """Write only the flash pages that differ from the device content.
+
+        The last written image is used as the device content once avrdude has
+        verified that the device still holds it; otherwise the flash is read back.
+        """
+        chip = self.current_chip_info
+        options = self.get_command_options()
+        if not supports_page_erase(chip, options):
+            self.console.append(
+                f"{chip.name} needs a chip erase before writing with {options.programmer}, "
+                "doing a full write")
+            self.write_full_flash(image)
+            return
+
+        def write_against_readback(device):
+            if device is None:
+                self.write_full_flash(image)
+            else:
+                self.write_changed_pages(image, device)
+
+        # Every station board is new, so the last written image says nothing about it
+        cached = last_image_path(chip, options.port) if self._job_tag != "station" else None
+        base = load_last_image(chip, options.port) if cached is not None else None
+        if base is None:
+            self.console.append("No record of the device content, reading it back first")
+            self.read_back("flash", write_against_readback)
+            return
 
-        cmd = self.get_base_command()
-        options = []
+        def not_current(msg):
+            self.console.append("Device does not hold the last written image, reading it back")
+            self.read_back("flash", write_against_readback)
+
+        # The cache describes the last board on this programmer, which may have been swapped
+        self.console.append("Checking that the device still holds the last written image")
+        self.execute_command(verify_flash_command(chip, options, cached),
+                             on_success=lambda: self.write_changed_pages(image, base),
+                             on_error=not_current, retry=False)
+
+    def write_changed_pages(self, image, base):
+        chip = self.current_chip_info
+        options = self.get_command_options()
+        port = options.port
+        pages = changed_pages(image, base, chip.flash_page_size)
+        if not pages:
+            self.console.append("Flash already current, nothing to write\n")
+            store_last_image(chip, port, image)
+            return
 
-        if self.advanced_options.erase_check.isChecked():
-            cmd.append("-e")
+        delta = intelhex.format_hex(delta_image(image, pages, chip.flash_page_size)).encode("ascii")
+        self.console.append(
+            f"Writing {len(pages)} changed page(s) of {chip.flash_page_size} bytes")
+        # Streamed through stdin, so a cancelled job leaves no temporary file behind
+        self.execute_command(
+            write_flash_pages_command(chip, options, "-"),
+            on_success=lambda: store_last_image(chip, port, image),
+            on_error=lambda msg: forget_last_image(chip, port),
+            input=delta)
+
+    def board_plan(self):
+        """Build the program board steps from the selected parts, or None."""
+        try:
+            return self.build_board_plan()
+        except ValueError as e:
+            QMessageBox.warning(self, "Error", str(e))
+            return None
+
+    def build_board_plan(self):
+        """The program board steps; raises ValueError if a selected part has no file."""
+        flash_file = eeprom_file = lock = None
+        fuses = None
+
+        if self.board_flash_check.isChecked():
+            if self.flash_file_path.text() == "No file selected":
+                raise ValueError("Please select a hex file first!")
+            flash_file = self.flash_file_path.text()
+        if self.board_eeprom_check.isChecked():
+            if self.eeprom_file_path.text() == "No file selected":
+                raise ValueError("Please select an EEPROM file first!")
+            eeprom_file = self.eeprom_file_path.text()
+        if self.board_fuses_check.isChecked():
+            fuses = {
+                "lfuse": self.lfuse_input.currentText(),
+                "hfuse": self.hfuse_input.currentText(),
+                "efuse": self.efuse_input.currentText()
+            }
+        if self.board_lock_check.isChecked():
+            lock = self.lock_input.currentText()
+
+        steps = plan_program_board(flash_file, eeprom_file, fuses, lock)
+        if not steps:
+            raise ValueError("Nothing selected to program!")
+        return steps
+
+    def show_board_plan(self):
+        steps = self.board_plan()
+        if steps is not None:
+            self.plan_view.setText(
+                describe_plan(self.current_chip_info, self.get_command_options(), steps))
+
+    def program_board(self):
+        """Write flash, EEPROM, fuses and lock bits in a single avrdude session."""
+        steps = self.board_plan()
+        if steps is None:
+            return
 
-        if self.advanced_options.verify_check.isChecked():
-            options.append("v")
+        image = None
+        if self.board_flash_check.isChecked():
+            image = self.preflight_image(self.flash_file_path.text())
+            if image is None:
+                return
+        if self.board_eeprom_check.isChecked():
+            if self.preflight_image(self.eeprom_file_path.text(), "EEPROM") is None:
+                return
+        if self.board_fuses_check.isChecked() or self.board_lock_check.isChecked():
+            reply = QMessageBox.warning(
+                self,
+                "Warning",
+                "Writing incorrect fuse or lock values can brick your device. Are you sure you want to continue?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                QMessageBox.StandardButton.No
+            )
+            if reply != QMessageBox.StandardButton.Yes:
+                return
+        self.queue_program_board(steps, image)
+
+    def queue_program_board(self, steps, image=None):
+        """Run the steps in one avrdude session; ``image`` is the flash image being written."""
+        chip = self.current_chip_info
+        options = self.get_command_options()
+        self.plan_view.setText(describe_plan(chip, options, steps))
+        on_success = None
+        if image is not None:
+            on_success = lambda: store_last_image(chip, options.port, image)
+        on_error = None
+        if image is not None:
+            on_error = lambda msg: forget_last_image(chip, options.port)
+        self.execute_command(program_board_command(chip, options, steps),
+                             on_success=on_success, on_error=on_error)
+
+    def select_patch_file(self):
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Select Patch File", "", "Patch Files (*.json);;All Files (*.*)")
+        if file_path:
+            self.patch_file_path.setText(file_path)
 
-        options.append("w")
-        cmd.extend(["-U", f"flash:{''.join(options)}:{self.flash_file_path.text()}:i"])
-        self.execute_command(cmd)
+    def program_unit(self):
+        """Patch the selected images for the current unit in memory and pipe them to avrdude.
+
+        The selected flash and EEPROM files are the base images; with a file
+        not selected only that memory's patches are written. The unit number
+        advances after a successful run.
+        """
+        if self.patch_file_path.text() == "No patch file selected":
+            QMessageBox.warning(self, "Error", "Please select a patch file first!")
+            return
+
+        images = {}
+        if self.flash_file_path.text() != "No file selected":
+            images["flash"] = self.preflight_image(self.flash_file_path.text())
+        if self.eeprom_file_path.text() != "No file selected":
+            images["eeprom"] = self.preflight_image(self.eeprom_file_path.text(), "EEPROM")
+        if None in images.values():
+            return
+        try:
+            self.queue_program_unit(images)
+        except ValueError as e:
+            QMessageBox.warning(self, "Error", str(e))
+
+    def queue_program_unit(self, images):
+        """Patch the base images for the current unit and queue the writes.
+
+        Raises ValueError if the unit cannot be patched or written.
+        """
+        chip = self.current_chip_info
+        values = dict(item.strip().split("=", 1) for item in self.unit_values.text().split(",")
+                      if "=" in item)
+        unit = self.unit_number.value()
+        try:
+            engine = patching.PatchEngine(images, patching.load_fields(self.patch_file_path.text()))
+            engine.check_fits({"flash": chip.flash_size, "eeprom": chip.eeprom_size})
+            rendered = engine.render(unit, values)
+        except (ValueError, OSError) as e:
+            raise ValueError(f"Cannot patch unit {unit}:\n{e}") from e
+
+        options = self.get_command_options()
+        if ("flash" in rendered and "flash" not in images
+                and not supports_page_erase(chip, options)):
+            # Writing only the patched bytes without an erase could only clear bits
+            raise ValueError(f"{chip.name} cannot rewrite flash bytes without a chip erase "
+                             f"on {options.programmer}. Select the base flash image first!")
+        runs = []
+        if "flash" in rendered:
+            # Without a base image only the patched bytes are written, so no erase
+            write = write_flash_command if "flash" in images else write_flash_pages_command
+            runs.append((write(chip, options, "-"), rendered["flash"]))
+        if "eeprom" in rendered:
+            runs.append((write_eeprom_command(chip, options, "-"), rendered["eeprom"]))
+
+        def run(index):
+            if index == len(runs):
+                self.console.append(f"Unit {unit} programmed\n")
+                if self.unit_number.value() == unit:
+                    self.unit_number.setValue(unit + 1)
+                return
+            command, data = runs[index]
+            self.execute_command(command, on_success=lambda: run(index + 1), input=data)
+
+        if "flash" in rendered:
+            # Each unit's flash differs, so it is no base for a differential write
+            forget_last_image(chip, options.port)
+        run(0)
 
     def read_flash(self):
         file_path, _ = QFileDialog.getSaveFileName(
@@ -447,27 +1842,110 @@ class AVRFlasherGUI(QMainWindow):
             "Hex Files (*.hex);;All Files (*.*)"
         )
         if file_path:
-            cmd = self.get_base_command()
-            cmd.extend(["-U", f"flash:r:{file_path}:i"])
-            self.execute_command(cmd)
+            self.execute_command(read_flash_command(
+                self.current_chip_info, self.get_command_options(), file_path))
 
     def verify_flash(self):
         if self.flash_file_path.text() == "No file selected":
             QMessageBox.warning(self, "Error", "Please select a hex file first!")
             return
+        image = self.preflight_image(self.flash_file_path.text())
+        if image is None:
+            return
+
+        if self.use_terminal_session():
+            self.run_in_session(
+                "verify flash", lambda session: self.session_verify(session, image, "flash"))
+            return
 
-        cmd = self.get_base_command()
-        cmd.extend(["-U", f"flash:v:{self.flash_file_path.text()}:i"])
-        self.execute_command(cmd)
+        if self.advanced_options.local_verify_check.isChecked():
+            self.verify_locally(image, "flash")
+            return
+
+        # A mismatch is the answer, not an error another attempt could fix
+        self.execute_command(verify_flash_command(
+            self.current_chip_info, self.get_command_options(), self.flash_file_path.text()), retry=False)
+
+    def session_verify(self, session, image, memory):
+        mismatches = session.verify(image, memory)
+        if mismatches:
+            raise RuntimeError(f"{memory} verification failed: {len(mismatches)} byte(s) differ, "
+                               f"first at 0x{mismatches[0]:04X}")
+        return f"{memory} verified, {image.size} bytes match", None
+
+    def set_fuse_inputs(self, fuses):
+        """Show fuse and lock values read from the device in their inputs."""
+        inputs = {"lfuse": self.lfuse_input, "hfuse": self.hfuse_input,
+                  "efuse": self.efuse_input, "lock": self.lock_input}
+        for name, value in fuses.items():
+            if name in inputs:
+                inputs[name].setCurrentText(f"0x{value:02X}")
+
+    def report_signature(self, signature):
+        """Log the signature read from the device and whether it matches the selected chip."""
+        expected = self.current_chip_info.signature
+        if signature.upper() == expected.upper():
+            self.console.append(f"Signature: {signature} ({self.current_chip_info.name})")
+        else:
+            self.console.append(f"Warning: signature {signature} does not match "
+                                f"{self.current_chip_info.name} ({expected})")
+
+    def show_read_values(self, command, result):
+        """Parse the values a read command printed to stdout into the UI."""
+        values = parse_read_output(command, result.stdout)
+        self.set_fuse_inputs({name: value[0] for name, value in values.items()
+                              if name != "signature" and len(value) == 1})
+        if "signature" in values:
+            self.report_signature("0x" + values["signature"].hex().upper())
+
+    def detect_chip(self):
+        """Read the signature with the current part forced and select the chip it belongs to."""
+        command = detect_signature_command(self.current_chip_info, self.get_command_options())
+
+        def detected(result):
+            signature = parse_read_output(command, result.stdout).get("signature")
+            if signature is not None:
+                self.select_detected_chip("0x" + signature.hex().upper())
+
+        self.execute_command(command, on_result=detected)
+
+    def select_detected_chip(self, signature):
+        matches = self.chip_database.models_with_signature(signature)
+        if signature in ("0x000000", "0xFFFFFF"):
+            self.console.append(f"Signature {signature}: check the target's power and wiring")
+            return
+        if not matches:
+            QMessageBox.warning(self, "Detect", f"No chip in the database has signature {signature}.")
+            return
+
+        family, model = matches[0]
+        if len(matches) > 1:
+            labels = [f"{self.chip_database.chip(*ref).name} ({ref[1]})" for ref in matches]
+            label, ok = QInputDialog.getItem(
+                self, "Detect", f"Several chips have signature {signature}:", labels, 0, False)
+            if not ok:
+                return
+            family, model = matches[labels.index(label)]
+        self.select_chip(family, model)
+        self.console.append(f"Detected {self.current_chip_info.name} (signature {signature})")
 
     def read_fuses(self):
-        cmd = self.get_base_command()
-        cmd.extend([
-            "-U", "lfuse:r:-:h",
-            "-U", "hfuse:r:-:h",
-            "-U", "efuse:r:-:h"
-        ])
-        self.execute_command(cmd)
+        if self.use_terminal_session():
+            def read(session):
+                fuses = session.read_fuses(FUSE_ORDER + ["lock"])
+                fuses["signature"] = session.signature()
+                message = ", ".join(f"{name}=0x{value:02X}" for name, value in fuses.items()
+                                    if name != "signature")
+                return message, fuses
+
+            def show(fuses):
+                self.report_signature(fuses.pop("signature"))
+                self.set_fuse_inputs(fuses)
+            self.run_in_session("read fuses", read, on_result=show)
+            return
+
+        command = read_fuses_command(self.current_chip_info, self.get_command_options())
+        self.execute_command(command, on_result=lambda result: self.show_read_values(command, result))
 
     def write_fuses(self):
         reply = QMessageBox.warning(
@@ -479,28 +1957,31 @@ class AVRFlasherGUI(QMainWindow):
         )
 
         if reply == QMessageBox.StandardButton.Yes:
-            cmd = self.get_base_command()
-            cmd.extend([
-                "-U", f"lfuse:w:{self.lfuse_input.currentText()}:m",
-                "-U", f"hfuse:w:{self.hfuse_input.currentText()}:m",
-                "-U", f"efuse:w:{self.efuse_input.currentText()}:m"
-            ])
-            self.execute_command(cmd)
+            self.execute_command(write_fuses_command(
+                self.current_chip_info, self.get_command_options(),
+                self.lfuse_input.currentText(),
+                self.hfuse_input.currentText(),
+                self.efuse_input.currentText()
+            ))
 
     def write_eeprom(self):
         if self.eeprom_file_path.text() == "No file selected":
             QMessageBox.warning(self, "Error", "Please select an EEPROM file first!")
             return
+        image = self.preflight_image(self.eeprom_file_path.text(), "EEPROM")
+        if image is None:
+            return
 
-        cmd = self.get_base_command()
-        options = []
-
-        if self.advanced_options.verify_check.isChecked():
-            options.append("v")
+        if self.use_local_verify():
+            options = self.get_command_options()
+            options.verify = False
+            self.execute_command(
+                write_eeprom_command(self.current_chip_info, options, self.eeprom_file_path.text()),
+                on_success=lambda: self.verify_locally(image, "eeprom"))
+            return
 
-        options.append("w")
-        cmd.extend(["-U", f"eeprom:{''.join(options)}:{self.eeprom_file_path.text()}:i"])
-        self.execute_command(cmd)
+        self.execute_command(write_eeprom_command(
+            self.current_chip_info, self.get_command_options(), self.eeprom_file_path.text()))
 
     def read_eeprom(self):
         file_path, _ = QFileDialog.getSaveFileName(
@@ -509,23 +1990,46 @@ class AVRFlasherGUI(QMainWindow):
             "",
             "Hex Files (*.hex);;All Files (*.*)"
         )
-        if file_path:
-            cmd = self.get_base_command()
-            cmd.extend(["-U", f"eeprom:r:{file_path}:i"])
-            self.execute_command(cmd)
+        if file_path and self.use_terminal_session():
+            eeprom_size = self.current_chip_info.eeprom_size
+
+            def read(session):
+                image = intelhex.HexImage()
+                image.write(0, session.read_memory("eeprom", 0, eeprom_size))
+                intelhex.write_hex(image, file_path)
+                return f"EEPROM saved to {file_path}", None
+            self.run_in_session("read EEPROM", read)
+        elif file_path:
+            self.execute_command(read_eeprom_command(
+                self.current_chip_info, self.get_command_options(), file_path))
 
     def verify_eeprom(self):
         if self.eeprom_file_path.text() == "No file selected":
             QMessageBox.warning(self, "Error", "Please select an EEPROM file first!")
             return
+        image = self.preflight_image(self.eeprom_file_path.text(), "EEPROM")
+        if image is None:
+            return
+
+        if self.use_terminal_session():
+            self.run_in_session(
+                "verify EEPROM", lambda session: self.session_verify(session, image, "eeprom"))
+            return
+
+        if self.advanced_options.local_verify_check.isChecked():
+            self.verify_locally(image, "eeprom")
+            return
 
-        cmd = self.get_base_command()
-        cmd.extend(["-U", f"eeprom:v:{self.eeprom_file_path.text()}:i"])
-        self.execute_command(cmd)
+        self.execute_command(verify_eeprom_command(
+            self.current_chip_info, self.get_command_options(), self.eeprom_file_path.text()), retry=False)
 
 def main():
+    startup_profile = "--startup-profile" in sys.argv
+    if startup_profile:
+        sys.argv.remove("--startup-profile")
+
     app = QApplication(sys.argv)
-    window = AVRFlasherGUI()
+    window = AVRFlasherGUI(startup_profile=startup_profile)
     window.show()
     sys.exit(app.exec())
 
@@ -0,0 +1,204 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from chipdb import ChipInfo
+from programmers import BOOTLOADER_PROGRAMMERS, PDI_PROGRAMMERS, UPDI_PROGRAMMERS
+
+# Bootloaders and UPDI/PDI interfaces erase flash page by page while writing
+PAGE_ERASE_PROGRAMMERS = BOOTLOADER_PROGRAMMERS | UPDI_PROGRAMMERS | PDI_PROGRAMMERS
+
+@dataclass
+class CommandOptions:
+    programmer: str = "usbasp"
+    port: Optional[str] = None
+    # -B period in µs; None leaves the programmer's default clock
+    bit_clock: Optional[float] = None
+    retry_count: int = 3
+    disable_fuse_check: bool = False
+    erase: bool = True
+    verify: bool = True
+
+def base_command(chip: ChipInfo, options: CommandOptions) -> List[str]:
+    """Get base avrdude command for a chip and programmer options."""
+    cmd = ["avrdude", "-c", options.programmer]
+    if options.port:
+        cmd.extend(["-P", options.port])
+    cmd.extend(["-p", chip.command])
+
+    if options.bit_clock is not None:
+        cmd.extend(["-B", f"{options.bit_clock:g}"])
+
+    if options.retry_count != 3:
+        cmd.extend(["-r", str(options.retry_count)])
+
+    if options.disable_fuse_check:
+        cmd.append("-u")
+
+    return cmd
+
+def command_bit_clock(cmd: List[str]) -> Optional[float]:
+    """The ``-B`` period of a command, None when it runs at the programmer's default."""
+    if "-B" in cmd[:-1]:
+        return float(cmd[cmd.index("-B") + 1])
+    return None
+
+def with_bit_clock(cmd: List[str], bit_clock: Optional[float]) -> List[str]:
+    """Copy of ``cmd`` with its ``-B`` period set to ``bit_clock`` (None: unchanged)."""
+    cmd = list(cmd)
+    if bit_clock is None:
+        return cmd
+    if "-B" in cmd[:-1]:
+        cmd[cmd.index("-B") + 1] = f"{bit_clock:g}"
+    else:
+        position = cmd.index("-p") + 2 if "-p" in cmd else len(cmd)
+        cmd[position:position] = ["-B", f"{bit_clock:g}"]
+    return cmd
+
+_OPERATION_NAMES = {"r": "read", "w": "write", "v": "verify"}
+
+def describe_command(cmd: List[str]) -> str:
+    """Short description of what an avrdude command does, e.g. 'erase, write flash'."""
+    parts = ["erase"] if "-e" in cmd else []
+    for index, arg in enumerate(cmd[:-1]):
+        if arg == "-U":
+            memory, operation = cmd[index + 1].split(":")[:2]
+            parts.append(f"{_OPERATION_NAMES.get(operation, operation)} {memory}")
+    return ", ".join(parts) or "connect"
+
+def command_writes(cmd: List[str]) -> bool:
+    """Whether a command writes any memory (``-U mem:w:...``)."""
+    return any(arg == "-U" and cmd[index + 1].split(":")[1:2] == ["w"]
+               for index, arg in enumerate(cmd[:-1]))
+
+def _verify_flag(options: CommandOptions) -> List[str]:
+    # avrdude verifies every write unless told otherwise
+    return [] if options.verify else ["-V"]
+
+def write_flash_command(chip: ChipInfo, options: CommandOptions, file_path: str) -> List[str]:
+    cmd = base_command(chip, options) + _verify_flag(options)
+
+    if options.erase:
+        cmd.append("-e")
+
+    cmd.extend(["-U", f"flash:w:{file_path}:i"])
+    return cmd
+
+def supports_page_erase(chip: ChipInfo, options: CommandOptions) -> bool:
+    """True if flash pages can be rewritten without a chip erase."""
+    return chip.page_erase or options.programmer in PAGE_ERASE_PROGRAMMERS
+
+def write_flash_pages_command(chip: ChipInfo, options: CommandOptions, file_path: str) -> List[str]:
+    """Write only the pages present in file_path, with auto-erase disabled."""
+    cmd = base_command(chip, options) + _verify_flag(options) + ["-D"]
+    cmd.extend(["-U", f"flash:w:{file_path}:i"])
+    return cmd
+
+def read_flash_command(chip: ChipInfo, options: CommandOptions, file_path: str) -> List[str]:
+    return base_command(chip, options) + ["-U", f"flash:r:{file_path}:i"]
+
+def verify_flash_command(chip: ChipInfo, options: CommandOptions, file_path: str) -> List[str]:
+    return base_command(chip, options) + ["-U", f"flash:v:{file_path}:i"]
+
+def read_fuses_command(chip: ChipInfo, options: CommandOptions) -> List[str]:
+    """Read fuses, lock byte and signature to stdout; see parse_read_output()."""
+    return base_command(chip, options) + [
+        "-U", "lfuse:r:-:h",
+        "-U", "hfuse:r:-:h",
+        "-U", "efuse:r:-:h",
+        "-U", "lock:r:-:h",
+        "-U", "signature:r:-:h"
+    ]
+
+def detect_signature_command(chip: ChipInfo, options: CommandOptions) -> List[str]:
+    """Read the signature with ``-F``, so any part of the same interface can stand in."""
+    return base_command(chip, options) + ["-F", "-U", "signature:r:-:h"]
+
+def parse_read_output(command: List[str], stdout: str) -> Dict[str, bytes]:
+    """Match the values avrdude printed to stdout with the ``-U mem:r:-:h`` reads of ``command``.
+
+    avrdude prints one line per read, in the order of the -U options, with
+    the bytes as comma separated hex (``0x1e,0x95,0x0f``).
+    """
+    memories = [op.split(":")[0] for flag, op in zip(command, command[1:])
+                if flag == "-U" and op.split(":")[1:4] == ["r", "-", "h"]]
+    lines = [line.strip() for line in stdout.splitlines() if line.strip()]
+    values = {}
+    for memory, line in zip(memories, lines):
+        try:
+            values[memory] = bytes(int(value, 16) for value in line.split(","))
+        except ValueError:
+            break
+    return values
+
+def write_fuses_command(chip: ChipInfo, options: CommandOptions,
+                        lfuse: str, hfuse: str, efuse: str) -> List[str]:
+    """Write the given fuses; empty values (fuses the part lacks) are left out."""
+    command = base_command(chip, options)
+    for name, value in (("lfuse", lfuse), ("hfuse", hfuse), ("efuse", efuse)):
+        if value:
+            command += ["-U", f"{name}:w:{value}:m"]
+    return command
+
+def write_eeprom_command(chip: ChipInfo, options: CommandOptions, file_path: str) -> List[str]:
+    return base_command(chip, options) + _verify_flag(options) + ["-U", f"eeprom:w:{file_path}:i"]
+
+def read_eeprom_command(chip: ChipInfo, options: CommandOptions, file_path: str) -> List[str]:
+    return base_command(chip, options) + ["-U", f"eeprom:r:{file_path}:i"]
+
+def verify_eeprom_command(chip: ChipInfo, options: CommandOptions, file_path: str) -> List[str]:
+    return base_command(chip, options) + ["-U", f"eeprom:v:{file_path}:i"]
+
+@dataclass
+class ProgramStep:
+    memory: str
+    operation: str
+    value: str
+    description: str
+
+    def update_argument(self) -> List[str]:
+        return ["-U", f"{self.memory}:{self.operation}:{self.value}"]
+
+# Fuses go first so clock changes apply to the rest of the session, lock
+# bits go last because they block further writes and read-back
+FUSE_ORDER = ["lfuse", "hfuse", "efuse"]
+
+def plan_program_board(flash_file: Optional[str] = None, eeprom_file: Optional[str] = None,
+                       fuses: Optional[Dict[str, str]] = None,
+                       lock: Optional[str] = None) -> List[ProgramStep]:
+    """Order the memory updates of a complete board programming run."""
+    steps = []
+    for fuse in FUSE_ORDER:
+        if fuses and fuses.get(fuse):
+            steps.append(ProgramStep(fuse, "w", f"{fuses[fuse]}:m", f"Write {fuse} = {fuses[fuse]}"))
+    if flash_file:
+        steps.append(ProgramStep("flash", "w", f"{flash_file}:i", f"Write flash from {flash_file}"))
+    if eeprom_file:
+        steps.append(ProgramStep("eeprom", "w", f"{eeprom_file}:i", f"Write EEPROM from {eeprom_file}"))
+    if lock:
+        steps.append(ProgramStep("lock", "w", f"{lock}:m", f"Write lock bits = {lock}"))
+    return steps
+
+def program_board_command(chip: ChipInfo, options: CommandOptions,
+                          steps: List[ProgramStep]) -> List[str]:
+    """Build one avrdude session that runs every step in order."""
+    cmd = base_command(chip, options) + _verify_flag(options)
+    if options.erase and any(step.memory == "flash" for step in steps):
+        cmd.append("-e")
+    for step in steps:
+        cmd.extend(step.update_argument())
+    return cmd
+
+def describe_plan(chip: ChipInfo, options: CommandOptions, steps: List[ProgramStep]) -> str:
+    """Human readable plan of a program board run."""
+    lines = [f"Program {chip.name} with {options.programmer}"
+             + (f" on {options.port}" if options.port else "") + ":"]
+    number = 1
+    if options.erase and any(step.memory == "flash" for step in steps):
+        lines.append(f"  {number}. Chip erase")
+        number += 1
+    for step in steps:
+        lines.append(f"  {number}. {step.description}")
+        number += 1
+    lines.append("  Each write is verified" if options.verify else "  Verification disabled")
+    lines.append("Command: " + " ".join(program_board_command(chip, options, steps)))
+    return "\n".join(lines)
@@ -0,0 +1,158 @@
+"""Recognise avrdude failures in its stderr and describe them as records.
+
+ErrorClassifier is fed stderr lines as they arrive and returns an
+ErrorRecord for every known failure, with the values avrdude printed:
+
+* ``target_not_responding``: no sync, init failed, signature 0x000000/0xFFFFFF
+* ``signature_mismatch``: expected and actual signature
+* ``verification_error``: memory, first bad address, expected and actual byte
+* ``fuse_mismatch``: a fuse or lock byte that reads back differently
+* ``programmer_not_found`` and ``permission_denied``: programmer access
+* ``usb_error``: a USB transfer that failed, usually transient
+
+Messages of avrdude 6 and 7 are both recognised; tests/test_diagnostics.py
+lists the wordings of each.
+"""
+import re
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+FUSE_MEMORIES = {"fuse", "lfuse", "hfuse", "efuse", "lock", "lockbits"} | {f"fuse{n}" for n in range(11)}
+
+_PERMISSION = re.compile(r"Permission denied|LIBUSB_ERROR_ACCESS|insufficient permissions|Access (?:is )?denied",
+                         re.IGNORECASE)
+_NOT_FOUND = re.compile(r"(?:could not|cannot|can't) find (?:USB device|\w+ device|programmer)|"
+                        r"did not find any (?:USB )?device|can't open device|cannot open port|"
+                        r"unable to open (?:port|programmer)", re.IGNORECASE)
+_NOT_RESPONDING = re.compile(r"not in sync|target (?:doesn'?t|does not) answer|initialization failed|"
+                             r"programmer is not responding|Invalid device signature|"
+                             r"cannot set sck period|target not responding", re.IGNORECASE)
+# avrdude 6 prints 0x1e950f, avrdude 7.2 and later 1E 95 0F
+_DEVICE_SIGNATURE = re.compile(r"device signature = (?:0x)?([0-9a-f]{2}) ?([0-9a-f]{2}) ?([0-9a-f]{2})\b",
+                               re.IGNORECASE)
+_EXPECTED_SIGNATURE = re.compile(r"expected signature for (.+?) is ((?:[0-9a-f]{2}\s*)+)", re.IGNORECASE)
+_VERIFYING = re.compile(r"verifying (\w+) memory", re.IGNORECASE)
+_FIRST_MISMATCH = re.compile(r"verification (?:error|mismatch), first mismatch at byte 0x([0-9a-f]+)",
+                             re.IGNORECASE)
+_MISMATCH_VALUES = re.compile(r"^\s*0x([0-9a-f]{2}) != 0x([0-9a-f]{2})", re.IGNORECASE)
+_SAFEMODE = re.compile(r"safemode: (\w+) changed! Was ([0-9a-f]+), and is now ([0-9a-f]+)", re.IGNORECASE)
+_USB = re.compile(r"error sending control message|usb_control_msg|LIBUSB_ERROR_(?:IO|PIPE|BUSY|TIMEOUT|OTHER)"
+                  r"|cannot claim interface|usb_transmit|Input/output error|Broken pipe", re.IGNORECASE)
+
+@dataclass
+class ErrorRecord:
+    kind: str
+    message: str
+    memory: Optional[str] = None
+    address: Optional[int] = None
+    expected: Optional[str] = None
+    actual: Optional[str] = None
+
+    def describe(self) -> str:
+        if self.kind == "signature_mismatch":
+            return f"Signature mismatch: expected {self.expected}, read {self.actual}"
+        if self.kind in ("verification_error", "fuse_mismatch"):
+            what = "Fuse write mismatch" if self.kind == "fuse_mismatch" else "Verification error"
+            text = f"{what} in {self.memory or 'memory'}"
+            if self.address is not None:
+                text += f" at 0x{self.address:04X}"
+            if self.expected is not None:
+                text += f": expected {self.expected}, read {self.actual}"
+            return text
+        titles = {
+            "target_not_responding": "Target not responding",
+            "programmer_not_found": "Programmer not found",
+            "permission_denied": "Permission denied",
+            "usb_error": "USB error",
+        }
+        return f"{titles.get(self.kind, self.kind)}: {self.message}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+class ErrorClassifier:
+    """Turns avrdude stderr lines into ErrorRecords, one line at a time."""
+    def __init__(self, on_record: Optional[Callable[[ErrorRecord], None]] = None):
+        self.on_record = on_record
+        self.records: List[ErrorRecord] = []
+        self.memory: Optional[str] = None
+        self.signature: Optional[str] = None
+        self.mismatch: Optional[ErrorRecord] = None
+
+    def feed(self, line: str) -> Optional[ErrorRecord]:
+        line = line.strip()
+        if not line:
+            return None
+        if self.mismatch is not None:
+            # The byte values follow on the line after the address, as
+            # "device != file"
+            record, self.mismatch = self.mismatch, None
+            match = _MISMATCH_VALUES.match(line)
+            if match:
+                record.actual = f"0x{match.group(1).upper()}"
+                record.expected = f"0x{match.group(2).upper()}"
+            return self._emit(record)
+        return self._emit(self._classify(line))
+
+    def _classify(self, line: str) -> Optional[ErrorRecord]:
+        match = _VERIFYING.search(line)
+        if match:
+            self.memory = match.group(1)
+            return None
+        match = _DEVICE_SIGNATURE.search(line)
+        if match:
+            self.signature = "0x" + "".join(match.groups()).upper()
+            if self.signature in ("0x000000", "0xFFFFFF"):
+                return ErrorRecord("target_not_responding", line, actual=self.signature)
+            return None
+        match = _EXPECTED_SIGNATURE.search(line)
+        if match:
+            expected = "0x" + "".join(match.group(2).split()).upper()
+            if self.signature in ("0x000000", "0xFFFFFF"):
+                # Already reported as a target that does not answer
+                return None
+            return ErrorRecord("signature_mismatch", line, expected=expected, actual=self.signature)
+        match = _FIRST_MISMATCH.search(line)
+        if match:
+            kind = "fuse_mismatch" if self.memory in FUSE_MEMORIES else "verification_error"
+            self.mismatch = ErrorRecord(kind, line, self.memory, int(match.group(1), 16))
+            return None
+        match = _SAFEMODE.search(line)
+        if match:
+            return ErrorRecord("fuse_mismatch", line, match.group(1),
+                               expected=f"0x{match.group(2).upper()}", actual=f"0x{match.group(3).upper()}")
+        if _PERMISSION.search(line):
+            return ErrorRecord("permission_denied", line)
+        if _NOT_FOUND.search(line):
+            return ErrorRecord("programmer_not_found", line)
+        if _NOT_RESPONDING.search(line):
+            return ErrorRecord("target_not_responding", line)
+        if _USB.search(line):
+            return ErrorRecord("usb_error", line)
+        return None
+
+    def _emit(self, record: Optional[ErrorRecord]) -> Optional[ErrorRecord]:
+        if record is None:
+            return None
+        # avrdude repeats sync errors once per attempt; one record per kind and memory is enough
+        for existing in self.records:
+            if existing.kind == record.kind and existing.memory == record.memory:
+                return None
+        self.records.append(record)
+        if self.on_record:
+            self.on_record(record)
+        return record
+
+    def finish(self) -> List[ErrorRecord]:
+        """Flush a mismatch whose byte values never arrived and return all records."""
+        if self.mismatch is not None:
+            record, self.mismatch = self.mismatch, None
+            self._emit(record)
+        return self.records
+
+def classify_output(text: str) -> List[ErrorRecord]:
+    """All error records in a complete stderr text."""
+    classifier = ErrorClassifier()
+    for line in text.splitlines():
+        classifier.feed(line)
+    return classifier.finish()
@@ -0,0 +1,77 @@
+"""Page-level differential flash updates.
+
+The image last written through a programmer is kept in a small on-disk
+cache. A new image is compared with it page by page and only the pages that
+changed are written, with auto-erase disabled.
+
+The cache knows what was written through the programmer, not which board
+is attached now, so callers verify it against the device first (avrdude
+only reads the pages the cached image uses) and otherwise compare with a
+read-back. Station mode, where every board is new, never uses it.
+"""
+import os
+import re
+from typing import List, Optional
+
+from chipdb import ChipInfo
+import intelhex
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "avrflasher", "devices")
+
+def changed_pages(new_image: intelhex.HexImage, base_image: intelhex.HexImage,
+                  page_size: int) -> List[int]:
+    """Return the indexes of flash pages whose content differs.
+
+    Undefined bytes compare as 0xFF on both sides, which is what an erased
+    page holds.
+    """
+    addresses = set()
+    for image in (new_image, base_image):
+        for page_index in image.pages:
+            start = page_index * image.page_size
+            addresses.update(range(start // page_size,
+                                   (start + image.page_size - 1) // page_size + 1))
+
+    changed = []
+    for page_index in sorted(addresses):
+        address = page_index * page_size
+        if new_image.read(address, page_size) != base_image.read(address, page_size):
+            changed.append(page_index)
+    return changed
+
+def delta_image(new_image: intelhex.HexImage, pages: List[int], page_size: int) -> intelhex.HexImage:
+    """Build an image holding complete copies of the given pages."""
+    delta = intelhex.HexImage(page_size)
+    for page_index in pages:
+        address = page_index * page_size
+        delta.write(address, new_image.read(address, page_size))
+    return delta
+
+def _cache_path(chip: ChipInfo, port: Optional[str], cache_dir: str) -> str:
+    key = re.sub(r"[^A-Za-z0-9_.-]", "_", f"{port or 'default'}-{chip.command}")
+    return os.path.join(cache_dir, key + ".hex")
+
+def last_image_path(chip: ChipInfo, port: Optional[str], cache_dir: str = CACHE_DIR) -> Optional[str]:
+    """The cached image file of this chip and port, for verifying it against the device."""
+    path = _cache_path(chip, port, cache_dir)
+    return path if os.path.isfile(path) else None
+
+def load_last_image(chip: ChipInfo, port: Optional[str],
+                    cache_dir: str = CACHE_DIR) -> Optional[intelhex.HexImage]:
+    """Return the image last written to this chip through this port, if known."""
+    try:
+        return intelhex.read_hex(_cache_path(chip, port, cache_dir))
+    except (OSError, ValueError):
+        return None
+
+def store_last_image(chip: ChipInfo, port: Optional[str], image: intelhex.HexImage,
+                     cache_dir: str = CACHE_DIR):
+    """Remember the content just written to this chip."""
+    os.makedirs(cache_dir, exist_ok=True)
+    intelhex.write_hex(image, _cache_path(chip, port, cache_dir))
+
+def forget_last_image(chip: ChipInfo, port: Optional[str], cache_dir: str = CACHE_DIR):
+    try:
+        os.remove(_cache_path(chip, port, cache_dir))
+    except OSError:
+        pass
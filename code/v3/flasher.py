@@ -0,0 +1,280 @@
+"""Qt-free asyncio API for driving avrdude.
+
+Every avrdude run is a FlashSession: a subprocess started with
+``asyncio.create_subprocess_exec`` whose output is read without threads, so
+a single event loop can drive dozens of programmers at once::
+
+    flasher = Flasher(chip, CommandOptions(programmer="usbasp", port="usb:01"))
+    session = flasher.write_flash("firmware.hex")
+    async for event in session.events():
+        print(event)                  # OutputLine, ProgressEvent or ErrorRecord
+    result = await session           # runner.ProcessResult
+
+    results = await asyncio.gather(*(f.write_flash("fw.hex") for f in flashers))
+
+A session starts when it is first awaited or iterated, or by ``start()``.
+BackgroundLoop runs an event loop on its own thread for callers that are
+not asyncio programs themselves, such as the GUI.
+"""
+import asyncio
+import signal
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+import commands
+import intelhex
+from chipdb import ChipInfo
+from commands import CommandOptions
+from diagnostics import ErrorClassifier, ErrorRecord
+from progress import ProgressEvent, ProgressParser
+from retry import RetryPolicy, RetryState, describe_retry
+from runner import (CHUNK_SIZE, KILL_GRACE_SECONDS, LineSplitter, ProcessResult,
+                    process_group_options, signal_process_group)
+
+@dataclass
+class OutputLine:
+    """A line of avrdude's stderr; ``update`` lines redraw the previous one."""
+    text: str
+    update: bool = False
+
+_END = object()
+
+class FlashSession:
+    def __init__(self, argv: List[str], timeout: Optional[float] = None,
+                 memory_sizes: Optional[Dict[str, int]] = None, input: Optional[bytes] = None,
+                 on_line: Optional[Callable[[str], None]] = None,
+                 on_update: Optional[Callable[[str], None]] = None,
+                 on_event: Optional[Callable[[ProgressEvent], None]] = None,
+                 on_error: Optional[Callable[[ErrorRecord], None]] = None):
+        self.argv = argv
+        self.timeout = timeout or None
+        self.input = input
+        self.on_line = on_line
+        self.on_update = on_update
+        self.on_event = on_event
+        self.on_error = on_error
+        self.parser = ProgressParser(memory_sizes)
+        self.classifier = ErrorClassifier(self._error)
+        self.process = None
+        self.timed_out = False
+        self.cancelled = False
+        self._task: Optional[asyncio.Task] = None
+        self._queue: Optional[asyncio.Queue] = None
+
+    def start(self) -> 'FlashSession':
+        """Start avrdude on the running event loop; calling it again does nothing."""
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.ensure_future(self._run())
+        return self
+
+    def __await__(self):
+        return self.start()._task.__await__()
+
+    @property
+    def done(self) -> bool:
+        return self._task is not None and self._task.done()
+
+    async def events(self) -> AsyncIterator[Any]:
+        """Yield OutputLine, ProgressEvent and ErrorRecord items until avrdude exits.
+
+        Events are queued from the start of the session, so iterating late
+        misses nothing; only one consumer should iterate.
+        """
+        self.start()
+        while True:
+            event = await self._queue.get()
+            if event is _END:
+                return
+            yield event
+
+    def cancel(self):
+        """Stop the avrdude process group; a session that has not started never runs."""
+        self.cancelled = True
+        self._terminate()
+
+    async def _run(self) -> ProcessResult:
+        try:
+            if self.cancelled:
+                return ProcessResult(None, cancelled=True)
+            self.process = await asyncio.create_subprocess_exec(
+                *self.argv,
+                stdin=asyncio.subprocess.PIPE if self.input is not None else None,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                **process_group_options()
+            )
+            if self.cancelled:
+                self._terminate()
+            timer = None
+            if self.timeout:
+                timer = asyncio.get_event_loop().call_later(self.timeout, self._on_timeout)
+            try:
+                stdout, stderr = [], []
+                readers = [
+                    _drain(self.process.stdout, LineSplitter(), stdout),
+                    _drain(self.process.stderr, LineSplitter(self._line, self._update), stderr),
+                ]
+                if self.input is not None:
+                    readers.append(_feed(self.process.stdin, self.input))
+                await asyncio.gather(*readers)
+                returncode = await self.process.wait()
+            finally:
+                if timer is not None:
+                    timer.cancel()
+            return ProcessResult(returncode, "".join(stdout), self.timed_out, self.cancelled,
+                                 "".join(stderr), self.classifier.finish())
+        finally:
+            self._queue.put_nowait(_END)
+
+    def _line(self, line: str):
+        self._queue.put_nowait(OutputLine(line))
+        if self.on_line:
+            self.on_line(line)
+        self._parse(line)
+        self.classifier.feed(line)
+
+    def _error(self, record: ErrorRecord):
+        self._queue.put_nowait(record)
+        if self.on_error:
+            self.on_error(record)
+
+    def _update(self, line: str):
+        self._queue.put_nowait(OutputLine(line, update=True))
+        if self.on_update:
+            self.on_update(line)
+        self._parse(line)
+
+    def _parse(self, line: str):
+        event = self.parser.feed(line)
+        if event is not None:
+            self._queue.put_nowait(event)
+            if self.on_event:
+                self.on_event(event)
+
+    def _on_timeout(self):
+        self.timed_out = True
+        self._terminate()
+
+    def _terminate(self):
+        process = self.process
+        if process is None or process.returncode is not None:
+            return
+        signal_process_group(process, signal.SIGTERM)
+        asyncio.get_event_loop().call_later(KILL_GRACE_SECONDS, self._kill, process)
+
+    @staticmethod
+    def _kill(process):
+        if process.returncode is None:
+            signal_process_group(process, getattr(signal, "SIGKILL", signal.SIGTERM))
+
+async def _drain(stream: asyncio.StreamReader, splitter: LineSplitter, collected=None):
+    while True:
+        # Returns whatever is available instead of waiting for a full line
+        chunk = await stream.read(CHUNK_SIZE)
+        text = splitter.feed(chunk, final=not chunk)
+        if collected is not None:
+            collected.append(text)
+        if not chunk:
+            return
+
+async def _feed(stream: asyncio.StreamWriter, data: bytes):
+    try:
+        stream.write(data)
+        await stream.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        # avrdude exited early; its exit code tells what went wrong
+        pass
+    finally:
+        stream.close()
+
+async def run_with_retry(run: Callable[[List[str]], Awaitable[ProcessResult]], argv: List[str],
+                         policy: RetryPolicy, on_retry: Optional[Callable[[str], None]] = None,
+                         sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep) -> ProcessResult:
+    """retry.run_with_retry() for coroutine runners, e.g. ``lambda argv: flasher.run(argv)``."""
+    state = RetryState(policy, commands.command_bit_clock(argv), writes=commands.command_writes(argv))
+    while True:
+        result = await run(argv)
+        if result.ok:
+            return result
+        decision = state.after_failure(result)
+        if not decision.retry:
+            return result
+        if on_retry:
+            on_retry(describe_retry(decision, state.attempts))
+        await sleep(decision.delay)
+        argv = commands.with_bit_clock(argv, decision.bit_clock)
+
+class Flasher:
+    """Builds FlashSessions for one chip on one programmer."""
+    def __init__(self, chip: ChipInfo, options: Optional[CommandOptions] = None,
+                 timeout: Optional[float] = None):
+        self.chip = chip
+        self.options = options or CommandOptions()
+        self.timeout = timeout
+
+    @property
+    def memory_sizes(self) -> Dict[str, int]:
+        return {"flash": self.chip.flash_size, "eeprom": self.chip.eeprom_size}
+
+    def run(self, argv: List[str], input: Optional[bytes] = None, **callbacks) -> FlashSession:
+        """A session for any avrdude argv, with this flasher's timeout and memory sizes."""
+        return FlashSession(argv, self.timeout, self.memory_sizes, input, **callbacks)
+
+    def write_flash(self, file_path: str = "-", input: Optional[bytes] = None) -> FlashSession:
+        """Write flash from a file, or from ``input`` (Intel HEX) when no file is given."""
+        return self.run(commands.write_flash_command(self.chip, self.options, file_path), input)
+
+    def read_flash(self, file_path: str) -> FlashSession:
+        return self.run(commands.read_flash_command(self.chip, self.options, file_path))
+
+    def verify_flash(self, file_path: str) -> FlashSession:
+        return self.run(commands.verify_flash_command(self.chip, self.options, file_path))
+
+    def write_eeprom(self, file_path: str = "-", input: Optional[bytes] = None) -> FlashSession:
+        return self.run(commands.write_eeprom_command(self.chip, self.options, file_path), input)
+
+    def read_eeprom(self, file_path: str) -> FlashSession:
+        return self.run(commands.read_eeprom_command(self.chip, self.options, file_path))
+
+    def verify_eeprom(self, file_path: str) -> FlashSession:
+        return self.run(commands.verify_eeprom_command(self.chip, self.options, file_path))
+
+    def write_fuses(self, lfuse: str, hfuse: str, efuse: str) -> FlashSession:
+        return self.run(commands.write_fuses_command(self.chip, self.options, lfuse, hfuse, efuse))
+
+    def read_fuses(self) -> FlashSession:
+        return self.run(commands.read_fuses_command(self.chip, self.options))
+
+    async def read_values(self, session: Optional[FlashSession] = None) -> Dict[str, bytes]:
+        """Fuses, lock byte and signature by name; empty if the read failed."""
+        session = session or self.read_fuses()
+        result = await session
+        return commands.parse_read_output(session.argv, result.stdout) if result.ok else {}
+
+    async def read_memory(self, memory: str = "flash") -> Optional[intelhex.HexImage]:
+        """Read a memory through avrdude's stdout, or None if the read failed."""
+        read = commands.read_flash_command if memory == "flash" else commands.read_eeprom_command
+        result = await self.run(read(self.chip, self.options, "-"))
+        return intelhex.parse_hex(result.stdout.splitlines()) if result.ok else None
+
+class BackgroundLoop:
+    """An asyncio event loop on a daemon thread, for callers outside asyncio."""
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="flasher", daemon=True)
+        self.thread.start()
+
+    def submit(self, coroutine) -> Future:
+        """Run a coroutine on the loop; the returned future can be waited on from any thread."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def call(self, function: Callable, *args):
+        """Call a function on the loop thread, e.g. FlashSession.cancel."""
+        self.loop.call_soon_threadsafe(function, *args)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
@@ -0,0 +1,295 @@
+"""Intel HEX reading and writing.
+
+Records are streamed line by line into a sparse page map, so a 256 KB image
+only allocates the pages it actually uses.
+"""
+import hashlib
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 256
+
+RECORD_DATA = 0x00
+RECORD_EOF = 0x01
+RECORD_EXT_SEGMENT = 0x02
+RECORD_START_SEGMENT = 0x03
+RECORD_EXT_LINEAR = 0x04
+RECORD_START_LINEAR = 0x05
+
+class HexFormatError(ValueError):
+    def __init__(self, message: str, line_number: int = 0):
+        if line_number:
+            message = f"line {line_number}: {message}"
+        super().__init__(message)
+        self.line_number = line_number
+
+class ImageTooLargeError(ValueError):
+    pass
+
+class HexImage:
+    """Sparse memory image made of fixed-size pages.
+
+    Bytes that were never written read back as ``fill``. ``masks`` keeps track
+    of which bytes in a page were actually defined by the file.
+    """
+    def __init__(self, page_size: int = DEFAULT_PAGE_SIZE, fill: int = 0xFF):
+        self.page_size = page_size
+        self.fill = fill
+        self.pages: Dict[int, bytearray] = {}
+        self.masks: Dict[int, bytearray] = {}
+        self.start_address = None
+        self.size = 0
+
+    def _page(self, page_index: int) -> Tuple[bytearray, bytearray]:
+        page = self.pages.get(page_index)
+        if page is None:
+            page = self.pages[page_index] = bytearray([self.fill]) * self.page_size
+            self.masks[page_index] = bytearray(self.page_size)
+        return page, self.masks[page_index]
+
+    def write(self, address: int, data: bytes):
+        """Store data at an absolute address."""
+        offset = 0
+        while offset < len(data):
+            page_index, page_offset = divmod(address + offset, self.page_size)
+            count = min(self.page_size - page_offset, len(data) - offset)
+            page, mask = self._page(page_index)
+            page[page_offset:page_offset + count] = data[offset:offset + count]
+            self.size += count - mask.count(1, page_offset, page_offset + count)
+            mask[page_offset:page_offset + count] = b"\x01" * count
+            offset += count
+
+    def read(self, address: int, length: int) -> bytes:
+        """Read a range, filling undefined bytes with ``fill``."""
+        result = bytearray()
+        end = address + length
+        while address < end:
+            page_index, page_offset = divmod(address, self.page_size)
+            count = min(self.page_size - page_offset, end - address)
+            page = self.pages.get(page_index)
+            if page is None:
+                result += bytes([self.fill]) * count
+            else:
+                result += page[page_offset:page_offset + count]
+            address += count
+        return bytes(result)
+
+    def mask(self, address: int, length: int) -> bytes:
+        """Read which bytes of a range are defined: 1 for defined, 0 otherwise."""
+        result = bytearray()
+        end = address + length
+        while address < end:
+            page_index, page_offset = divmod(address, self.page_size)
+            count = min(self.page_size - page_offset, end - address)
+            mask = self.masks.get(page_index)
+            if mask is None:
+                result += bytes(count)
+            else:
+                result += mask[page_offset:page_offset + count]
+            address += count
+        return bytes(result)
+
+    @property
+    def min_address(self) -> int:
+        if not self.pages:
+            return 0
+        first = min(self.pages)
+        return first * self.page_size + self.masks[first].index(1)
+
+    @property
+    def max_address(self) -> int:
+        """Address of the last defined byte, or -1 for an empty image."""
+        if not self.pages:
+            return -1
+        last = max(self.pages)
+        return last * self.page_size + self.masks[last].rindex(1)
+
+    def page_indexes(self) -> List[int]:
+        return sorted(self.pages)
+
+    def segments(self) -> Iterator[Tuple[int, bytes]]:
+        """Yield (address, data) for each contiguous run of defined bytes."""
+        run_start = None
+        run = bytearray()
+        for page_index in self.page_indexes():
+            page = self.pages[page_index]
+            mask = self.masks[page_index]
+            base = page_index * self.page_size
+            offset = mask.find(1)
+            while offset != -1:
+                end = mask.find(0, offset)
+                if end == -1:
+                    end = self.page_size
+                if run_start is not None and run_start + len(run) != base + offset:
+                    yield run_start, bytes(run)
+                    run_start = None
+                if run_start is None:
+                    run_start = base + offset
+                    run = bytearray()
+                run += page[offset:end]
+                offset = mask.find(1, end)
+        if run_start is not None:
+            yield run_start, bytes(run)
+
+def content_hash(image: HexImage, layout: Optional[HexImage] = None) -> str:
+    """SHA-256 over the defined bytes of an image and their addresses.
+
+    With a ``layout`` the bytes are taken from ``image`` at the addresses
+    ``layout`` defines, so a device read-back can be hashed over exactly the
+    range a firmware image uses and compared with ``content_hash(firmware)``.
+    """
+    layout = layout or image
+    digest = hashlib.sha256()
+    for address, data in layout.segments():
+        digest.update(address.to_bytes(4, "little"))
+        digest.update(len(data).to_bytes(4, "little"))
+        digest.update(data if layout is image else image.read(address, len(data)))
+    return digest.hexdigest()
+
+COMPARE_BLOCK = 64
+
+def mismatches(expected: bytes, actual: bytes, address: int = 0) -> List[int]:
+    """Addresses where two equally long byte strings differ, starting at ``address``.
+
+    Equal blocks are skipped with a single slice comparison, so only blocks
+    that actually differ are compared byte by byte.
+    """
+    expected, actual = memoryview(expected), memoryview(actual)
+    if expected == actual:
+        return []
+    result = []
+    for start in range(0, len(expected), COMPARE_BLOCK):
+        end = start + COMPARE_BLOCK
+        if expected[start:end] != actual[start:end]:
+            result.extend(address + offset for offset in range(start, min(end, len(expected)))
+                          if expected[offset] != actual[offset])
+    return result
+
+def compare(image: HexImage, device: HexImage) -> List[int]:
+    """Addresses where ``device`` differs from ``image``, over the bytes the image defines.
+
+    Bytes missing from the read-back count as erased (avrdude leaves
+    trailing 0xFF out of its output).
+    """
+    result = []
+    for address, data in image.segments():
+        result.extend(mismatches(data, device.read(address, len(data)), address))
+    return result
+
+def describe_addresses(addresses: List[int], limit: int = 8) -> str:
+    """Short text for a list of addresses, merging consecutive ones into ranges."""
+    ranges = []
+    for address in addresses:
+        if ranges and ranges[-1][1] == address - 1:
+            ranges[-1][1] = address
+        else:
+            ranges.append([address, address])
+    text = ", ".join(f"0x{start:04X}" if start == end else f"0x{start:04X}-0x{end:04X}"
+                     for start, end in ranges[:limit])
+    if len(ranges) > limit:
+        text += f" and {len(ranges) - limit} more range(s)"
+    return text
+
+def _parse_record(line: str, line_number: int) -> Tuple[int, int, int, bytes]:
+    if not line.startswith(":"):
+        raise HexFormatError("record does not start with ':'", line_number)
+    try:
+        raw = bytes.fromhex(line[1:])
+    except ValueError:
+        raise HexFormatError("invalid hex digits", line_number) from None
+    if len(raw) < 5:
+        raise HexFormatError("record too short", line_number)
+
+    length = raw[0]
+    if len(raw) != length + 5:
+        raise HexFormatError(f"length field {length} does not match record", line_number)
+    if sum(raw) & 0xFF:
+        raise HexFormatError("checksum mismatch", line_number)
+
+    address = (raw[1] << 8) | raw[2]
+    return raw[3], address, length, raw[4:4 + length]
+
+def read_hex(file_path: str, page_size: int = DEFAULT_PAGE_SIZE) -> HexImage:
+    """Parse an Intel HEX file into a HexImage."""
+    with open(file_path, "r") as file:
+        return parse_hex(file, page_size)
+
+def parse_hex(lines: Iterable[str], page_size: int = DEFAULT_PAGE_SIZE) -> HexImage:
+    """Parse Intel HEX lines, e.g. avrdude's read-back on stdout, into a HexImage."""
+    image = HexImage(page_size)
+    base = 0
+    seen_eof = False
+
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        if seen_eof:
+            raise HexFormatError("data after end-of-file record", line_number)
+
+        record_type, address, length, data = _parse_record(line, line_number)
+        if record_type == RECORD_DATA:
+            image.write(base + address, data)
+        elif record_type == RECORD_EOF:
+            seen_eof = True
+        elif record_type == RECORD_EXT_SEGMENT:
+            if length != 2:
+                raise HexFormatError("bad extended segment address record", line_number)
+            base = int.from_bytes(data, "big") << 4
+        elif record_type == RECORD_EXT_LINEAR:
+            if length != 2:
+                raise HexFormatError("bad extended linear address record", line_number)
+            base = int.from_bytes(data, "big") << 16
+        elif record_type in (RECORD_START_SEGMENT, RECORD_START_LINEAR):
+            if length != 4:
+                raise HexFormatError("bad start address record", line_number)
+            image.start_address = int.from_bytes(data, "big")
+        else:
+            raise HexFormatError(f"unknown record type {record_type:#04x}", line_number)
+
+    if not seen_eof:
+        raise HexFormatError("missing end-of-file record")
+    return image
+
+def format_record(record_type: int, address: int, data: bytes) -> str:
+    raw = bytes([len(data), (address >> 8) & 0xFF, address & 0xFF, record_type]) + data
+    checksum = (-sum(raw)) & 0xFF
+    return ":" + raw.hex().upper() + f"{checksum:02X}\n"
+
+def format_hex(image: HexImage, record_size: int = 16) -> str:
+    """Render a HexImage as Intel HEX text."""
+    lines = []
+    upper = 0
+    for address, data in image.segments():
+        offset = 0
+        while offset < len(data):
+            current = address + offset
+            if current >> 16 != upper:
+                upper = current >> 16
+                lines.append(format_record(RECORD_EXT_LINEAR, 0, upper.to_bytes(2, "big")))
+            # Records may not cross a 64 KB boundary
+            count = min(record_size, len(data) - offset, 0x10000 - (current & 0xFFFF))
+            lines.append(format_record(RECORD_DATA, current & 0xFFFF, data[offset:offset + count]))
+            offset += count
+    if image.start_address is not None:
+        lines.append(format_record(RECORD_START_LINEAR, 0, image.start_address.to_bytes(4, "big")))
+    lines.append(format_record(RECORD_EOF, 0, b""))
+    return "".join(lines)
+
+def write_hex(image: HexImage, file_path: str, record_size: int = 16):
+    """Write a HexImage to an Intel HEX file."""
+    with open(file_path, "w") as file:
+        file.write(format_hex(image, record_size))
+
+def check_fits(image: HexImage, memory_size: int, memory_name: str = "flash"):
+    """Raise ImageTooLargeError if the image uses addresses past the memory size."""
+    if image.max_address >= memory_size:
+        raise ImageTooLargeError(
+            f"Image uses {memory_name} up to 0x{image.max_address:X} but the chip only has "
+            f"{memory_size} bytes (last address 0x{memory_size - 1:X})")
+
+def preflight(file_path: str, memory_size: int, memory_name: str = "flash",
+              page_size: int = DEFAULT_PAGE_SIZE) -> HexImage:
+    """Parse and size-check an image before any avrdude process is started."""
+    image = read_hex(file_path, page_size)
+    check_fits(image, memory_size, memory_name)
+    return image
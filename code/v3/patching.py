@@ -0,0 +1,276 @@
+"""Per-unit patching of flash and EEPROM images in memory.
+
+A production run programs the same images into every board but with a few
+bytes changed per unit: a serial number, a MAC address, calibration values
+and a CRC over the patched firmware. The base images are rendered to Intel
+HEX once, leaving open slots for the records that fields touch; each unit
+only renders those few records, so preparing a unit takes microseconds and
+the result can be piped straight into avrdude (``-U eeprom:w:-:i``).
+
+Fields are described in JSON, e.g.::
+
+    [{"type": "counter", "name": "serial", "memory": "eeprom", "address": 0, "width": 4, "start": 1000},
+     {"type": "template", "memory": "eeprom", "address": 4, "template": "020000{serial:06X}",
+      "encoding": "hex", "length": 6},
+     {"type": "template", "memory": "eeprom", "address": 10, "template": "{calibration}",
+      "encoding": "hex", "length": 2},
+     {"type": "crc", "memory": "flash", "address": 32766, "start": 0, "end": 32766, "algorithm": "crc16"}]
+
+Counters are named so templates can use them; other template values are
+supplied per unit (for example measured calibration bytes). Templates need a
+fixed ``length`` and are padded with zero bytes up to it.
+"""
+import binascii
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import intelhex
+
+RECORD_SIZE = 16
+
+class PatchError(ValueError):
+    pass
+
+@dataclass
+class CounterField:
+    memory: str
+    address: int
+    name: str = "serial"
+    width: int = 4
+    start: int = 0
+    step: int = 1
+    byteorder: str = "little"
+
+    @property
+    def length(self) -> int:
+        return self.width
+
+    def render(self, unit: int, values: Dict[str, Any]) -> bytes:
+        value = self.start + self.step * unit
+        values[self.name] = value
+        try:
+            return value.to_bytes(self.width, self.byteorder)
+        except OverflowError:
+            raise PatchError(f"counter {self.name}={value} does not fit in {self.width} byte(s)")
+
+@dataclass
+class TemplateField:
+    memory: str
+    address: int
+    template: str
+    encoding: str = "ascii"
+    length: int = 0
+
+    def render(self, unit: int, values: Dict[str, Any]) -> bytes:
+        try:
+            text = self.template.format(unit=unit, **values)
+        except KeyError as e:
+            raise PatchError(f"template {self.template!r} has no value for {e}")
+        except ValueError as e:
+            raise PatchError(f"template {self.template!r}: {e}")
+        if self.encoding == "hex":
+            data = bytes.fromhex(text.replace(":", "").replace("-", "").replace(" ", ""))
+        else:
+            data = text.encode(self.encoding)
+        if self.length:
+            if len(data) > self.length:
+                raise PatchError(f"template {self.template!r} gives {len(data)} bytes, "
+                                 f"the field has {self.length}")
+            data = data.ljust(self.length, b"\0")
+        return data
+
+@dataclass
+class CrcField:
+    memory: str
+    address: int
+    start: int
+    end: int
+    algorithm: str = "crc16"
+    byteorder: str = "little"
+
+    @property
+    def length(self) -> int:
+        return 2 if self.algorithm == "crc16" else 4
+
+    def update(self, data: bytes, crc: Optional[int] = None) -> int:
+        """Continue a running CRC over ``data``; None starts a new one."""
+        if self.algorithm == "crc16":
+            # CRC-16/CCITT-FALSE
+            return binascii.crc_hqx(data, 0xFFFF if crc is None else crc)
+        return binascii.crc32(data, crc or 0)
+
+    def checksum(self, data: bytes, crc: Optional[int] = None) -> bytes:
+        return self.update(data, crc).to_bytes(self.length, self.byteorder)
+
+FIELD_TYPES = {"counter": CounterField, "template": TemplateField, "crc": CrcField}
+
+def field_from_dict(data: Dict[str, Any]):
+    data = dict(data)
+    kind = data.pop("type", None)
+    if kind not in FIELD_TYPES:
+        raise PatchError(f"unknown field type {kind!r}")
+    for key in ("address", "start", "end"):
+        if isinstance(data.get(key), str):
+            data[key] = int(data[key], 0)
+    try:
+        return FIELD_TYPES[kind](**data)
+    except TypeError as e:
+        raise PatchError(f"bad {kind} field: {e}")
+
+def load_fields(file_path: str) -> List[Any]:
+    with open(file_path, "r") as file:
+        return [field_from_dict(data) for data in json.load(file)]
+
+def _render_window(address: int, data: bytes, mask: bytes) -> str:
+    """Data records for the defined bytes of one record-sized window."""
+    records = []
+    offset = mask.find(1)
+    while offset != -1:
+        end = mask.find(0, offset)
+        if end == -1:
+            end = len(mask)
+        records.append(intelhex.format_record(
+            intelhex.RECORD_DATA, (address + offset) & 0xFFFF, data[offset:end]))
+        offset = mask.find(1, end)
+    return "".join(records)
+
+class PatchedMemory:
+    """Intel HEX of one memory, pre-rendered except for the windows fields patch."""
+    def __init__(self, image: intelhex.HexImage, ranges: List[Tuple[int, int]]):
+        self.image = image
+        patched = {window for start, length in ranges
+                   for window in range(start - start % RECORD_SIZE, start + length, RECORD_SIZE)}
+        windows = set(patched)
+        for address, data in image.segments():
+            windows.update(range(address - address % RECORD_SIZE, address + len(data), RECORD_SIZE))
+
+        self.parts: List[str] = []
+        self.slots: Dict[int, int] = {}
+        self.base: Dict[int, Tuple[bytes, bytes]] = {}
+        upper = 0
+        for window in sorted(windows):
+            if window >> 16 != upper:
+                upper = window >> 16
+                self.parts.append(intelhex.format_record(
+                    intelhex.RECORD_EXT_LINEAR, 0, upper.to_bytes(2, "big")))
+            data = image.read(window, RECORD_SIZE)
+            mask = image.mask(window, RECORD_SIZE)
+            if window in patched:
+                self.slots[window] = len(self.parts)
+                self.base[window] = (data, mask)
+                self.parts.append("")
+            else:
+                self.parts.append(_render_window(window, data, mask))
+        if image.start_address is not None:
+            self.parts.append(intelhex.format_record(
+                intelhex.RECORD_START_LINEAR, 0, image.start_address.to_bytes(4, "big")))
+        self.parts.append(intelhex.format_record(intelhex.RECORD_EOF, 0, b""))
+        self._join_static_parts()
+
+    def _join_static_parts(self):
+        """Merge the runs of fixed records between slots into single strings."""
+        slot_windows = {index: window for window, index in self.slots.items()}
+        parts, run = [], []
+        for index, part in enumerate(self.parts):
+            if index in slot_windows:
+                parts.append("".join(run))
+                self.slots[slot_windows[index]] = len(parts)
+                parts.append("")
+                run = []
+            else:
+                run.append(part)
+        parts.append("".join(run))
+        self.parts = parts
+
+    def render(self, patches: List[Tuple[int, bytes]]) -> str:
+        windows = {window: (bytearray(data), bytearray(mask))
+                   for window, (data, mask) in self.base.items()}
+        for address, value in patches:
+            for offset, byte in enumerate(value):
+                window, position = divmod(address + offset, RECORD_SIZE)
+                data, mask = windows[window * RECORD_SIZE]
+                data[position] = byte
+                mask[position] = 1
+        parts = list(self.parts)
+        for window, (data, mask) in windows.items():
+            parts[self.slots[window]] = _render_window(window, data, mask)
+        return "".join(parts)
+
+class PatchEngine:
+    """Applies per-unit fields to base images and renders them as Intel HEX."""
+    def __init__(self, images: Dict[str, intelhex.HexImage], fields: List[Any]):
+        self.fields = fields
+        # Checksums go last so they cover every other patched byte
+        self.order = ([field for field in fields if not isinstance(field, CrcField)]
+                      + [field for field in fields if isinstance(field, CrcField)])
+        self.images = dict(images)
+        for field in fields:
+            self.images.setdefault(field.memory, intelhex.HexImage())
+
+        lengths = {id(field): self._static_length(field) for field in fields}
+        self.memories = {
+            memory: PatchedMemory(image, [(field.address, lengths[id(field)])
+                                          for field in fields if field.memory == memory])
+            for memory, image in self.images.items()
+        }
+        # The part of a CRC range before the first patched byte is the same
+        # for every unit, so its CRC is computed once here
+        self.crc_ranges = {}
+        for field in fields:
+            if isinstance(field, CrcField):
+                first = min([other.address for other in fields if other is not field
+                             and other.memory == field.memory
+                             and other.address + lengths[id(other)] > field.start
+                             and other.address < field.end] + [field.end])
+                first = max(first, field.start)
+                image = self.images[field.memory]
+                self.crc_ranges[id(field)] = (first, field.update(image.read(field.start, first - field.start)),
+                                              image.read(first, field.end - first))
+
+    @staticmethod
+    def _static_length(field) -> int:
+        length = getattr(field, "length", 0)
+        if not length:
+            raise PatchError(f"template {field.template!r} needs a fixed length")
+        return length
+
+    def patches(self, unit: int, values: Optional[Dict[str, Any]] = None) -> Dict[str, List[Tuple[int, bytes]]]:
+        """The (address, bytes) patches of every memory for one unit."""
+        values = dict(values or {})
+        result = {memory: [] for memory in self.images}
+        for field in self.order:
+            if isinstance(field, CrcField):
+                first, crc, tail = self.crc_ranges[id(field)]
+                data = bytearray(tail)
+                for address, value in result[field.memory]:
+                    start = max(address, first)
+                    end = min(address + len(value), field.end)
+                    if start < end:
+                        data[start - first:end - first] = value[start - address:end - address]
+                value = field.checksum(data, crc)
+            else:
+                value = field.render(unit, values)
+                if len(value) != self._static_length(field):
+                    raise PatchError(f"field at 0x{field.address:04X} rendered {len(value)} "
+                                     f"byte(s), expected {self._static_length(field)}")
+            result[field.memory].append((field.address, value))
+        return result
+
+    def render(self, unit: int, values: Optional[Dict[str, Any]] = None) -> Dict[str, bytes]:
+        """Intel HEX for every memory of one unit, ready to pipe into avrdude."""
+        return {memory: self.memories[memory].render(patches).encode("ascii")
+                for memory, patches in self.patches(unit, values).items()}
+
+    def check_fits(self, sizes: Dict[str, int]):
+        """Raise ImageTooLargeError if an image or a field lies past its memory's size."""
+        for memory, image in self.images.items():
+            last = max([image.max_address] + [field.address + self._static_length(field) - 1
+                                              for field in self.fields if field.memory == memory])
+            size = sizes.get(memory, 0)
+            if last >= size:
+                raise intelhex.ImageTooLargeError(
+                    f"{memory} patches reach 0x{last:X} but the chip only has {size} bytes")
+
+    def patched_memories(self) -> List[str]:
+        return [memory for memory in self.images if any(f.memory == memory for f in self.fields)]
@@ -0,0 +1,103 @@
+import os
+from collections import Counter
+from dataclasses import dataclass
+from typing import List, Optional
+
+SYSFS_USB_DEVICES = "/sys/bus/usb/devices"
+
+# (vendor id, product id) -> avrdude programmer id
+KNOWN_PROGRAMMERS = {
+    ("16c0", "05dc"): "usbasp",
+    ("03eb", "c7b4"): "usbasp",
+    ("1781", "0c9f"): "usbtiny",
+    ("03eb", "2104"): "avrispmkII",
+    ("03eb", "2141"): "atmelice_isp",
+}
+
+# Programmers that talk to a bootloader on the board's own USB serial port
+BOOTLOADER_PROGRAMMERS = {"arduino", "urclock", "avr109", "butterfly", "wiring"}
+
+# Programmers for the one-wire UPDI and the two-wire PDI interface, which
+# have no ISP clock and erase flash page by page while writing
+UPDI_PROGRAMMERS = {"serialupdi", "jtag2updi", "pickit4_updi", "atmelice_updi"}
+PDI_PROGRAMMERS = {"atmelice_pdi", "avrispmkII_pdi"}
+
+# Programmers whose avrdude driver reads ``usb:<bus>:<device>`` as a bus and
+# device number; the other drivers match the text after ``usb:`` against the
+# serial number
+BUS_ADDRESSED_PROGRAMMERS = {"usbtiny"}
+
+@dataclass
+class Programmer:
+    programmer: str
+    port: Optional[str]
+    serial: str = ""
+    description: str = ""
+
+    @property
+    def addressable(self) -> bool:
+        """Whether avrdude can select this programmer among the attached ones."""
+        return self.port is not None
+
+    @property
+    def label(self) -> str:
+        """Short human readable label for lists and console prefixes."""
+        return f"{self.programmer} @ {self.port or 'usb'}"
+
+def read_attr(device_dir: str, name: str) -> Optional[str]:
+    try:
+        with open(os.path.join(device_dir, name), "r") as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+def enumerate_programmers(sysfs_root: str = SYSFS_USB_DEVICES) -> List[Programmer]:
+    """Find attached USB programmers by scanning sysfs.
+
+    The avrdude port is ``usb:<serial>`` when the programmer reports a serial
+    number. Without one, usbtiny is still addressed as ``usb:<bus>:<device>``
+    and the only attached programmer of its type as plain ``usb``; any other
+    programmer without a serial number cannot be told apart by avrdude and
+    gets the port None (see Programmer.addressable).
+    """
+    found = []
+    try:
+        entries = sorted(os.listdir(sysfs_root))
+    except OSError:
+        return []
+
+    for entry in entries:
+        device_dir = os.path.join(sysfs_root, entry)
+        vendor = read_attr(device_dir, "idVendor")
+        product = read_attr(device_dir, "idProduct")
+        if vendor is None or product is None:
+            continue
+        programmer_id = KNOWN_PROGRAMMERS.get((vendor.lower(), product.lower()))
+        if programmer_id is None:
+            continue
+
+        found.append((programmer_id, device_dir))
+
+    count = Counter(programmer_id for programmer_id, _ in found)
+    programmers = []
+    for programmer_id, device_dir in found:
+        serial = read_attr(device_dir, "serial") or ""
+        if serial:
+            port = f"usb:{serial}"
+        elif programmer_id in BUS_ADDRESSED_PROGRAMMERS:
+            busnum = int(read_attr(device_dir, "busnum") or 0)
+            devnum = int(read_attr(device_dir, "devnum") or 0)
+            port = f"usb:{busnum:03d}:{devnum:03d}"
+        elif count[programmer_id] == 1:
+            port = "usb"
+        else:
+            port = None
+
+        programmers.append(Programmer(
+            programmer=programmer_id,
+            port=port,
+            serial=serial,
+            description=read_attr(device_dir, "product") or programmer_id
+        ))
+
+    return programmers
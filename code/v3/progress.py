@@ -0,0 +1,95 @@
+"""Parse avrdude's progress bars into structured events.
+
+avrdude draws bars such as ``Writing | ######### | 100% 1.23s`` and reports
+the number of bytes involved in the lines before them. ProgressParser keeps
+track of both so every bar update can be turned into a throughput figure.
+"""
+import re
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+_BAR = re.compile(r"(Reading|Writing|Erasing)\s*\|\s*[#\s]*\|\s*(\d+)%\s+(\d+(?:\.\d+)?)\s*s")
+
+# Lines that announce which memory the next bar belongs to and its size
+_WRITING = re.compile(r"writing (?:output file \S+ with )?(\w+) \((\d+) bytes\)", re.IGNORECASE)
+_WRITING_V7 = re.compile(r"writing (\d+) bytes? (?:to |for )?(\w+)", re.IGNORECASE)
+_READING = re.compile(r"reading on-chip (\w+) data", re.IGNORECASE)
+_VERIFYING = re.compile(r"verifying (\w+) memory", re.IGNORECASE)
+_INPUT_SIZE = re.compile(r"input file .* contains (\d+) bytes", re.IGNORECASE)
+
+@dataclass
+class ProgressEvent:
+    phase: str
+    percent: int
+    elapsed: float
+    memory: Optional[str] = None
+    total_bytes: Optional[int] = None
+
+    @property
+    def bytes_done(self) -> Optional[int]:
+        if self.total_bytes is None:
+            return None
+        return self.total_bytes * self.percent // 100
+
+    @property
+    def bytes_per_second(self) -> Optional[float]:
+        if self.bytes_done is None or self.elapsed <= 0:
+            return None
+        return self.bytes_done / self.elapsed
+
+    def describe(self) -> str:
+        text = self.phase
+        if self.memory:
+            text += f" {self.memory}"
+        text += f": {self.percent}% {self.elapsed:.2f}s"
+        rate = self.bytes_per_second
+        if rate is not None:
+            text += f" ({rate / 1024:.1f} KB/s)"
+        return text
+
+class ProgressParser:
+    def __init__(self, memory_sizes: Optional[Dict[str, int]] = None):
+        # Used for reads, where avrdude does not print a byte count
+        self.memory_sizes = memory_sizes or {}
+        self.memory = None
+        self.total_bytes = None
+        self.verifying = False
+
+    def feed(self, line: str) -> Optional[ProgressEvent]:
+        """Parse one line of avrdude output, returning an event for bar updates."""
+        match = _BAR.search(line)
+        if match:
+            return ProgressEvent(
+                phase=match.group(1),
+                percent=int(match.group(2)),
+                elapsed=float(match.group(3)),
+                memory=self.memory,
+                total_bytes=self.total_bytes
+            )
+
+        match = _WRITING.search(line)
+        if match:
+            self.memory, self.total_bytes = match.group(1), int(match.group(2))
+            return None
+        match = _WRITING_V7.search(line)
+        if match:
+            self.memory, self.total_bytes = match.group(2), int(match.group(1))
+            return None
+        match = _READING.search(line)
+        if match:
+            # The verify read-back covers the bytes of the input file
+            if not (self.verifying and self.memory == match.group(1) and self.total_bytes):
+                self.memory = match.group(1)
+                self.total_bytes = self.memory_sizes.get(self.memory)
+            self.verifying = False
+            return None
+        match = _VERIFYING.search(line)
+        if match:
+            self.memory = match.group(1)
+            self.total_bytes = None
+            self.verifying = True
+            return None
+        match = _INPUT_SIZE.search(line)
+        if match:
+            self.total_bytes = int(match.group(1))
+        return None
@@ -0,0 +1,153 @@
+"""Retry failed avrdude runs according to why they failed.
+
+avrdude's own ``-r`` only retries opening the programmer. Here the whole
+run is retried, but only when another attempt can help:
+
+* transient USB errors (a dropped control message, a busy interface) are
+  retried immediately, then with backoff;
+* sync errors (the target does not answer, reads all 0x00/0xFF) are
+  retried with backoff, and from the second one in a row at half the bit
+  clock frequency, i.e. twice the ``-B`` period. A command without ``-B``
+  runs at the programmer's default clock, whose period is not known here,
+  so its first slowdown goes to ``fallback_bit_clock``, which is slower
+  than the default of any ISP programmer;
+* verification errors after a write count like sync errors, as a marginal
+  target is more often misread at a fast clock than misprogrammed; a
+  verify-only run fails at once, since the device simply holds other data;
+* a signature of a different part, a fuse that reads back differently, a
+  missing programmer, missing permissions, a timeout or a cancel fail at
+  once.
+
+The failure class comes from the diagnostics records of the run.
+
+Every retry waits ``backoff * backoff_factor ** n`` seconds (capped at
+``max_backoff``) and none starts once the time budget is used up.
+"""
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from commands import command_bit_clock, command_writes, with_bit_clock
+from diagnostics import classify_output
+from runner import ProcessResult
+
+# Failure class of each diagnostics record kind
+_FAILURE_CLASSES = {
+    "permission_denied": "permission",
+    "programmer_not_found": "programmer",
+    "target_not_responding": "sync",
+    "signature_mismatch": "signature",
+    "verification_error": "verify",
+    "fuse_mismatch": "fuse",
+    "usb_error": "usb",
+}
+_PRIORITY = ["permission", "programmer", "sync", "signature", "verify", "fuse", "usb"]
+
+# Classes that another attempt may fix
+RETRYABLE = {"usb", "sync", "verify"}
+
+def classify_failure(result: ProcessResult) -> str:
+    """Failure class of a finished run: ok, cancelled, timeout, permission, programmer,
+    sync, signature, verify, fuse, usb or other."""
+    if result.ok:
+        return "ok"
+    if result.cancelled:
+        return "cancelled"
+    if result.timed_out:
+        return "timeout"
+    records = result.errors or classify_output(result.stderr)
+    classes = {_FAILURE_CLASSES[record.kind] for record in records}
+    for kind in _PRIORITY:
+        if kind in classes:
+            return kind
+    return "other"
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 4
+    budget: float = 120.0
+    backoff: float = 0.5
+    backoff_factor: float = 2.0
+    max_backoff: float = 8.0
+    downgrade_after: int = 2
+    fallback_bit_clock: float = 16.0
+    max_bit_clock: float = 64.0
+
+    def delay(self, retry: int) -> float:
+        return min(self.backoff * self.backoff_factor ** retry, self.max_backoff)
+
+@dataclass
+class RetryDecision:
+    retry: bool
+    reason: str
+    delay: float = 0.0
+    bit_clock: Optional[float] = None
+
+class RetryState:
+    """Tracks the attempts of one operation and decides what follows a failure.
+
+    ``writes`` tells whether the operation writes; only then can a
+    verification error be a misread worth another attempt.
+    """
+    def __init__(self, policy: RetryPolicy, bit_clock: Optional[float], started: Optional[float] = None,
+                 writes: bool = True):
+        self.policy = policy
+        self.bit_clock = bit_clock
+        self.writes = writes
+        self.started = time.monotonic() if started is None else started
+        self.attempts = 1
+        self.retries = 0
+        self.slow_failures = 0
+
+    def after_failure(self, result: ProcessResult, now: Optional[float] = None) -> RetryDecision:
+        kind = classify_failure(result)
+        if kind not in RETRYABLE or (kind == "verify" and not self.writes):
+            return RetryDecision(False, kind)
+        if self.attempts >= self.policy.max_attempts:
+            return RetryDecision(False, f"{kind}, gave up after {self.attempts} attempts")
+
+        if kind == "usb":
+            self.slow_failures = 0
+            delay = 0.0 if self.retries == 0 else self.policy.delay(self.retries - 1)
+        else:
+            self.slow_failures += 1
+            delay = self.policy.delay(self.retries)
+            if self.slow_failures >= self.policy.downgrade_after:
+                if self.bit_clock is None:
+                    self.bit_clock = self.policy.fallback_bit_clock
+                    self.slow_failures = 0
+                elif self.bit_clock < self.policy.max_bit_clock:
+                    self.bit_clock = min(self.bit_clock * 2, self.policy.max_bit_clock)
+                    self.slow_failures = 0
+
+        elapsed = (time.monotonic() if now is None else now) - self.started
+        if elapsed + delay > self.policy.budget:
+            return RetryDecision(False, f"{kind}, retry budget of {self.policy.budget:g}s used up")
+        self.attempts += 1
+        self.retries += 1
+        return RetryDecision(True, kind, delay, self.bit_clock)
+
+def describe_retry(decision: RetryDecision, attempt: int) -> str:
+    text = f"Retrying ({decision.reason} error), attempt {attempt}"
+    if decision.delay:
+        text += f" in {decision.delay:g}s"
+    if decision.bit_clock is None:
+        return text + " at the programmer's default clock"
+    return text + f" at -B {decision.bit_clock:g}"
+
+def run_with_retry(run: Callable[[List[str]], ProcessResult], argv: List[str], policy: RetryPolicy,
+                   on_retry: Optional[Callable[[str], None]] = None,
+                   sleep: Callable[[float], None] = time.sleep) -> ProcessResult:
+    """Run ``argv`` through ``run`` until it succeeds or the policy gives up."""
+    state = RetryState(policy, command_bit_clock(argv), writes=command_writes(argv))
+    while True:
+        result = run(argv)
+        if result.ok:
+            return result
+        decision = state.after_failure(result)
+        if not decision.retry:
+            return result
+        if on_retry:
+            on_retry(describe_retry(decision, state.attempts))
+        sleep(decision.delay)
+        argv = with_bit_clock(argv, decision.bit_clock)
@@ -0,0 +1,228 @@
+"""Run avrdude as an argv list in its own process group.
+
+stdout and stderr are drained concurrently, so memory read to stdout
+(``-U lfuse:r:-:h``) can neither fill its pipe nor get lost. Output is read
+in raw chunks as soon as it arrives and split on both ``\n`` and ``\r``:
+avrdude redraws its progress bar with ``\r``, and those redraws are passed
+on as in-place updates of the current line. A hung avrdude (for example
+a target that stopped answering) can be stopped by a per-operation timeout
+or by ``cancel()``; both terminate the whole process group, escalating to
+SIGKILL if it does not exit. Data given as ``input`` is written to
+avrdude's stdin, which lets images made in memory be programmed with
+``-U flash:w:-:i`` without a temporary file. stderr lines also go through
+a diagnostics.ErrorClassifier, and the records it finds come back with the
+result.
+"""
+import codecs
+import os
+import re
+import signal
+import subprocess
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from diagnostics import ErrorClassifier, ErrorRecord
+
+KILL_GRACE_SECONDS = 2.0
+CHUNK_SIZE = 4096
+
+_LINE_END = re.compile(r"\r\n|\n|\r")
+
+@dataclass
+class ProcessResult:
+    returncode: Optional[int]
+    stdout: str = ""
+    timed_out: bool = False
+    cancelled: bool = False
+    stderr: str = ""
+    errors: List[ErrorRecord] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and not self.timed_out and not self.cancelled
+
+    def describe(self, timeout: Optional[float] = None) -> str:
+        if self.timed_out:
+            return f"Operation timed out after {timeout:g}s" if timeout else "Operation timed out"
+        if self.cancelled:
+            return "Operation cancelled"
+        if self.returncode == 0:
+            return "Operation completed successfully!"
+        return "Operation failed with error code: " + str(self.returncode)
+
+class LineSplitter:
+    """Incrementally decode output chunks and split them into lines.
+
+    Lines ended by ``\n`` (or ``\r\n``) go to ``on_line``; text ended by a
+    lone ``\r`` is going to be overwritten and goes to ``on_update``. A ``\r``
+    at the end of a chunk is reported as an update straight away; if the
+    next chunk starts with ``\n`` the same text follows as a finished line.
+    """
+    def __init__(self, on_line: Optional[Callable[[str], None]] = None,
+                 on_update: Optional[Callable[[str], None]] = None, encoding: str = "utf-8"):
+        self.on_line = on_line
+        self.on_update = on_update
+        self.decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self.buffer = ""
+        self.after_cr = None
+
+    def feed(self, data: bytes, final: bool = False) -> str:
+        """Process a chunk and return its decoded text."""
+        text = self.decoder.decode(data, final)
+        self.buffer += text
+        if self.after_cr is not None and (self.buffer or final):
+            if self.buffer.startswith("\n"):
+                self.buffer = self.buffer[1:]
+                self._emit(self.on_line, self.after_cr)
+            self.after_cr = None
+
+        position = 0
+        for match in _LINE_END.finditer(self.buffer):
+            line = self.buffer[position:match.start()]
+            position = match.end()
+            if match.group() == "\r":
+                self._emit(self.on_update, line)
+                if position == len(self.buffer):
+                    self.after_cr = line
+            else:
+                self._emit(self.on_line, line)
+        self.buffer = self.buffer[position:]
+        if final and self.buffer:
+            self._emit(self.on_line, self.buffer)
+            self.buffer = ""
+        return text
+
+    @staticmethod
+    def _emit(callback, line):
+        if callback:
+            callback(line)
+
+class ProcessRunner:
+    def __init__(self, argv: List[str], timeout: Optional[float] = None,
+                 on_stderr: Optional[Callable[[str], None]] = None,
+                 on_stdout: Optional[Callable[[str], None]] = None,
+                 on_stderr_update: Optional[Callable[[str], None]] = None,
+                 input: Optional[bytes] = None,
+                 on_error: Optional[Callable[[ErrorRecord], None]] = None):
+        self.argv = argv
+        self.input = input
+        self.classifier = ErrorClassifier(on_error)
+        self.timeout = timeout or None
+        self.on_stderr = on_stderr
+        self.on_stdout = on_stdout
+        self.on_stderr_update = on_stderr_update
+        self.process = None
+        self.timed_out = False
+        self.cancelled = False
+        self._lock = threading.Lock()
+
+    def run(self) -> ProcessResult:
+        """Start the process, forward its output lines and wait for it to exit."""
+        with self._lock:
+            if self.cancelled:
+                return ProcessResult(None, cancelled=True)
+            self.process = subprocess.Popen(
+                self.argv,
+                stdin=subprocess.PIPE if self.input is not None else None,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                bufsize=0,
+                **process_group_options()
+            )
+
+        timer = None
+        if self.timeout:
+            timer = threading.Timer(self.timeout, self._on_timeout)
+            timer.daemon = True
+            timer.start()
+        stdout = []
+        stdout_reader = threading.Thread(target=_drain, daemon=True, args=(
+            self.process.stdout, stdout, LineSplitter(self.on_stdout)))
+        stdout_reader.start()
+        if self.input is not None:
+            threading.Thread(target=_feed, daemon=True, args=(self.process.stdin, self.input)).start()
+        stderr = []
+        try:
+            _drain(self.process.stderr, stderr, LineSplitter(self._on_stderr_line, self.on_stderr_update))
+            stdout_reader.join()
+            returncode = self.process.wait()
+        finally:
+            if timer is not None:
+                timer.cancel()
+
+        return ProcessResult(returncode, "".join(stdout), self.timed_out, self.cancelled,
+                             "".join(stderr), self.classifier.finish())
+
+    def _on_stderr_line(self, line: str):
+        self.classifier.feed(line)
+        if self.on_stderr:
+            self.on_stderr(line)
+
+    def cancel(self):
+        """Stop the process group; safe to call from any thread."""
+        with self._lock:
+            self.cancelled = True
+            self._terminate()
+
+    def _on_timeout(self):
+        with self._lock:
+            self.timed_out = True
+            self._terminate()
+
+    def _terminate(self):
+        process = self.process
+        if process is None or process.poll() is not None:
+            return
+        signal_process_group(process, signal.SIGTERM)
+        killer = threading.Timer(KILL_GRACE_SECONDS, self._kill, args=(process,))
+        killer.daemon = True
+        killer.start()
+
+    @staticmethod
+    def _kill(process):
+        if process.poll() is None:
+            signal_process_group(process, getattr(signal, "SIGKILL", signal.SIGTERM))
+
+def _drain(stream, collected, splitter):
+    """Read ``stream`` to EOF in chunks, keeping the text in ``collected``."""
+    fd = stream.fileno()
+    while True:
+        # Returns whatever is available instead of waiting for a full line
+        chunk = os.read(fd, CHUNK_SIZE)
+        text = splitter.feed(chunk, final=not chunk)
+        if collected is not None:
+            collected.append(text)
+        if not chunk:
+            break
+    stream.close()
+
+def _feed(stream, data):
+    """Write ``data`` to the process's stdin and close it to signal EOF."""
+    try:
+        stream.write(data)
+    except (BrokenPipeError, OSError):
+        # The process exited early; its exit code tells what went wrong
+        pass
+    finally:
+        try:
+            stream.close()
+        except OSError:
+            pass
+
+def process_group_options():
+    """Popen keyword arguments that start the child in a new process group."""
+    if os.name == "nt":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+def signal_process_group(process, sig):
+    """Send ``sig`` to the process group started with process_group_options()."""
+    try:
+        if os.name == "nt":
+            # avrdude does not start children, so killing the process is enough
+            process.kill()
+        else:
+            os.killpg(process.pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
@@ -0,0 +1,161 @@
+"""Per-programmer job queues.
+
+Jobs for the same programmer run one at a time in submission order, jobs
+for different programmers run concurrently. A job without a port lets
+avrdude pick any attached programmer of its type, possibly one that a job
+with an explicit port is using, so the default device of a programmer type
+never runs alongside another device of that type. The scheduler does not
+run anything itself: each job has a ``start`` callback that launches the
+work and the owner reports completion through ``job_done``.
+"""
+import itertools
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional
+
+DEFAULT_ESTIMATE = 10.0
+
+@dataclass
+class Job:
+    job_id: int
+    device: str
+    description: str
+    start: Callable[['Job'], None] = field(repr=False)
+    kind: str = ""
+    state: str = "queued"
+    submitted_at: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    success: Optional[bool] = None
+    # diagnostics.ErrorRecords of the final attempt of a failed job
+    errors: List = field(default_factory=list)
+    # Who queued the job, e.g. "station" for the jobs of a station mode board
+    tag: str = ""
+
+def device_key(programmer: str, port: Optional[str]) -> str:
+    """Queue key for a programmer; jobs without a port share the default device.
+
+    A bare ``usb`` port also lets avrdude pick the first programmer it finds.
+    """
+    if port == "usb":
+        port = None
+    return f"{programmer}@{port or 'default'}"
+
+def _may_share_programmer(device: str, other: str) -> bool:
+    """Whether two queue keys can end up on the same physical programmer."""
+    programmer, port = device.split("@", 1)
+    other_programmer, other_port = other.split("@", 1)
+    return programmer == other_programmer and "default" in (port, other_port)
+
+class JobScheduler:
+    def __init__(self, on_change: Optional[Callable[[], None]] = None):
+        self.on_change = on_change
+        self.queues: Dict[str, Deque[Job]] = {}
+        self.running: Dict[str, Job] = {}
+        self.durations: Dict[str, float] = {}
+        self._ids = itertools.count(1)
+
+    def submit(self, device: str, description: str, start: Callable[[Job], None],
+               kind: str = "", front: bool = False, tag: str = "") -> Job:
+        """Queue a job; it starts immediately if the device is idle.
+
+        ``front`` puts the job ahead of everything already waiting, for
+        follow-up steps that must run before other work on the device.
+        """
+        job = Job(next(self._ids), device, description, start,
+                  kind=kind or description, submitted_at=time.monotonic(), tag=tag)
+        queue = self.queues.setdefault(device, deque())
+        if front:
+            queue.appendleft(job)
+        else:
+            queue.append(job)
+        self._start_next(device)
+        self._changed()
+        return job
+
+    def job_done(self, job: Job, success: bool):
+        if self.running.get(job.device) is not job:
+            return
+        job.state = "done" if success else "failed"
+        job.success = success
+        job.finished_at = time.monotonic()
+        duration = job.finished_at - job.started_at
+        previous = self.durations.get(job.kind)
+        # Exponential moving average keeps estimates current without a history
+        self.durations[job.kind] = duration if previous is None else 0.7 * previous + 0.3 * duration
+        del self.running[job.device]
+        self._start_next(job.device)
+        # Devices that waited for this programmer
+        for device in sorted(self.queues):
+            if _may_share_programmer(device, job.device):
+                self._start_next(device)
+        self._changed()
+
+    def cancel(self, job: Job) -> bool:
+        """Remove a job that has not started yet."""
+        queue = self.queues.get(job.device)
+        if job.state != "queued" or not queue or job not in queue:
+            return False
+        queue.remove(job)
+        job.state = "cancelled"
+        self._changed()
+        return True
+
+    def is_busy(self, device: str) -> bool:
+        return device in self.running or bool(self.queues.get(device))
+
+    def jobs(self) -> List[Job]:
+        """Running jobs followed by queued jobs, grouped by device."""
+        result = []
+        for device in sorted(set(self.running) | set(self.queues)):
+            if device in self.running:
+                result.append(self.running[device])
+            result.extend(self.queues.get(device, ()))
+        return result
+
+    def position(self, job: Job) -> int:
+        """0 for a running job, otherwise the 1-based place in its device queue."""
+        if self.running.get(job.device) is job:
+            return 0
+        return list(self.queues.get(job.device, ())).index(job) + 1
+
+    def estimate(self, job: Job) -> float:
+        return self.durations.get(job.kind, DEFAULT_ESTIMATE)
+
+    def eta(self, job: Job) -> float:
+        """Estimated seconds until the job finishes."""
+        now = time.monotonic()
+        running = self.running.get(job.device)
+        remaining = 0.0
+        if running is not None:
+            remaining = max(0.0, self.estimate(running) - (now - running.started_at))
+            if running is job:
+                return remaining
+        for queued in self.queues.get(job.device, ()):
+            remaining += self.estimate(queued)
+            if queued is job:
+                break
+        return remaining
+
+    def _start_next(self, device: str):
+        queue = self.queues.get(device)
+        if device in self.running or not queue:
+            return
+        if any(_may_share_programmer(device, other) for other in self.running):
+            return
+        job = queue.popleft()
+        if not queue:
+            del self.queues[device]
+        job.state = "running"
+        job.started_at = time.monotonic()
+        self.running[device] = job
+        try:
+            job.start(job)
+        except Exception:
+            self.job_done(job, False)
+            raise
+
+    def _changed(self):
+        if self.on_change:
+            self.on_change()
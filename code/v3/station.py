@@ -0,0 +1,218 @@
+"""Station mode: program every board as soon as it is inserted.
+
+A Station watches one programming slot through a presence source and runs
+the configured job when a new board has been present for the debounce
+time. After the job it shows pass or fail until the board is removed; a
+board counts as removed only once the slot has stayed empty for the
+debounce time, so the same board is never programmed twice and contact
+bounce on insertion or removal is ignored.
+
+Presence comes from one of two sources:
+
+* UsbPresence scans sysfs for a USB serial device that was not attached
+  when the station started, for boards with a bootloader (``arduino``,
+  ``avr109``, ...) that enumerate over USB themselves;
+* SignaturePresence reads the device signature through the ISP
+  programmer; the board is present while the signature matches the chip.
+  Every poll resets the target.
+
+The state machine takes the presence as an argument and has no timers or
+threads of its own, so callers drive it from a poll loop or a Qt timer.
+"""
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional
+
+from chipdb import ChipInfo, normalize_signature
+from commands import CommandOptions, detect_signature_command, parse_read_output
+from programmers import KNOWN_PROGRAMMERS, SYSFS_USB_DEVICES, read_attr
+from runner import ProcessResult
+
+WAITING = "waiting"
+SETTLING = "settling"
+RUNNING = "running"
+PASSED = "pass"
+FAILED = "fail"
+
+DEBOUNCE = 0.5
+USB_POLL_INTERVAL = 0.25
+SIGNATURE_POLL_INTERVAL = 1.0
+
+@dataclass
+class Board:
+    """A board in the slot; ``identity`` changes when a different board is inserted."""
+    identity: str
+    port: Optional[str] = None
+    description: str = ""
+
+def _tty_name(device_dir: str) -> Optional[str]:
+    """The tty of a USB device: ``<intf>/tty/ttyACM0`` (CDC) or ``<intf>/ttyUSB0`` (usb-serial)."""
+    try:
+        interfaces = sorted(entry for entry in os.listdir(device_dir) if ":" in entry)
+    except OSError:
+        return None
+    for interface in interfaces:
+        interface_dir = os.path.join(device_dir, interface)
+        try:
+            entries = sorted(os.listdir(interface_dir))
+        except OSError:
+            continue
+        if "tty" in entries:
+            names = sorted(os.listdir(os.path.join(interface_dir, "tty")))
+            if names:
+                return names[0]
+        for entry in entries:
+            if entry.startswith("tty"):
+                return entry
+    return None
+
+def usb_serial_boards(sysfs_root: str = SYSFS_USB_DEVICES) -> List[Board]:
+    """USB serial devices in sysfs, other than known ISP programmers.
+
+    The identity includes the device number, which the kernel assigns anew
+    on every plug, so re-inserting the same board gives a new identity.
+    """
+    boards = []
+    try:
+        entries = sorted(os.listdir(sysfs_root))
+    except OSError:
+        return boards
+
+    for entry in entries:
+        if ":" in entry:
+            # Interfaces are listed next to their devices
+            continue
+        device_dir = os.path.join(sysfs_root, entry)
+        vendor = read_attr(device_dir, "idVendor")
+        product = read_attr(device_dir, "idProduct")
+        if vendor is None or product is None:
+            continue
+        if (vendor.lower(), product.lower()) in KNOWN_PROGRAMMERS:
+            continue
+        tty = _tty_name(device_dir)
+        if tty is None:
+            continue
+        devnum = read_attr(device_dir, "devnum") or "0"
+        serial = read_attr(device_dir, "serial") or ""
+        boards.append(Board(
+            identity=f"{entry}#{devnum}:{serial}",
+            port=f"/dev/{tty}",
+            description=read_attr(device_dir, "product") or f"{vendor}:{product}"
+        ))
+    return boards
+
+class UsbPresence:
+    """Presence of a board that enumerates as a USB serial device.
+
+    Devices already attached when the station starts (hubs, other fixtures,
+    a board left in the slot) are ignored until they are plugged again.
+    """
+    interval = USB_POLL_INTERVAL
+
+    def __init__(self, sysfs_root: str = SYSFS_USB_DEVICES, ignore: Optional[Iterable[str]] = None):
+        self.sysfs_root = sysfs_root
+        if ignore is None:
+            ignore = [board.identity for board in usb_serial_boards(sysfs_root)]
+        self.ignore = set(ignore)
+
+    def poll(self) -> Optional[Board]:
+        for board in usb_serial_boards(self.sysfs_root):
+            if board.identity not in self.ignore:
+                return board
+        return None
+
+class SignaturePresence:
+    """Presence of a board on an ISP programmer, from a signature read.
+
+    ``command`` is run by the caller (through its job queue, so polls never
+    overlap other work on the programmer) and the result passed to board().
+    """
+    interval = SIGNATURE_POLL_INTERVAL
+
+    def __init__(self, chip: ChipInfo, options: CommandOptions):
+        self.chip = chip
+        self.signature = normalize_signature(chip.signature)
+        self.command = detect_signature_command(chip, options)
+
+    def board(self, result: Optional[ProcessResult]) -> Optional[Board]:
+        if result is None or not result.ok:
+            return None
+        signature = parse_read_output(self.command, result.stdout).get("signature")
+        if signature is None or "0x" + signature.hex().upper() != self.signature:
+            return None
+        return Board(identity=self.signature, description=self.chip.name)
+
+class Station:
+    """Presence state machine: waiting, settling, running, then pass or fail.
+
+    ``start_job`` is called with the Board once it has settled and must
+    eventually lead to job_done(). ``on_change`` gets the new state and the
+    board after every transition.
+    """
+    def __init__(self, start_job: Callable[[Board], None], debounce: float = DEBOUNCE,
+                 on_change: Optional[Callable[[str, Optional[Board]], None]] = None):
+        self.start_job = start_job
+        self.debounce = debounce
+        self.on_change = on_change
+        self.state = WAITING
+        self.board: Optional[Board] = None
+        # Settling: when the candidate appeared; pass/fail: when the slot went empty
+        self.since: Optional[float] = None
+        self.passed = 0
+        self.failed = 0
+
+    def update(self, board: Optional[Board], now: Optional[float] = None):
+        """Feed one presence observation; None means the slot is empty."""
+        now = time.monotonic() if now is None else now
+        if self.state == RUNNING:
+            # Bootloader boards re-enumerate while they are programmed
+            return
+
+        if self.state in (PASSED, FAILED):
+            # Any board seen before the slot was empty long enough is the same board
+            if board is not None:
+                self.since = None
+            elif self.since is None:
+                self.since = now
+            elif now - self.since >= self.debounce:
+                self._set(WAITING, None)
+            return
+
+        if board is None:
+            if self.state != WAITING:
+                self._set(WAITING, None)
+            return
+        if self.state == WAITING or board.identity != self.board.identity:
+            self.since = now
+            self._set(SETTLING, board)
+            return
+        if now - self.since >= self.debounce:
+            self._set(RUNNING, board)
+            self.start_job(board)
+
+    def job_done(self, success: bool):
+        if self.state != RUNNING:
+            return
+        if success:
+            self.passed += 1
+        else:
+            self.failed += 1
+        self.since = None
+        self._set(PASSED if success else FAILED, self.board)
+
+    def _set(self, state: str, board: Optional[Board]):
+        self.state = state
+        self.board = board
+        if self.on_change:
+            self.on_change(state, board)
+
+def describe_state(state: str, board: Optional[Board]) -> str:
+    name = f" {board.description}" if board is not None and board.description else ""
+    return {
+        WAITING: "Insert board",
+        SETTLING: f"Board{name} detected...",
+        RUNNING: f"Programming{name}...",
+        PASSED: "PASS - remove board",
+        FAILED: "FAIL - remove board",
+    }[state]
@@ -0,0 +1,188 @@
+"""Persistent programmer session through avrdude terminal mode.
+
+One ``avrdude -t`` process stays connected to the target and commands are
+piped through it, so repeated reads only pay the programmer connect once.
+avrdude prints its prompt on stdout before reading each command, which is
+used to find the end of every response.
+"""
+import re
+import signal
+import subprocess
+import threading
+from typing import Callable, Dict, List, Optional
+
+from chipdb import ChipInfo
+from commands import CommandOptions, base_command
+import intelhex
+from runner import process_group_options, signal_process_group
+
+PROMPT = b"avrdude> "
+
+_DUMP_LINE = re.compile(r"^\s*([0-9a-fA-F]{4,})\s+((?:[0-9a-fA-F]{2}\s+){1,16})")
+
+class TerminalSessionError(RuntimeError):
+    pass
+
+class TerminalSession:
+    def __init__(self, command: List[str], timeout: float = 15.0,
+                 on_output: Optional[Callable[[str], None]] = None):
+        self.command = command
+        self.timeout = timeout
+        self.on_output = on_output
+        self.process = None
+        self.interrupted = False
+        self._stdout = bytearray()
+        self._stdout_closed = False
+        self._stdout_ready = threading.Condition()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_chip(cls, chip: ChipInfo, options: CommandOptions, **kwargs) -> 'TerminalSession':
+        return cls(base_command(chip, options) + ["-t"], **kwargs)
+
+    @property
+    def is_open(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def open(self):
+        """Start avrdude and wait until it has connected and shows its prompt."""
+        self.close()
+        self._stdout = bytearray()
+        self._stdout_closed = False
+        self.process = subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            **process_group_options()
+        )
+        threading.Thread(target=self._pump_stdout, args=(self.process,), daemon=True).start()
+        threading.Thread(target=self._pump_stderr, args=(self.process,), daemon=True).start()
+        self._read_response()
+
+    def close(self):
+        process, self.process = self.process, None
+        if process is None:
+            return
+        try:
+            if process.poll() is None:
+                process.stdin.write(b"quit\n")
+                process.stdin.flush()
+                process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            process.kill()
+            process.wait()
+
+    def interrupt(self):
+        """Kill the session from another thread, failing the command in progress.
+
+        The next command after a reset of ``interrupted`` opens a new session.
+        """
+        self.interrupted = True
+        process = self.process
+        if process is not None and process.poll() is None:
+            signal_process_group(process, getattr(signal, "SIGKILL", signal.SIGTERM))
+
+    def _pump_stdout(self, process):
+        while True:
+            chunk = process.stdout.read1(4096)
+            with self._stdout_ready:
+                if chunk:
+                    self._stdout += chunk
+                else:
+                    self._stdout_closed = True
+                self._stdout_ready.notify_all()
+            if not chunk:
+                break
+
+    def _pump_stderr(self, process):
+        for line in process.stderr:
+            if self.on_output:
+                self.on_output(line.decode(errors="replace").rstrip())
+
+    def _read_response(self) -> str:
+        with self._stdout_ready:
+            ready = self._stdout_ready.wait_for(
+                lambda: self._stdout.endswith(PROMPT) or self._stdout_closed, self.timeout)
+            if not self._stdout.endswith(PROMPT):
+                if not ready:
+                    raise TerminalSessionError("avrdude terminal did not respond")
+                raise TerminalSessionError("avrdude terminal exited")
+            response = bytes(self._stdout[:-len(PROMPT)])
+            self._stdout.clear()
+        return response.decode(errors="replace")
+
+    def _execute(self, command: str) -> str:
+        if self.interrupted:
+            raise TerminalSessionError("session interrupted")
+        if not self.is_open:
+            self.open()
+        self.process.stdin.write(command.encode() + b"\n")
+        self.process.stdin.flush()
+        return self._read_response()
+
+    def execute(self, command: str) -> str:
+        """Run one terminal command, reconnecting once if the session broke."""
+        with self._lock:
+            try:
+                return self._execute(command)
+            except (OSError, TerminalSessionError):
+                self.close()
+                if self.interrupted:
+                    raise TerminalSessionError("session interrupted")
+                return self._execute(command)
+
+    def read_memory(self, memory: str, address: int, length: int) -> bytes:
+        """Read a memory range with the terminal ``dump`` command."""
+        output = self.execute(f"dump {memory} {address} {length}")
+        data = bytearray()
+        last_line = None
+        repeating = False
+        for line in output.splitlines():
+            if line.strip() == "*":
+                # Runs of identical lines are abbreviated to a single '*'
+                repeating = True
+                continue
+            match = _DUMP_LINE.match(line)
+            if not match:
+                continue
+            line_address = int(match.group(1), 16)
+            if repeating and last_line:
+                while address + len(data) < line_address:
+                    data += last_line
+            repeating = False
+            last_line = bytes.fromhex(match.group(2))
+            data += last_line
+        if repeating and last_line:
+            while len(data) < length:
+                data += last_line
+
+        if len(data) < length:
+            raise TerminalSessionError(f"short read from {memory}: {len(data)} of {length} bytes")
+        return bytes(data[:length])
+
+    def write_memory(self, memory: str, address: int, data: bytes):
+        """Write bytes with the terminal ``write`` command."""
+        for offset in range(0, len(data), 64):
+            chunk = data[offset:offset + 64]
+            values = " ".join(f"0x{byte:02x}" for byte in chunk)
+            self.execute(f"write {memory} {address + offset} {values}")
+        # avrdude 7 caches paged writes until flushed; older versions ignore this
+        self.execute("flush")
+
+    def read_fuses(self, names=("lfuse", "hfuse", "efuse")) -> Dict[str, int]:
+        return {name: self.read_memory(name, 0, 1)[0] for name in names}
+
+    def write_fuse(self, name: str, value: int):
+        self.write_memory(name, 0, bytes([value]))
+
+    def signature(self) -> str:
+        return "0x" + self.read_memory("signature", 0, 3).hex().upper()
+
+    def verify(self, image: intelhex.HexImage, memory: str = "flash") -> List[int]:
+        """Compare the image's defined bytes with the device, returning bad addresses."""
+        mismatches = []
+        for address, data in image.segments():
+            device = self.read_memory(memory, address, len(data))
+            mismatches.extend(intelhex.mismatches(data, device, address))
+        return mismatches
@@ -0,0 +1,198 @@
+import pytest
+
+import avrconf
+import chipdb
+
+# Trimmed from the avrdude.conf shipped with avrdude 7.3
+AVRDUDE_7_CONF = '''
+avrdude_conf_version = "7.3";
+default_programmer = "usbasp";
+
+#------------------------------------------------------------
+# usbasp
+#------------------------------------------------------------
+
+programmer # usbasp
+    id                     = "usbasp";
+    desc                   = "USBasp ISP and TPI programmer";
+    type                   = "usbasp";
+    prog_modes             = PM_TPI | PM_ISP;
+    connection_type        = usb;
+    usbvid                 = 0x16c0; # VOTI
+    usbpid                 = 0x05dc; # Obdev's free shared PID
+    usbvendor              = "www.fischl.de";
+    usbproduct             = "USBasp";
+;
+
+part # .classic-noavr
+    id                     = ".classic-noavr";
+    desc                   = "Common values for classic parts";
+;
+
+part # m328
+    id                     = "m328";
+    variants               =
+        "ATmega328:     PDIP28, Fmax=20 MHz, T=[-40 C, 85 C], Vcc=[1.8 V, 5.5 V]",
+        "ATmega328-AU:  TQFP32, Fmax=20 MHz, T=[-40 C, 85 C], Vcc=[1.8 V, 5.5 V]";
+    desc                   = "ATmega328";
+    prog_modes             = PM_SPM | PM_ISP | PM_HVPP | PM_debugWIRE;
+    mcuid                  = 118;
+    n_interrupts           = 26;
+    signature              = 0x1e 0x95 0x14;
+
+    memory "eeprom"
+        size               = 1024;
+        page_size          = 4;
+        read               = "1010.0000--000x.xxaa--aaaa.aaaa--oooo.oooo";
+    ;
+
+    memory "flash"
+        paged              = yes;
+        size               = 0x8000;
+        page_size          = 128;
+        num_pages          = 256;
+    ;
+
+    memory "lfuse"
+        size               = 1;
+        initval            = 0x62;
+        bitmask            = 0xff;
+    ;
+
+    memory "hfuse"
+        size               = 1;
+        initval            = 0xd9;
+    ;
+
+    memory "efuse"
+        size               = 1;
+        initval            = 0xff;
+        bitmask            = 0x07;
+    ;
+
+    memory "fuse0" alias "lfuse";
+
+    memory "sram"
+        size               = 2048;
+        offset             = 0x100;
+    ;
+;
+
+part parent "m328" # m328p
+    id                     = "m328p";
+    desc                   = "ATmega328P";
+    mcuid                  = 119;
+    signature              = 0x1e 0x95 0x0f;
+    readonly_memories;
+;
+
+part # avr64dd28
+    id                     = "avr64dd28";
+    desc                   = "AVR64DD28";
+    prog_modes             = PM_SPM | PM_UPDI;
+    signature              = 0x1e 0x96 0x1a;
+
+    memory "fuse5"
+        size               = 1;
+        initval            = 0xd0;
+    ;
+
+    memory "syscfg0" alias "fuse5";
+
+    memory "flash"
+        size               = 0x10000;
+        page_size          = 512;
+    ;
+;
+'''
+
+def test_parse_avrdude_7_conf():
+    parts = avrconf.parse_parts(AVRDUDE_7_CONF)
+    assert set(parts) == {".classic-noavr", "m328", "m328p", "avr64dd28"}
+    m328 = parts["m328"]
+    assert m328.memories["fuse0"] == m328.memories["lfuse"]
+    assert m328.memories["fuse0"] is not m328.memories["lfuse"]
+    assert parts["avr64dd28"].memories["syscfg0"]["initval"] == ["0xd0"]
+    # Inherited memories stay with the child
+    assert avrconf._value(parts["m328p"].memories["flash"], "size") == "0x8000"
+
+def test_import_avrdude_7_conf():
+    families = avrconf.import_avrdude_conf(AVRDUDE_7_CONF)
+    assert set(families) == {"ATmega Series", "AVR Dx/Ex Series"}
+    m328p = families["ATmega Series"]["m328p"]
+    assert m328p == {
+        "command": "m328p",
+        "name": "ATmega328P",
+        "signature": "0x1E950F",
+        "flash_size": 0x8000,
+        "eeprom_size": 1024,
+        "description": "32KB Flash, 1KB EEPROM, 2KB SRAM",
+        "flash_page_size": 128,
+        "page_erase": False,
+        "default_lfuse": "0x62",
+        "default_hfuse": "0xD9",
+        "default_efuse": "0xFF",
+    }
+    avr64dd28 = families["AVR Dx/Ex Series"]["avr64dd28"]
+    assert avr64dd28["page_erase"] and avr64dd28["default_lfuse"] == ""
+
+def test_memory_removed_with_null():
+    conf = AVRDUDE_7_CONF + '''
+part parent "m328" # m328nee
+    id                     = "m328nee";
+    desc                   = "ATmega328 without EEPROM";
+    memory "eeprom" = NULL;
+;
+'''
+    chip = avrconf.import_avrdude_conf(conf)["ATmega Series"]["m328nee"]
+    assert chip["eeprom_size"] == 0 and chip["description"] == "32KB Flash, 0B EEPROM, 2KB SRAM"
+
+@pytest.mark.parametrize("text, message", [
+    ('part\n    id = "m8";\n    memory "flash"\n        size = 8192;\n', "unexpected end of file"),
+    ('part parent "m999"\n    id = "m8";\n;\n', "unknown part"),
+    ('part\n    id = "m8";\n    readonly_memories\n', "unexpected end of file"),
+])
+def test_broken_conf(text, message):
+    with pytest.raises(avrconf.ConfError, match=message):
+        avrconf.parse_parts(text)
+
+def test_truncated_conf_raises_conf_error():
+    for length in range(0, len(AVRDUDE_7_CONF), 5):
+        try:
+            avrconf.parse_parts(AVRDUDE_7_CONF[:length])
+        except avrconf.ConfError:
+            pass
+
+@pytest.mark.parametrize("cut", [
+    'memory "fuse0" alias',
+    'memory "sram"',
+    'part parent',
+    'signature              = 0x1e 0x96',
+])
+def test_truncated_conf_error_names_the_line(cut):
+    text = AVRDUDE_7_CONF[:AVRDUDE_7_CONF.index(cut) + len(cut)]
+    with pytest.raises(avrconf.ConfError, match="unexpected end of file") as error:
+        avrconf.parse_parts(text)
+    # The line the file stops in
+    assert error.value.line_number == text.count("\n") + 1
+
+def test_load_conf_into_chip_database(tmp_path):
+    conf = tmp_path / "avrdude.conf"
+    conf.write_text(AVRDUDE_7_CONF)
+    database = chipdb.load_chip_database(str(conf), str(tmp_path / "cache"))
+    assert database.find("m328p").signature == "0x1E950F"
+    # The second load comes from the cache
+    cached = chipdb.load_chip_database(str(conf), str(tmp_path / "cache"))
+    assert cached.find("avr64dd28").name == "AVR64DD28"
+
+@pytest.mark.parametrize("text", [
+    'part parent "m999"\n    id = "m8";\n;\n',
+    AVRDUDE_7_CONF[:AVRDUDE_7_CONF.index('memory "fuse0" alias') + 20],
+])
+def test_broken_conf_falls_back_to_bundled_database(tmp_path, capsys, text):
+    conf = tmp_path / "avrdude.conf"
+    conf.write_text(text)
+    database = chipdb.load_chip_database(str(conf), None)
+    assert database.path == chipdb.DEFAULT_DATABASE_PATH
+    assert database.find("m328p") is not None
+    assert "using the bundled chip database" in capsys.readouterr().err
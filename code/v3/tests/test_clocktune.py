@@ -0,0 +1,66 @@
+import pytest
+
+import chipdb
+import clocktune
+from commands import CommandOptions, base_command, command_bit_clock
+from terminal import TerminalSession
+
+CHIP = chipdb.load_chip_database(chipdb.DEFAULT_DATABASE_PATH, None).find("m328p")
+FLASH = bytes(range(256))
+
+class FakeTarget:
+    """A target that reads back garbage at periods shorter than ``fastest``."""
+    def __init__(self, fastest):
+        self.fastest = fastest
+        self.commands = []
+        target = self
+
+        class Session(TerminalSession):
+            def read_memory(self, memory, address, length):
+                target.commands.append(self.command)
+                data = bytes.fromhex(CHIP.signature[2:]) if memory == "signature" else FLASH[:length]
+                if command_bit_clock(self.command) < target.fastest:
+                    return bytes(length)
+                return data
+
+            def close(self):
+                pass
+
+        self.session = Session
+
+@pytest.fixture
+def target(monkeypatch):
+    def make(fastest):
+        target = FakeTarget(fastest)
+        monkeypatch.setattr(clocktune, "TerminalSession", target.session)
+        return target
+    return make
+
+@pytest.mark.parametrize("fastest", [0.125, 1, 2, 64])
+def test_tune_finds_the_fastest_working_period(target, fastest):
+    fake = target(fastest)
+    assert clocktune.ClockTuner(CHIP, CommandOptions(), trials=2).tune() == fastest
+    # Every session runs at an explicit period, so the search sees a monotonic ladder
+    assert all(command_bit_clock(command) is not None for command in fake.commands)
+
+def test_tuned_period_of_one_is_passed_as_minus_b_1(target, tmp_path):
+    target(1)
+    options = CommandOptions(programmer="usbasp", port="usb:A1")
+    bit_clock = clocktune.ClockTuner(CHIP, options).tune()
+    path = str(tmp_path / "bit_clock.json")
+    clocktune.store_tuned_bit_clock(CHIP, options, bit_clock, path)
+
+    tuned = clocktune.apply_tuned_bit_clock(CHIP, options, path)
+    assert command_bit_clock(base_command(CHIP, tuned)) == 1
+    # Profiles are per programmer
+    other = CommandOptions(programmer="usbasp", port="usb:B2")
+    assert clocktune.apply_tuned_bit_clock(CHIP, other, path) == other
+
+def test_nothing_answers(target):
+    target(128)
+    with pytest.raises(clocktune.TuneError, match="even at -B 64"):
+        clocktune.ClockTuner(CHIP, CommandOptions()).tune()
+
+def test_bootloader_programmer_cannot_be_tuned():
+    with pytest.raises(clocktune.TuneError, match="no adjustable bit clock"):
+        clocktune.ClockTuner(CHIP, CommandOptions(programmer="arduino"))
@@ -0,0 +1,101 @@
+import pytest
+
+from diagnostics import ErrorClassifier, classify_output
+
+# (avrdude version, stderr, expected record kind)
+MESSAGES = [
+    ("6", "avrdude: error: could not find USB device with vid=0x16c0 pid=0x5dc "
+          "vendor='www.fischl.de' product='USBasp'", "programmer_not_found"),
+    ("7", "avrdude: error: cannot find USB device with vid=0x16c0 pid=0x5dc "
+          "vendor='www.fischl.de' product='USBasp'", "programmer_not_found"),
+    ("6", "avrdude: Error: Could not find USBtiny device (0x1781/0xc9f)", "programmer_not_found"),
+    ("7", "avrdude usbtiny_open() error: cannot find USBtiny device (0x1781/0xc9f)", "programmer_not_found"),
+    ("6", 'avrdude: usbdev_open(): did not find any USB device "usb"', "programmer_not_found"),
+    ("7", "avrdude jtag3_open_common() error: did not find any device matching VID 0x03eb and PID list: 0x2141",
+     "programmer_not_found"),
+    ("6", 'avrdude: ser_open(): can\'t open device "/dev/ttyUSB0": No such file or directory',
+     "programmer_not_found"),
+    ("7", "avrdude ser_open() error: cannot open port /dev/ttyUSB0: No such file or directory",
+     "programmer_not_found"),
+    ("7", "avrdude main() error: unable to open port /dev/ttyUSB0 for programmer arduino",
+     "programmer_not_found"),
+    ("6", 'avrdude: ser_open(): can\'t open device "/dev/ttyUSB0": Permission denied', "permission_denied"),
+    ("7", "avrdude usbasp_open() error: cannot open USB device: Permission denied", "permission_denied"),
+    ("6", "avrdude: stk500_getsync() attempt 1 of 10: not in sync: resp=0x00", "target_not_responding"),
+    ("7", "avrdude stk500_recv() error: programmer is not responding", "target_not_responding"),
+    ("6", "avrdude: error: program enable: target doesn't answer. 1", "target_not_responding"),
+    ("7", "avrdude usbasp_initialize() error: program enable: target does not answer (0x01)",
+     "target_not_responding"),
+    ("6", "avrdude: initialization failed, rc=-1", "target_not_responding"),
+    ("7", "avrdude main() error: initialization failed, rc=-1", "target_not_responding"),
+    ("6", "avrdude: error: usbasp_transmit: LIBUSB_ERROR_IO", "usb_error"),
+    ("6", "avrdude: error: usbtiny_transmit: error sending control message: Protocol error", "usb_error"),
+]
+
+@pytest.mark.parametrize("version, text, kind", MESSAGES)
+def test_single_line_messages(version, text, kind):
+    records = classify_output(text)
+    assert [record.kind for record in records] == [kind]
+
+@pytest.mark.parametrize("text", [
+    "avrdude: Device signature = 0x1e950f (probably m328p)\n"
+    "avrdude: Expected signature for ATmega328 is 1E 95 14\n"
+    "         Double check chip, or use -F to override this check.",
+    "avrdude: Device signature = 1E 95 0F (ATmega328P, ATA6614Q, LGT8F328P)\n"
+    "avrdude error: expected signature for ATmega328 is 1E 95 14\n"
+    "        double check chip or use -F to override this check",
+])
+def test_signature_mismatch(text):
+    [record] = classify_output(text)
+    assert record.kind == "signature_mismatch"
+    assert (record.expected, record.actual) == ("0x1E9514", "0x1E950F")
+
+@pytest.mark.parametrize("signature", ["0x000000", "00 00 00", "0xffffff", "FF FF FF"])
+def test_blank_signature_is_target_not_responding(signature):
+    text = (f"avrdude: Device signature = {signature}\n"
+            "avrdude: Yikes!  Invalid device signature.\n"
+            "avrdude: Expected signature for ATmega328P is 1E 95 0F")
+    assert [record.kind for record in classify_output(text)] == ["target_not_responding"]
+
+@pytest.mark.parametrize("text", [
+    "avrdude: verifying flash memory against fw.hex:\n"
+    "avrdude: verification error, first mismatch at byte 0x0102\n"
+    "         0x0c != 0xff\n"
+    "avrdude: verification error; content mismatch",
+    "avrdude: verifying flash memory against fw.hex\n"
+    "avrdude main() error: verification mismatch, first mismatch at byte 0x0102\n"
+    "        0x0c != 0xff",
+])
+def test_verification_error(text):
+    [record] = classify_output(text)
+    assert record.kind == "verification_error"
+    assert record.memory == "flash" and record.address == 0x102
+    # avrdude prints the device byte first
+    assert (record.expected, record.actual) == ("0xFF", "0x0C")
+
+def test_fuse_mismatch():
+    [record] = classify_output("avrdude: verifying hfuse memory against 0xD9:\n"
+                               "avrdude: verification error, first mismatch at byte 0x0000\n"
+                               "         0xd8 != 0xd9")
+    assert record.kind == "fuse_mismatch"
+    assert (record.memory, record.expected, record.actual) == ("hfuse", "0xD9", "0xD8")
+    [record] = classify_output("avrdude: safemode: lfuse changed! Was ff, and is now 7f")
+    assert (record.kind, record.memory, record.expected, record.actual) == ("fuse_mismatch", "lfuse", "0xFF", "0x7F")
+
+def test_repeated_sync_errors_give_one_record():
+    lines = [f"avrdude: stk500_getsync() attempt {n} of 10: not in sync: resp=0x00" for n in range(1, 11)]
+    records = []
+    classifier = ErrorClassifier(records.append)
+    for line in lines:
+        classifier.feed(line)
+    assert len(records) == 1 and classifier.finish() == records
+
+def test_mismatch_without_values_is_flushed():
+    classifier = ErrorClassifier()
+    classifier.feed("avrdude: verification error, first mismatch at byte 0x0010")
+    [record] = classifier.finish()
+    assert record.address == 0x10 and record.expected is None
+
+def test_unrelated_output_gives_no_records():
+    assert classify_output("avrdude: can't open input file fw.hex: No such file or directory\n"
+                           "avrdude: writing flash (4096 bytes):") == []
@@ -0,0 +1,82 @@
+import pytest
+
+import intelhex
+
+BLINK_HEX = [
+    ":100000000C9434000C943E000C943E000C943E0082\n",
+    ":040010001122334442\n",
+    ":00000001FF\n",
+]
+
+def test_parse_hex():
+    image = intelhex.parse_hex(BLINK_HEX)
+    assert (image.min_address, image.max_address, image.size) == (0, 0x13, 20)
+    assert image.read(0, 4) == bytes.fromhex("0C943400")
+    assert image.read(0x10, 6) == bytes.fromhex("11223344FFFF")
+    assert image.mask(0x12, 4) == b"\x01\x01\x00\x00"
+
+def test_extended_linear_address_and_start():
+    lines = [intelhex.format_record(intelhex.RECORD_EXT_LINEAR, 0, b"\x00\x01"),
+             intelhex.format_record(intelhex.RECORD_DATA, 0xFFFE, b"\xAA\xBB"),
+             intelhex.format_record(intelhex.RECORD_START_LINEAR, 0, b"\x00\x00\x01\x00"),
+             ":00000001FF"]
+    image = intelhex.parse_hex(lines)
+    assert list(image.segments()) == [(0x1FFFE, b"\xAA\xBB")]
+    assert image.start_address == 0x100
+
+def test_format_round_trip():
+    image = intelhex.HexImage(page_size=16)
+    image.write(0xFFF8, bytes(range(16)))
+    image.write(0x20000, b"\x01\x02")
+    text = intelhex.format_hex(image)
+    # Records never cross a 64 KB boundary
+    assert ":08FFF800" in text and ":020000040001F9" in text
+    parsed = intelhex.parse_hex(text.splitlines())
+    assert list(parsed.segments()) == list(image.segments())
+    assert intelhex.content_hash(parsed) == intelhex.content_hash(image)
+
+def test_overwrite_does_not_grow_size():
+    image = intelhex.HexImage(page_size=8)
+    image.write(4, b"\x00" * 8)
+    image.write(6, b"\x11" * 2)
+    assert image.size == 8 and image.page_indexes() == [0, 1]
+
+@pytest.mark.parametrize("lines, message", [
+    (["0000000000"], "does not start with ':'"),
+    ([":0Z"], "invalid hex digits"),
+    ([":020000"], "record too short"),
+    ([":0400000001020304F3"], "checksum mismatch"),
+    ([":03000000010203F8"], "checksum mismatch"),
+    ([":05000000010203F7"], "length field 5"),
+    ([":00000001FF", ":00000001FF"], "data after end-of-file"),
+    ([":040010001122334442"], "missing end-of-file"),
+    ([":00000006FA", ":00000001FF"], "unknown record type"),
+])
+def test_format_errors(lines, message):
+    with pytest.raises(intelhex.HexFormatError, match=message):
+        intelhex.parse_hex(lines)
+
+def test_error_line_number():
+    with pytest.raises(intelhex.HexFormatError) as error:
+        intelhex.parse_hex(["", BLINK_HEX[0], ":040010001122334443"])
+    assert error.value.line_number == 3 and str(error.value).startswith("line 3:")
+
+def test_compare_treats_missing_bytes_as_erased():
+    image = intelhex.parse_hex(BLINK_HEX)
+    device = intelhex.parse_hex(BLINK_HEX[:1] + [":00000001FF"])
+    assert intelhex.compare(image, device) == [0x10, 0x11, 0x12, 0x13]
+    assert intelhex.describe_addresses([0x10, 0x11, 0x12, 0x13, 0x20]) == "0x0010-0x0013, 0x0020"
+    assert intelhex.describe_addresses(list(range(0, 20, 2)), limit=2) == "0x0000, 0x0002 and 8 more range(s)"
+
+def test_content_hash_with_layout():
+    firmware = intelhex.parse_hex(BLINK_HEX)
+    device = intelhex.HexImage()
+    device.write(0, firmware.read(0, 0x14) + b"\x55" * 32)
+    assert intelhex.content_hash(device, firmware) == intelhex.content_hash(firmware)
+    assert intelhex.content_hash(device) != intelhex.content_hash(firmware)
+
+def test_check_fits():
+    image = intelhex.parse_hex(BLINK_HEX)
+    intelhex.check_fits(image, 0x14)
+    with pytest.raises(intelhex.ImageTooLargeError, match="up to 0x13"):
+        intelhex.check_fits(image, 0x13)
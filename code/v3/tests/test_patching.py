@@ -0,0 +1,103 @@
+import binascii
+import json
+
+import pytest
+
+import intelhex
+import patching
+
+FIELDS = [
+    {"type": "counter", "name": "serial", "memory": "eeprom", "address": 0, "width": 4, "start": 1000},
+    {"type": "template", "memory": "eeprom", "address": 4, "template": "020000{serial:06X}",
+     "encoding": "hex", "length": 6},
+    {"type": "template", "memory": "eeprom", "address": 10, "template": "{calibration}",
+     "encoding": "hex", "length": 2},
+    {"type": "counter", "name": "serial", "memory": "flash", "address": "0x0100", "width": 2,
+     "start": 1000, "byteorder": "big"},
+    {"type": "crc", "memory": "flash", "address": "0x7FFE", "start": 0, "end": "0x7FFE"},
+]
+
+def firmware():
+    image = intelhex.HexImage()
+    image.write(0, bytes(range(256)) * 2)
+    image.write(0x10000 - 8, b"\x55" * 16)
+    return image
+
+def patched_copy(image, patches):
+    copy = intelhex.parse_hex(intelhex.format_hex(image).splitlines())
+    for address, value in patches:
+        copy.write(address, value)
+    return copy
+
+@pytest.fixture
+def engine():
+    fields = [patching.field_from_dict(data) for data in FIELDS]
+    return patching.PatchEngine({"flash": firmware()}, fields)
+
+def test_patches(engine):
+    patches = engine.patches(3, {"calibration": "7F 80"})
+    assert patches["eeprom"] == [(0, (1003).to_bytes(4, "little")),
+                                 (4, bytes.fromhex("0200000003EB")),
+                                 (10, b"\x7F\x80")]
+    assert patches["flash"][0] == (0x100, (1003).to_bytes(2, "big"))
+    [(address, crc)] = patches["flash"][1:]
+    image = patched_copy(firmware(), patches["flash"][:1])
+    assert address == 0x7FFE
+    assert crc == binascii.crc_hqx(image.read(0, 0x7FFE), 0xFFFF).to_bytes(2, "little")
+
+@pytest.mark.parametrize("unit", [0, 1, 250])
+def test_render_matches_patched_image(engine, unit):
+    rendered = engine.render(unit, {"calibration": "0102"})
+    for memory, patches in engine.patches(unit, {"calibration": "0102"}).items():
+        expected = patched_copy(engine.images[memory], patches)
+        parsed = intelhex.parse_hex(rendered[memory].decode("ascii").splitlines())
+        assert list(parsed.segments()) == list(expected.segments())
+
+def test_crc32_field():
+    field = patching.CrcField("flash", 0x20, 0, 0x20, algorithm="crc32")
+    image = intelhex.HexImage()
+    image.write(0, b"firmware")
+    engine = patching.PatchEngine({"flash": image}, [field])
+    [(_, value)] = engine.patches(0)["flash"]
+    assert value == binascii.crc32(image.read(0, 0x20)).to_bytes(4, "little")
+
+def test_load_fields(tmp_path):
+    path = tmp_path / "fields.json"
+    path.write_text(json.dumps(FIELDS))
+    fields = patching.load_fields(str(path))
+    assert [type(field).__name__ for field in fields] == [
+        "CounterField", "TemplateField", "TemplateField", "CounterField", "CrcField"]
+    assert fields[4].address == 0x7FFE and fields[4].length == 2
+
+@pytest.mark.parametrize("data, message", [
+    ({"type": "uuid", "memory": "eeprom", "address": 0}, "unknown field type"),
+    ({"type": "counter", "memory": "eeprom", "address": 0, "colour": "red"}, "bad counter field"),
+])
+def test_bad_field(data, message):
+    with pytest.raises(patching.PatchError, match=message):
+        patching.field_from_dict(data)
+
+@pytest.mark.parametrize("field, values, message", [
+    ({"type": "counter", "memory": "eeprom", "address": 0, "width": 1, "start": 300}, {},
+     "does not fit"),
+    ({"type": "template", "memory": "eeprom", "address": 0, "template": "{calibration}",
+      "encoding": "hex", "length": 2}, {}, "has no value for"),
+    ({"type": "template", "memory": "eeprom", "address": 0, "template": "{unit:08X}",
+      "encoding": "hex", "length": 2}, {}, "gives 4 bytes"),
+])
+def test_render_errors(field, values, message):
+    engine = patching.PatchEngine({}, [patching.field_from_dict(field)])
+    with pytest.raises(patching.PatchError, match=message):
+        engine.render(0, values)
+
+def test_template_needs_length():
+    field = patching.field_from_dict({"type": "template", "memory": "eeprom", "address": 0,
+                                      "template": "SN{unit}"})
+    with pytest.raises(patching.PatchError, match="needs a fixed length"):
+        patching.PatchEngine({}, [field])
+
+def test_check_fits(engine):
+    engine.check_fits({"flash": 0x10000 + 8, "eeprom": 12})
+    with pytest.raises(intelhex.ImageTooLargeError, match="eeprom patches reach 0xB"):
+        engine.check_fits({"flash": 0x10000 + 8, "eeprom": 11})
+    assert engine.patched_memories() == ["flash", "eeprom"]
@@ -0,0 +1,45 @@
+import os
+
+from programmers import enumerate_programmers
+
+def add_device(root, name, vendor, product, serial=None, busnum=1, devnum=2, description="Programmer"):
+    device_dir = root / name
+    device_dir.mkdir()
+    attrs = {"idVendor": vendor, "idProduct": product, "busnum": str(busnum),
+             "devnum": str(devnum), "product": description}
+    if serial is not None:
+        attrs["serial"] = serial
+    for attr, value in attrs.items():
+        (device_dir / attr).write_text(value + "\n")
+
+def ports(root):
+    return {programmer.programmer + "/" + programmer.description: programmer.port
+            for programmer in enumerate_programmers(str(root))}
+
+def test_serial_number_is_the_port(tmp_path):
+    add_device(tmp_path, "1-1", "16c0", "05dc", serial="A1")
+    add_device(tmp_path, "1-2", "16c0", "05dc", serial="B2", description="Other")
+    add_device(tmp_path, "1-3", "0bda", "8153", serial="C3")
+    assert ports(tmp_path) == {"usbasp/Programmer": "usb:A1", "usbasp/Other": "usb:B2"}
+
+def test_usbtiny_without_serial_uses_bus_and_device(tmp_path):
+    add_device(tmp_path, "1-1", "1781", "0c9f", busnum=1, devnum=7)
+    add_device(tmp_path, "3-2", "1781", "0c9f", busnum=3, devnum=12, description="Other")
+    assert ports(tmp_path) == {"usbtiny/Programmer": "usb:001:007", "usbtiny/Other": "usb:003:012"}
+
+def test_single_programmer_without_serial_uses_plain_usb(tmp_path):
+    add_device(tmp_path, "1-1", "16c0", "05dc")
+    add_device(tmp_path, "1-2", "03eb", "2104", serial="0001", description="Other")
+    [usbasp, avrisp] = enumerate_programmers(str(tmp_path))
+    assert (usbasp.port, usbasp.addressable, usbasp.label) == ("usb", True, "usbasp @ usb")
+    assert avrisp.port == "usb:0001"
+
+def test_programmers_without_serial_of_the_same_type_are_not_addressable(tmp_path):
+    add_device(tmp_path, "1-1", "16c0", "05dc")
+    add_device(tmp_path, "1-2", "16c0", "05dc", serial="A1", description="Other")
+    [bare, serial] = enumerate_programmers(str(tmp_path))
+    assert (bare.port, bare.addressable, bare.label) == (None, False, "usbasp @ usb")
+    assert serial.addressable
+
+def test_missing_sysfs(tmp_path):
+    assert enumerate_programmers(os.path.join(str(tmp_path), "missing")) == []
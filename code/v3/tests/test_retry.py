@@ -0,0 +1,79 @@
+import chipdb
+from commands import CommandOptions, base_command, command_bit_clock, with_bit_clock
+from runner import ProcessResult
+from retry import RetryPolicy, classify_failure, run_with_retry
+
+SYNC = "avrdude: stk500_getsync() attempt 1 of 10: not in sync: resp=0x00"
+MISMATCH = ("avrdude: verification error, first mismatch at byte 0x0102\n"
+            "         0x0c != 0xff")
+USB = "avrdude: error: usbasp_transmit: LIBUSB_ERROR_IO"
+
+WRITE = ["avrdude", "-c", "usbasp", "-p", "m328p", "-U", "flash:w:fw.hex:i"]
+VERIFY = ["avrdude", "-c", "usbasp", "-p", "m328p", "-U", "flash:v:fw.hex:i"]
+
+class FakeRunner:
+    """Fails with the given stderr texts in turn, then succeeds."""
+    def __init__(self, *failures):
+        self.failures = list(failures)
+        self.commands = []
+        self.delays = []
+
+    def run(self, argv):
+        self.commands.append(argv)
+        if self.failures:
+            return ProcessResult(1, stderr=self.failures.pop(0))
+        return ProcessResult(0)
+
+    def retry(self, argv, policy=None):
+        return run_with_retry(self.run, argv, policy or RetryPolicy(), sleep=self.delays.append)
+
+def test_classify_failure():
+    assert classify_failure(ProcessResult(0)) == "ok"
+    assert classify_failure(ProcessResult(None, timed_out=True)) == "timeout"
+    assert classify_failure(ProcessResult(1, stderr=SYNC + "\n" + MISMATCH)) == "sync"
+    assert classify_failure(ProcessResult(1, stderr="avrdude: something new")) == "other"
+
+def test_usb_error_is_retried_at_once():
+    runner = FakeRunner(USB, USB)
+    assert runner.retry(WRITE).ok
+    assert runner.delays == [0.0, 0.5] and len(runner.commands) == 3
+
+def test_verify_error_after_write_is_retried():
+    runner = FakeRunner(MISMATCH)
+    assert runner.retry(WRITE).ok and len(runner.commands) == 2
+
+def test_verify_only_mismatch_fails_at_once():
+    runner = FakeRunner(MISMATCH, MISMATCH)
+    result = runner.retry(VERIFY)
+    assert not result.ok
+    assert runner.commands == [VERIFY] and runner.delays == []
+
+def test_permanent_failures_are_not_retried():
+    runner = FakeRunner("avrdude: error: could not find USB device with vid=0x16c0 pid=0x5dc")
+    assert not runner.retry(WRITE).ok and len(runner.commands) == 1
+
+def test_gives_up_after_max_attempts():
+    runner = FakeRunner(USB, USB, USB, USB, USB)
+    assert not runner.retry(WRITE, RetryPolicy(max_attempts=3)).ok
+    assert len(runner.commands) == 3
+
+def bit_clocks(commands):
+    return [command_bit_clock(command) for command in commands]
+
+def test_sync_errors_slow_down_from_the_given_period():
+    runner = FakeRunner(SYNC, SYNC, SYNC)
+    assert runner.retry(with_bit_clock(WRITE, 4)).ok
+    assert bit_clocks(runner.commands) == [4, 4, 8, 8]
+
+def test_sync_errors_without_bit_clock_slow_down_to_a_known_period():
+    # The programmer's default may be slower than -B 1 or 2, so those are never tried
+    runner = FakeRunner(SYNC, SYNC, SYNC, SYNC)
+    assert runner.retry(WRITE, RetryPolicy(max_attempts=5)).ok
+    assert bit_clocks(runner.commands) == [None, None, 16, 16, 32]
+
+def test_explicit_bit_clock_of_one_is_kept():
+    chip = chipdb.load_chip_database(chipdb.DEFAULT_DATABASE_PATH, None).find("m328p")
+    assert "-B" not in base_command(chip, CommandOptions())
+    command = base_command(chip, CommandOptions(bit_clock=1))
+    assert command_bit_clock(command) == 1
+    assert with_bit_clock(command, 2)[command.index("-B"):][:2] == ["-B", "2"]
@@ -0,0 +1,44 @@
+from scheduler import JobScheduler, device_key
+
+def submit(scheduler, started, device, name):
+    return scheduler.submit(device, name, lambda job: started.append(name))
+
+def test_jobs_for_one_programmer_run_in_order():
+    scheduler, started = JobScheduler(), []
+    first = submit(scheduler, started, "usbasp@usb:A1", "first")
+    submit(scheduler, started, "usbasp@usb:A1", "second")
+    submit(scheduler, started, "usbasp@usb:B2", "other")
+    assert started == ["first", "other"]
+    assert scheduler.position(scheduler.jobs()[1]) == 1
+    scheduler.job_done(first, True)
+    assert started == ["first", "other", "second"]
+
+def test_default_device_waits_for_programmers_of_its_type():
+    scheduler, started = JobScheduler(), []
+    gang = submit(scheduler, started, "usbasp@usb:A1", "gang")
+    submit(scheduler, started, "usbtiny@default", "usbtiny")
+    plain = submit(scheduler, started, "usbasp@default", "plain")
+    assert started == ["gang", "usbtiny"]
+    assert plain.state == "queued"
+
+    scheduler.job_done(gang, True)
+    assert started == ["gang", "usbtiny", "plain"]
+    # And the other way round
+    submit(scheduler, started, "usbasp@usb:B2", "gang 2")
+    assert started[-1] == "plain"
+    scheduler.job_done(plain, True)
+    assert started[-1] == "gang 2"
+
+def test_device_key():
+    assert device_key("usbasp", None) == "usbasp@default"
+    assert device_key("usbasp", "usb") == "usbasp@default"
+    assert device_key("usbasp", "usb:A1") == "usbasp@usb:A1"
+
+def test_cancel_and_failed_start():
+    scheduler, started = JobScheduler(), []
+    running = submit(scheduler, started, "usbasp@default", "running")
+    queued = submit(scheduler, started, "usbasp@default", "queued")
+    assert scheduler.cancel(queued) and queued.state == "cancelled"
+    assert not scheduler.cancel(running)
+    scheduler.job_done(running, False)
+    assert running.state == "failed" and not scheduler.is_busy("usbasp@default")
@@ -0,0 +1,131 @@
+import shutil
+
+import pytest
+
+import chipdb
+import station
+from commands import CommandOptions
+from runner import ProcessResult
+from station import FAILED, PASSED, RUNNING, SETTLING, WAITING, Board, Station, UsbPresence
+
+def plug(root, name, vendor="2341", product="0043", devnum=5, serial="7573", layout="cdc",
+         description="Arduino Uno"):
+    """Add a USB serial device to a fake /sys/bus/usb/devices tree."""
+    device_dir = root / name
+    device_dir.mkdir()
+    for attr, value in {"idVendor": vendor, "idProduct": product, "devnum": str(devnum),
+                        "serial": serial, "product": description}.items():
+        (device_dir / attr).write_text(value + "\n")
+    interface_dir = device_dir / f"{name}:1.0"
+    interface_dir.mkdir()
+    if layout == "cdc":
+        # cdc_acm: <intf>/tty/ttyACM0
+        (interface_dir / "tty").mkdir()
+        (interface_dir / "tty" / f"ttyACM{devnum % 4}").mkdir()
+    elif layout == "usb-serial":
+        # ftdi_sio, ch341: <intf>/ttyUSB0
+        (interface_dir / f"ttyUSB{devnum % 4}").mkdir()
+    # The kernel lists interfaces next to the devices too
+    (root / f"{name}:1.0").mkdir()
+
+def unplug(root, name):
+    for path in root.glob(name + "*"):
+        shutil.rmtree(path)
+
+def test_usb_serial_boards(tmp_path):
+    plug(tmp_path, "1-1", devnum=5)
+    plug(tmp_path, "1-2", vendor="0403", product="6001", devnum=6, serial="A50285BI",
+         layout="usb-serial", description="FT232R USB UART")
+    # An ISP programmer and a device without a tty are not boards
+    plug(tmp_path, "1-3", vendor="16c0", product="05dc", devnum=7)
+    plug(tmp_path, "1-4", vendor="046d", product="c52b", devnum=8, layout=None)
+    (tmp_path / "usb1").mkdir()
+
+    boards = station.usb_serial_boards(str(tmp_path))
+    assert boards == [Board("1-1#5:7573", "/dev/ttyACM1", "Arduino Uno"),
+                      Board("1-2#6:A50285BI", "/dev/ttyUSB2", "FT232R USB UART")]
+    assert station.usb_serial_boards(str(tmp_path / "missing")) == []
+
+def test_usb_presence_ignores_devices_attached_at_start(tmp_path):
+    plug(tmp_path, "1-1", devnum=5)
+    presence = UsbPresence(str(tmp_path))
+    assert presence.poll() is None
+
+    plug(tmp_path, "1-2", devnum=9)
+    assert presence.poll().identity == "1-2#9:7573"
+
+    # The same board plugged again gets a new device number
+    unplug(tmp_path, "1-1")
+    unplug(tmp_path, "1-2")
+    plug(tmp_path, "1-1", devnum=10)
+    assert presence.poll().port == "/dev/ttyACM2"
+
+def test_signature_presence():
+    chip = chipdb.load_chip_database(chipdb.DEFAULT_DATABASE_PATH, None).find("m328p")
+    presence = station.SignaturePresence(chip, CommandOptions(programmer="usbasp"))
+    assert presence.command[-3:] == ["-F", "-U", "signature:r:-:h"]
+    assert presence.board(ProcessResult(0, "0x1e,0x95,0x0f\n")) == Board("0x1E950F", None, chip.name)
+    assert presence.board(ProcessResult(0, "0x1e,0x95,0x14\n")) is None
+    assert presence.board(ProcessResult(1, "")) is None
+    assert presence.board(None) is None
+
+class Recorder:
+    def __init__(self, debounce=0.5):
+        self.jobs = []
+        self.changes = []
+        self.station = Station(self.jobs.append, debounce,
+                               lambda state, board: self.changes.append(state))
+
+    def feed(self, *observations):
+        for now, board in observations:
+            self.station.update(board, now)
+        return self.station.state
+
+BOARD = Board("1-1#5:", "/dev/ttyACM0", "Uno")
+OTHER = Board("1-1#6:", "/dev/ttyACM0", "Uno")
+
+def test_board_is_programmed_once_after_settling():
+    recorder = Recorder()
+    assert recorder.feed((0.0, BOARD)) == SETTLING
+    assert recorder.feed((0.3, BOARD)) == SETTLING and recorder.jobs == []
+    assert recorder.feed((0.5, BOARD)) == RUNNING and recorder.jobs == [BOARD]
+    # The board re-enumerates while it is programmed
+    assert recorder.feed((0.6, None), (0.7, OTHER)) == RUNNING
+
+    recorder.station.job_done(True)
+    assert recorder.feed((1.0, BOARD), (5.0, BOARD)) == PASSED
+    assert recorder.jobs == [BOARD] and recorder.station.passed == 1
+    assert recorder.changes == [SETTLING, RUNNING, PASSED]
+
+def test_contact_bounce_on_insertion_restarts_settling():
+    recorder = Recorder()
+    assert recorder.feed((0.0, BOARD), (0.2, None), (0.3, OTHER), (0.7, OTHER)) == SETTLING
+    assert recorder.feed((0.8, OTHER)) == RUNNING and recorder.jobs == [OTHER]
+    assert recorder.changes == [SETTLING, WAITING, SETTLING, RUNNING]
+
+def test_removal_needs_the_slot_empty_for_the_debounce_time():
+    recorder = Recorder()
+    recorder.feed((0.0, BOARD), (0.5, BOARD))
+    recorder.station.job_done(False)
+    assert recorder.station.failed == 1
+
+    # A short gap while the board is pulled out is still the same board
+    assert recorder.feed((1.0, None), (1.2, OTHER), (1.3, None), (1.7, None)) == FAILED
+    assert recorder.feed((1.8, None)) == WAITING
+    assert recorder.feed((2.0, OTHER), (2.5, OTHER)) == RUNNING
+    assert recorder.jobs == [BOARD, OTHER]
+
+def test_job_done_outside_running_is_ignored():
+    recorder = Recorder()
+    recorder.station.job_done(True)
+    assert recorder.station.state == WAITING and recorder.station.passed == 0
+
+@pytest.mark.parametrize("state, text", [
+    (WAITING, "Insert board"),
+    (SETTLING, "Board Uno detected..."),
+    (RUNNING, "Programming Uno..."),
+    (PASSED, "PASS - remove board"),
+    (FAILED, "FAIL - remove board"),
+])
+def test_describe_state(state, text):
+    assert station.describe_state(state, BOARD) == text